@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+from db import get_db_connection
+from config import (
+    ACTIVITY_LOG_BATCH_SIZE,
+    ACTIVITY_LOG_FLUSH_INTERVAL,
+    ACTIVITY_LOG_MAX_QUEUE,
+    ACTIVITY_LOG_OVERFLOW,
+)
+
+# created_at comes from the DB's clock and session time zone, like the column's CURRENT_TIMESTAMP
+# default, moved back by how long the row waited in the queue
+INSERT_SQL = (
+    "INSERT INTO activity_logs (user_id, action, details, created_at) "
+    "VALUES (%s, %s, %s, NOW(6) - INTERVAL %s MICROSECOND)"
+)
+
+
+class ActivityLogWriter:
+    """Buffers activity log rows in memory and writes them in multi-row batches.
+
+    A background thread flushes whenever ``batch_size`` rows are queued or
+    ``flush_interval`` seconds pass. When the queue is full, ``overflow``
+    decides what is lost: "drop_oldest" (default) or "drop_newest"; dropped
+    rows are counted, printed and reported by ``stats()``.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int, overflow: str):
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_queue = max_queue
+        self._overflow = overflow
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._dropped = 0
+        self._dropped_total = 0
+        self._lost_total = 0
+
+    def submit(self, user_id: int, action: str, details: str = ""):
+        # queued time is kept (monotonic) so created_at is the event's time, not the flush's,
+        # and log order survives batching
+        row = (user_id, action, details, time.monotonic())
+        with self._cond:
+            if len(self._queue) >= self._max_queue:
+                self._dropped += 1
+                if self._overflow == "drop_newest":
+                    return
+                self._queue.popleft()
+            self._queue.append(row)
+            if len(self._queue) >= self._batch_size:
+                self._cond.notify()
+        self.start()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Drain whatever is queued and stop the writer thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "dropped_total": self._dropped_total + self._dropped,
+                "lost_total": self._lost_total,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self._flush_interval
+                while not self._stopping and len(self._queue) < self._batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self._batch_size, len(self._queue)))]
+                dropped, self._dropped = self._dropped, 0
+                self._dropped_total += dropped
+                dropped_total = self._dropped_total
+                done = self._stopping and not self._queue
+
+            if dropped:
+                print(
+                    f"Activity log queue full ({self._overflow}): dropped {dropped} entries, "
+                    f"{dropped_total} since start"
+                )
+            if batch:
+                self._write(batch)
+            if done:
+                return
+
+    def _write(self, batch):
+        connection = get_db_connection()
+        if not connection:
+            self._count_lost(len(batch))
+            print(f"Activity log flush failed: database connection failed ({len(batch)} entries lost)")
+            return
+        now = time.monotonic()
+        rows = [(user_id, action, details, int((now - queued) * 1_000_000)) for user_id, action, details, queued in batch]
+        try:
+            cursor = connection.cursor()
+            cursor.executemany(INSERT_SQL, rows)
+            connection.commit()
+            cursor.close()
+        except Exception as e:
+            self._count_lost(len(batch))
+            print(f"Activity log flush failed ({len(batch)} entries lost): {e}")
+        finally:
+            connection.close()
+
+    def _count_lost(self, count: int):
+        with self._cond:
+            self._lost_total += count
+
+
+activity_log = ActivityLogWriter(
+    ACTIVITY_LOG_BATCH_SIZE,
+    ACTIVITY_LOG_FLUSH_INTERVAL,
+    ACTIVITY_LOG_MAX_QUEUE,
+    ACTIVITY_LOG_OVERFLOW,
+)
@@ -0,0 +1,83 @@
+"""In-process LRU cache of ad-hoc clustering results (playground, pairwise, exports).
+
+Results are keyed by (dataset id, dataset version, features, k, algorithm
+params). The version comes from ``current_dataset`` and bumps whenever the
+dataset's rows change, so stale entries are never served; they just age out.
+Entries are evicted least recently used first once CLUSTER_CACHE_MAX_BYTES
+is exceeded.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from config import CLUSTER_CACHE_MAX_BYTES
+
+
+class ClusterResult:
+    """Cluster labels by student id, plus the centroids in original units."""
+
+    def __init__(self, student_ids, labels, centroids):
+        self.labels = pd.Series(np.asarray(labels, dtype=np.int32), index=np.asarray(student_ids, dtype=np.int64))
+        self.centroids = centroids
+        self.nbytes = int(self.labels.memory_usage(index=True)) + 64 * sum(len(c) for c in centroids) + 256
+
+    def labels_for(self, student_ids):
+        """Labels in the order of ``student_ids``, or None if any of them was not clustered."""
+        labels = self.labels.reindex(np.asarray(student_ids, dtype=np.int64))
+        if labels.isna().any():
+            return None
+        return labels.to_numpy(dtype=int)
+
+
+class ClusterResultCache:
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> ClusterResult
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, student_ids):
+        """``(labels, centroids)`` for these students, or None (a miss) when not cached for all of them."""
+        with self._lock:
+            result = self._entries.get(key)
+            labels = result.labels_for(student_ids) if result is not None else None
+            if labels is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return labels, result.centroids
+
+    def put(self, key, result: ClusterResult):
+        size = result.nbytes
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = result
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+cluster_cache = ClusterResultCache(CLUSTER_CACHE_MAX_BYTES)
@@ -0,0 +1,100 @@
+"""Background removal of replaced cluster runs.
+
+A recluster writes its run under a new cluster id and moves
+``datasets.active_cluster_id`` to it in the same transaction
+(ingest.replace_cluster_run), stamping the replaced run's ``retired_at``. The
+replaced runs are deleted here, on the job pool, once they have been retired
+for CLUSTER_GC_GRACE_SECONDS so requests that resolved the old run can still
+read it. Only runs older than the active one are candidates, read under the
+dataset row's lock, so a run that is being published is never collected.
+Assignments go in batches of CLUSTER_GC_BATCH_ROWS so no single statement
+locks a whole run.
+"""
+import threading
+from config import CLUSTER_GC_BATCH_ROWS, CLUSTER_GC_GRACE_SECONDS
+from db import get_db_connection
+from jobs import jobs
+
+# runs retired before the pointer existed (retired_at NULL) are collectable right away
+INACTIVE_RUNS_SQL = """
+    SELECT id FROM clusters
+    WHERE dataset_id = %s AND id < %s
+      AND (retired_at IS NULL OR retired_at <= NOW() - INTERVAL %s SECOND)
+"""
+
+
+def delete_inactive_runs(connection, dataset_id: int, batch_rows: int = CLUSTER_GC_BATCH_ROWS,
+                         grace_seconds: float = CLUSTER_GC_GRACE_SECONDS) -> int:
+    """Delete the dataset's runs retired more than ``grace_seconds`` ago; returns how many were deleted."""
+    cursor = connection.cursor(buffered=True)
+    try:
+        connection.start_transaction()
+        cursor.execute("SELECT active_cluster_id FROM datasets WHERE id = %s FOR UPDATE", (dataset_id,))
+        row = cursor.fetchone()
+        if row is None or row[0] is None:
+            # no active run: nothing is known to have replaced the existing ones
+            connection.commit()
+            return 0
+        cursor.execute(INACTIVE_RUNS_SQL, (dataset_id, row[0], int(grace_seconds)))
+        stale = [r[0] for r in cursor.fetchall()]
+        connection.commit()
+
+        for cluster_id in stale:
+            while True:
+                cursor.execute("DELETE FROM student_cluster WHERE cluster_id = %s LIMIT %s", (cluster_id, batch_rows))
+                deleted = cursor.rowcount
+                connection.commit()
+                if deleted < batch_rows:
+                    break
+            cursor.execute("DELETE FROM clusters WHERE id = %s", (cluster_id,))
+            connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(stale)
+
+
+def _collect(job, dataset_id: int) -> dict:
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    try:
+        return {"dataset_id": dataset_id, "deleted_runs": delete_inactive_runs(connection, dataset_id)}
+    finally:
+        connection.close()
+
+
+_timers = {}  # dataset_id -> {"timer": threading.Timer, "again": bool}
+_timers_lock = threading.Lock()
+
+
+def _fire(dataset_id: int, delay: float):
+    with _timers_lock:
+        entry = _timers.pop(dataset_id)
+    jobs.submit("cluster_gc", _collect, dataset_id)
+    if entry["again"]:
+        # runs retired while this timer waited are not past their grace period yet
+        schedule_cluster_gc(dataset_id, delay)
+
+
+def schedule_cluster_gc(dataset_id: int, delay: float = CLUSTER_GC_GRACE_SECONDS):
+    """Queue deletion of the dataset's replaced runs once their grace period is over.
+
+    A dataset has at most one timer waiting: calls made while it waits only
+    ask for one more collection after it fires.
+    """
+    if delay <= 0:
+        return jobs.submit("cluster_gc", _collect, dataset_id)
+    with _timers_lock:
+        pending = _timers.get(dataset_id)
+        if pending is not None:
+            pending["again"] = True
+            return pending["timer"]
+        # +1s so the run retired just before this call is past the grace period too
+        timer = threading.Timer(delay + 1, _fire, args=(dataset_id, delay))
+        timer.daemon = True
+        _timers[dataset_id] = {"timer": timer, "again": False}
+    timer.start()
+    return timer
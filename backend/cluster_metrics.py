@@ -0,0 +1,58 @@
+"""Clustering quality metrics (silhouette, Davies-Bouldin, Calinski-Harabasz).
+
+The exact silhouette needs every pairwise distance, O(n²) in time and memory,
+so above METRICS_SILHOUETTE_SAMPLE rows it is taken on a seeded random sample.
+Davies-Bouldin and Calinski-Harabasz only need each row's distance to its
+cluster mean, and are computed together from one pass over the rows. Metrics
+are stored with the cluster run (``clusters.metrics``) and served from there.
+"""
+import numpy as np
+from sklearn.metrics import silhouette_score
+from config import METRICS_SEED, METRICS_SILHOUETTE_SAMPLE
+
+EMPTY_METRICS = {"silhouette": None, "davies_bouldin": None, "calinski_harabasz": None, "silhouette_sample_size": None}
+
+
+def _dispersion_scores(X: np.ndarray, labels: np.ndarray):
+    """``(davies_bouldin, calinski_harabasz)``, matching sklearn's scores."""
+    n = len(X)
+    clusters, labels = np.unique(labels, return_inverse=True)
+    k = len(clusters)
+    counts = np.bincount(labels, minlength=k)
+    centroids = np.zeros((k, X.shape[1]))
+    np.add.at(centroids, labels, X)
+    centroids /= counts[:, None]
+
+    # the single pass: each row's distance to its own cluster mean
+    distances = np.sqrt(((X - centroids[labels]) ** 2).sum(axis=1))
+    within = float((distances ** 2).sum())
+    between = float((counts * ((centroids - X.mean(axis=0)) ** 2).sum(axis=1)).sum())
+    chi = 1.0 if within == 0 else between * (n - k) / (within * (k - 1))
+
+    spread = np.bincount(labels, weights=distances, minlength=k) / counts
+    separation = np.sqrt(((centroids[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2))
+    if np.allclose(spread, 0) or np.allclose(separation, 0):
+        return 0.0, chi
+    separation[separation == 0] = np.inf
+    ratios = (spread[:, None] + spread[None, :]) / separation
+    ratios[np.isinf(ratios)] = np.nan
+    return float(np.mean(np.nanmax(ratios, axis=1))), chi
+
+
+def quality_metrics(X, labels, sample_size: int = METRICS_SILHOUETTE_SAMPLE, seed: int = METRICS_SEED) -> dict:
+    """Quality metrics of a clustering of the (scaled) rows of ``X``; zeros when it has fewer than 2 clusters."""
+    X = np.asarray(X, dtype=float)
+    labels = np.asarray(labels)
+    try:
+        sampled = sample_size if 0 < sample_size < len(X) else None
+        silhouette = float(silhouette_score(X, labels, sample_size=sampled, random_state=seed))
+        dbi, chi = _dispersion_scores(X, labels)
+    except Exception:
+        silhouette = dbi = chi = 0
+        sampled = None
+    return {
+        "silhouette": silhouette,
+        "davies_bouldin": dbi,
+        "calinski_harabasz": chi,
+        "silhouette_sample_size": sampled,
+    }
@@ -22,6 +22,79 @@ DB_CONFIG = {
     "autocommit": True,
 }
 
+# Connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", "30"))  # ping idle connections older than this
+
+# Authenticated-user cache (per process)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+# Write-behind activity logging
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "100"))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "2"))  # seconds
+ACTIVITY_LOG_MAX_QUEUE = int(os.getenv("ACTIVITY_LOG_MAX_QUEUE", "10000"))
+ACTIVITY_LOG_OVERFLOW = os.getenv("ACTIVITY_LOG_OVERFLOW", "drop_oldest")  # or "drop_newest"
+
+# How long the cached "current dataset" pointer is trusted before re-checking the database
+CURRENT_DATASET_TTL_SECONDS = float(os.getenv("CURRENT_DATASET_TTL_SECONDS", "30"))
+
+# Apply pending schema migrations (migrations.py) when the app starts
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "True") == "True"
+
+# Rows per multi-row INSERT when ingesting datasets
+INGEST_BATCH_ROWS = int(os.getenv("INGEST_BATCH_ROWS", "1000"))
+# CSV uploads at least this big are parsed and written INGEST_CHUNK_ROWS rows at a time
+INGEST_CHUNKED_MIN_BYTES = int(os.getenv("INGEST_CHUNKED_MIN_BYTES", str(20 * 1024 * 1024)))
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+
+# Largest accepted request body (dataset uploads), in bytes
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Worker processes for the elbow search (1 = fit in-process)
+ELBOW_WORKERS = int(os.getenv("ELBOW_WORKERS", str(os.cpu_count() or 1)))
+
+# Staged uploads (parsed frame + elbow fits kept between preview and commit)
+STAGING_TTL_SECONDS = float(os.getenv("STAGING_TTL_SECONDS", "1800"))
+STAGING_MAX_ENTRIES = int(os.getenv("STAGING_MAX_ENTRIES", "4"))
+
+# Append uploads: a full refit is run when the new rows' distance to their centroid
+# (at APPEND_DRIFT_QUANTILE) exceeds the existing rows' by more than this factor
+APPEND_DRIFT_THRESHOLD = float(os.getenv("APPEND_DRIFT_THRESHOLD", "1.5"))
+APPEND_DRIFT_QUANTILE = float(os.getenv("APPEND_DRIFT_QUANTILE", "0.9"))
+
+# Precompute the playground's k = 2..10 GWA/income clusterings when a dataset is uploaded
+PRECOMPUTE_PLAYGROUND = os.getenv("PRECOMPUTE_PLAYGROUND", "True") == "True"
+
+# Memory budget for cached playground / pairwise clustering results (cluster_cache.py)
+CLUSTER_CACHE_MAX_BYTES = int(os.getenv("CLUSTER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Reclusters triggered by student edits wait this long for further edits (recluster_queue.py),
+# but never more than RECLUSTER_MAX_DELAY_SECONDS after the first one
+RECLUSTER_DEBOUNCE_SECONDS = float(os.getenv("RECLUSTER_DEBOUNCE_SECONDS", "5"))
+RECLUSTER_MAX_DELAY_SECONDS = float(os.getenv("RECLUSTER_MAX_DELAY_SECONDS", "30"))
+
+# Reclusters start from the stored run's centroids with a single init, falling back to the full
+# search when the warm fit's inertia per student is this much (fraction) worse than the stored run's
+RECLUSTER_WARM_START = os.getenv("RECLUSTER_WARM_START", "True") == "True"
+RECLUSTER_WARM_TOLERANCE = float(os.getenv("RECLUSTER_WARM_TOLERANCE", "0.1"))
+
+# Assignments deleted per statement when dropping replaced cluster runs (cluster_gc.py); a replaced
+# run is kept this long after it stops being active, so requests that already resolved it can finish
+CLUSTER_GC_BATCH_ROWS = int(os.getenv("CLUSTER_GC_BATCH_ROWS", "10000"))
+CLUSTER_GC_GRACE_SECONDS = float(os.getenv("CLUSTER_GC_GRACE_SECONDS", "300"))
+
+# Quality metrics (cluster_metrics.py): silhouette is taken on a random sample of this many rows
+# (0 = always exact), drawn with METRICS_SEED so repeated runs agree
+METRICS_SILHOUETTE_SAMPLE = int(os.getenv("METRICS_SILHOUETTE_SAMPLE", "10000"))
+METRICS_SEED = int(os.getenv("METRICS_SEED", "42"))
+
+# Background jobs (dataset ingestion)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))  # keep finished jobs this long
+
 
 ALLOW_ORIGINS = os.getenv("ALLOW_ORIGINS", "").split(",")
 
@@ -0,0 +1,61 @@
+import threading
+import time
+from config import CURRENT_DATASET_TTL_SECONDS
+
+LATEST_DATASET_SQL = "SELECT id FROM datasets ORDER BY upload_date DESC, id DESC LIMIT 1"
+
+
+class CurrentDataset:
+    """Process-wide pointer to the latest dataset, with a monotonically increasing version.
+
+    The version bumps whenever the pointer moves or the current dataset's rows
+    change (touch()), so caches can key on it instead of re-querying. The pointer
+    is re-read after ``ttl`` seconds to pick up uploads made by other processes.
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._dataset_id = None
+        self._version = 0
+        self._loaded_at = None
+
+    async def get(self, connection):
+        """Return ``(dataset_id, version)``; dataset_id is None when nothing is uploaded."""
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl:
+                return self._dataset_id, self._version
+        return await self.refresh(connection)
+
+    async def refresh(self, connection):
+        cursor = connection.cursor(dictionary=True)
+        await cursor.execute(LATEST_DATASET_SQL)
+        row = cursor.fetchone()
+        cursor.close()
+        return self._set(row["id"] if row else None)
+
+    def refresh_sync(self, connection):
+        """Same as refresh() for code already running in a worker thread."""
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(LATEST_DATASET_SQL)
+        row = cursor.fetchone()
+        cursor.close()
+        return self._set(row["id"] if row else None)
+
+    def touch(self, dataset_id=None):
+        """Mark the current dataset's rows as changed (no-op for other datasets)."""
+        with self._lock:
+            if dataset_id is None or dataset_id == self._dataset_id:
+                self._version += 1
+            return self._version
+
+    def _set(self, dataset_id):
+        with self._lock:
+            if dataset_id != self._dataset_id or self._loaded_at is None:
+                self._dataset_id = dataset_id
+                self._version += 1
+            self._loaded_at = time.monotonic()
+            return self._dataset_id, self._version
+
+
+current_dataset = CurrentDataset(CURRENT_DATASET_TTL_SECONDS)
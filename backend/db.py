@@ -1,10 +1,247 @@
+import functools
+import queue
+import threading
+import time
+import anyio
 import mysql.connector
 from mysql.connector import Error
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_PING_INTERVAL
+
+
+class PoolExhaustedError(Error):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class PooledConnection:
+    """Proxy around a raw connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise Error("Connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Fixed-size MySQL connection pool with checkout timeouts and health checks.
+
+    Idle connections are reused most-recently-used first and pinged before
+    checkout only when they have sat idle longer than ``ping_interval``.
+    """
+
+    def __init__(self, config: dict, size: int, timeout: float, ping_interval: float):
+        self._config = config
+        self._size = size
+        self._timeout = timeout
+        self._ping_interval = ping_interval
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._checkouts = 0
+        self._exhausted = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self) -> PooledConnection:
+        start = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._exhausted += 1
+            if not self._slots.acquire(timeout=self._timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolExhaustedError(msg=f"No database connection available after {self._timeout}s")
+        waited = time.monotonic() - start
+
+        try:
+            conn = self._take_idle() or mysql.connector.connect(**self._config)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return PooledConnection(self, conn)
+
+    def _take_idle(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if time.monotonic() - last_used < self._ping_interval:
+                return conn
+            try:
+                conn.ping(reconnect=False)
+                return conn
+            except Error:
+                _close_quietly(conn)
+
+    def release(self, conn):
+        try:
+            conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put((conn, time.monotonic()))
+        except Exception:
+            _close_quietly(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            _close_quietly(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "exhausted": self._exhausted,
+                "timeouts": self._timeouts,
+                "wait_avg_ms": (self._wait_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "wait_max_ms": self._wait_max * 1000,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_PING_INTERVAL)
+    return _pool
+
 
 def get_db_connection():
     try:
-        return mysql.connector.connect(**DB_CONFIG)
+        return get_pool().acquire()
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+
+def close_pool():
+    if _pool is not None:
+        _pool.close()
+
+
+# ------------------------
+# Async access for route handlers
+# ------------------------
+# Driver calls run in worker threads so a slow query never blocks the event loop.
+# Query threads are capped at the pool size; checkouts use anyio's default limiter
+# so requests queued for a connection can't starve the ones already holding one.
+_query_limiter = None
+
+
+def _get_query_limiter():
+    global _query_limiter
+    if _query_limiter is None:
+        _query_limiter = anyio.CapacityLimiter(DB_POOL_SIZE)
+    return _query_limiter
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking driver call in a worker thread."""
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_get_query_limiter())
+
+
+class AsyncCursor:
+    """Buffered cursor whose execute() is awaitable; fetches read from memory."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, query, params=None):
+        await run_db(self._cursor.execute, query, params)
+
+    async def executemany(self, query, seq_params):
+        await run_db(self._cursor.executemany, query, seq_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class AsyncConnection:
+    """Awaitable facade over a pooled connection."""
+
+    def __init__(self, connection: PooledConnection):
+        self._connection = connection
+
+    def cursor(self, dictionary: bool = False) -> AsyncCursor:
+        return AsyncCursor(self._connection.cursor(buffered=True, dictionary=dictionary))
+
+    async def commit(self):
+        await run_db(self._connection.commit)
+
+    async def rollback(self):
+        await run_db(self._connection.rollback)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn(raw_connection, *args)`` in a worker thread, for multi-statement sync helpers."""
+        return await run_db(fn, self._connection, *args, **kwargs)
+
+    async def close(self):
+        await anyio.to_thread.run_sync(self._connection.close)
+
+
+async def get_async_connection():
+    connection = await anyio.to_thread.run_sync(get_db_connection)
+    return AsyncConnection(connection) if connection else None
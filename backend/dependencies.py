@@ -1,9 +1,21 @@
 # dependencies.py
-from fastapi import Request, HTTPException
-from db import get_db_connection
+from fastapi import Request, HTTPException, Depends
+from db import get_async_connection
 from security import verify_token
+from user_cache import user_cache
 
-async def get_current_user(request: Request):
+async def get_db():
+    # ✅ One pooled connection per request, shared by every dependency that asks for it.
+    # Queries on it are awaited and run off the event loop.
+    connection = await get_async_connection()
+    if not connection:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    try:
+        yield connection
+    finally:
+        await connection.close()
+
+async def get_current_user(request: Request, connection=Depends(get_db)):
     # ✅ Read JWT from Authorization header
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
@@ -14,17 +26,18 @@ async def get_current_user(request: Request):
     if not email:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
+    # ✅ Steady state: served from the in-process cache, no query
+    user = user_cache.get(email)
+    if user:
+        return user
 
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE email = %s AND active = 1", (email,))
+    await cursor.execute("SELECT * FROM users WHERE email = %s AND active = 1", (email,))
     user = cursor.fetchone()
     cursor.close()
-    connection.close()
 
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
+    user_cache.put(user)
     return user
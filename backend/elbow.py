@@ -0,0 +1,97 @@
+"""Parallel elbow search.
+
+Every (k, init) pair is an independent single-init KMeans fit, so the 9 x n_init
+fits of an elbow search are spread over a process pool and the best fit per k
+is kept. Each fit gets a seed drawn from ``random_state`` up front and ties are
+broken by init order, so results do not depend on the worker count or on the
+order in which fits finish.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from sklearn.cluster import KMeans
+from config import ELBOW_WORKERS
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    # one BLAS/OpenMP thread per worker; the pool itself provides the parallelism
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs OpenMP threads can deadlock
+            _pool = ProcessPoolExecutor(
+                max_workers=ELBOW_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _seeds(random_state: int, k: int, n_init: int) -> list:
+    # seeded per k, so a k gets the same fits whatever range it is searched in
+    return np.random.RandomState([random_state, k]).randint(np.iinfo(np.int32).max, size=n_init).tolist()
+
+
+def _fit_one(X, k: int, seed: int) -> KMeans:
+    return KMeans(n_clusters=k, n_init=1, random_state=seed).fit(X)
+
+
+def fit_elbow(X, k_min: int = 2, k_max: int = 10, n_init: int = 10, random_state: int = 42, on_progress=None):
+    """Fit KMeans for every k in ``[k_min, k_max]``; returns ``(wcss, models)``.
+
+    ``models`` maps k to its best fitted KMeans, so callers can reuse the model
+    for the chosen k instead of fitting it again. ``on_progress(done, total)``
+    is called as individual fits finish.
+    """
+    X = np.asarray(X)
+    X = np.ascontiguousarray(X, dtype=X.dtype if X.dtype == np.float32 else np.float64)
+    ks = list(range(k_min, k_max + 1))
+    tasks = [(k, i, seed) for k in ks for i, seed in enumerate(_seeds(random_state, k, n_init))]
+
+    # only the best fit per k is kept; (inertia, init index) makes the pick order-independent
+    best = {}
+    done = 0
+
+    def keep(k, i, model):
+        nonlocal done
+        if k not in best or (model.inertia_, i) < (best[k][0].inertia_, best[k][1]):
+            best[k] = (model, i)
+        done += 1
+        if on_progress:
+            on_progress(done, len(tasks))
+
+    if ELBOW_WORKERS <= 1:
+        for k, i, seed in tasks:
+            keep(k, i, _fit_one(X, k, seed))
+    else:
+        pool = _get_pool()
+        try:
+            futures = {pool.submit(_fit_one, X, k, seed): (k, i) for k, i, seed in tasks}
+            for future in as_completed(futures):
+                keep(*futures.pop(future), future.result())
+        except BrokenProcessPool:
+            shutdown_pool()  # a worker died; start a fresh pool next time
+            raise
+
+    models = {k: best[k][0] for k in ks}
+    wcss = [float(models[k].inertia_) for k in ks]
+    return wcss, models
+
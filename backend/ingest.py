@@ -0,0 +1,415 @@
+"""Bulk write path for uploaded datasets.
+
+Students are inserted with batched multi-row INSERTs (mysql-connector rewrites
+``executemany`` on an INSERT ... VALUES into a single statement per batch), and
+their generated ids are read back with one ordered query so cluster assignments
+can be written in bulk too. All functions are synchronous and take a raw
+connection or cursor; async routes call them through ``AsyncConnection.run``.
+"""
+import json
+import numpy as np
+import pandas as pd
+from config import INGEST_BATCH_ROWS
+from playground_store import INVALIDATE_SQL as INVALIDATE_PLAYGROUND_SQL, insert_playground_results
+
+INSERT_STUDENTS_SQL = """
+    INSERT INTO students (firstname, lastname, sex, program, municipality, income, shs_type, gwa, Honors, IncomeCategory, dataset_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+INSERT_ASSIGNMENTS_SQL = "INSERT INTO student_cluster (student_id, cluster_id, cluster_number) VALUES (%s, %s, %s)"
+INSERT_DATASET_SQL = "INSERT INTO datasets (filename, uploaded_by, upload_date, content_hash) VALUES (%s, %s, %s, %s)"
+INSERT_CLUSTER_SQL = "INSERT INTO clusters (dataset_id, k, centroids, model, metrics) VALUES (%s, %s, %s, %s, %s)"
+# assignments of the run changed after it was scored; GET /clusters/metrics recomputes on next read
+CLEAR_METRICS_SQL = "UPDATE clusters SET metrics = NULL WHERE id = %s"
+# readers only ever use the run this points at, so publishing a run is this one statement
+ACTIVATE_CLUSTER_SQL = "UPDATE datasets SET active_cluster_id = %s WHERE id = %s"
+RETIRE_CLUSTER_SQL = "UPDATE clusters SET retired_at = NOW() WHERE id = %s"
+
+TEXT_COLUMNS = ["firstname", "lastname", "sex", "program", "municipality", "shs_type", "Honors", "IncomeCategory"]
+NUMERIC_COLUMNS = ["income", "gwa"]
+_NA_MARKERS = ["n/a", "na", "none"]
+ID_PAGE_ROWS = 50000
+
+
+def _batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _blank_mask(series: pd.Series) -> pd.Series:
+    text = series.astype(str)
+    return series.isna() | (text.str.strip() == "") | text.str.lower().isin(_NA_MARKERS)
+
+
+def safe_text_column(series: pd.Series) -> list:
+    """Stripped text, with blank / N/A values stored as "Incomplete"."""
+    text = series.astype(str).str.strip()
+    return text.where(~_blank_mask(series), "Incomplete").tolist()
+
+
+def safe_numeric_column(series: pd.Series) -> list:
+    """Floats, with blank / N/A / unparseable values stored as -1."""
+    values = pd.to_numeric(series.where(~_blank_mask(series)), errors="coerce")
+    return values.fillna(-1).astype(float).tolist()
+
+
+def student_rows(df: pd.DataFrame, dataset_id: int) -> list:
+    """Build INSERT parameter tuples for every row of a normalized frame."""
+    columns = {}
+    for col in TEXT_COLUMNS:
+        columns[col] = safe_text_column(df[col]) if col in df.columns else ["Incomplete"] * len(df)
+    for col in NUMERIC_COLUMNS:
+        columns[col] = safe_numeric_column(df[col]) if col in df.columns else [-1.0] * len(df)
+
+    return list(zip(
+        columns["firstname"],
+        columns["lastname"],
+        columns["sex"],
+        columns["program"],
+        columns["municipality"],
+        columns["income"],
+        columns["shs_type"],
+        columns["gwa"],
+        columns["Honors"],
+        columns["IncomeCategory"],
+        [dataset_id] * len(df),
+    ))
+
+
+def _max_student_id(cursor, dataset_id: int) -> int:
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM students WHERE dataset_id = %s", (dataset_id,))
+    return cursor.fetchone()[0]
+
+
+def _student_ids_after(cursor, dataset_id: int, floor: int, expected: int, page_size: int = ID_PAGE_ROWS) -> np.ndarray:
+    # paged by id so a buffered cursor never holds more than one page of rows
+    ids = np.empty(expected, dtype=np.int64)
+    count = 0
+    while True:
+        cursor.execute(
+            "SELECT id FROM students WHERE dataset_id = %s AND id > %s ORDER BY id LIMIT %s",
+            (dataset_id, floor, page_size)
+        )
+        page = np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int64)
+        if count + len(page) > expected:
+            raise RuntimeError(f"Inserted {expected} students but read back more ids")
+        ids[count:count + len(page)] = page
+        count += len(page)
+        if len(page) < page_size:
+            break
+        floor = int(page[-1])
+    if count != expected:
+        raise RuntimeError(f"Inserted {expected} students but read back {count} ids")
+    return ids
+
+
+def _insert_rows(cursor, rows: list, batch_size: int, on_batch=None):
+    done = 0
+    for batch in _batches(rows, batch_size):
+        cursor.executemany(INSERT_STUDENTS_SQL, batch)
+        done += len(batch)
+        if on_batch:
+            on_batch(done)
+
+
+def insert_students(cursor, dataset_id: int, df: pd.DataFrame, batch_size: int = INGEST_BATCH_ROWS, on_progress=None) -> np.ndarray:
+    """Insert every row of ``df`` into ``dataset_id`` and return the new ids in row order.
+
+    Ids come back from one ``ORDER BY id`` query past the dataset's previous max id,
+    which holds because only the caller's transaction inserts into this dataset.
+    ``on_progress(rows_done, rows_total)`` is called after every batch.
+    """
+    floor = _max_student_id(cursor, dataset_id)
+    rows = student_rows(df, dataset_id)
+    on_batch = (lambda done: on_progress(done, len(rows))) if on_progress else None
+    _insert_rows(cursor, rows, batch_size, on_batch)
+    return _student_ids_after(cursor, dataset_id, floor, len(rows))
+
+
+def insert_assignments(cursor, cluster_id: int, student_ids, labels, batch_size: int = INGEST_BATCH_ROWS) -> int:
+    """Bulk insert ``student_cluster`` rows, skipping unclustered (-1) labels."""
+    student_ids = np.asarray(student_ids)
+    labels = np.asarray(labels)
+    keep = labels != -1
+    student_ids, labels = student_ids[keep], labels[keep]
+    # tuples are built one batch at a time; a list for every row would dwarf the arrays
+    for start in range(0, len(labels), batch_size):
+        batch = list(zip(
+            student_ids[start:start + batch_size].tolist(),
+            [cluster_id] * len(labels[start:start + batch_size]),
+            labels[start:start + batch_size].tolist(),
+        ))
+        cursor.executemany(INSERT_ASSIGNMENTS_SQL, batch)
+    return len(labels)
+
+
+def _cluster_params(dataset_id: int, k, centroids, model, metrics=None) -> tuple:
+    return (
+        dataset_id, k, json.dumps(centroids) if centroids else json.dumps([]),
+        json.dumps(model) if model else None, json.dumps(metrics) if metrics else None,
+    )
+
+
+def save_dataset(connection, filename: str, uploaded_by: int, uploaded_at, k, centroids, df: pd.DataFrame,
+                 content_hash: str = None, model: dict = None, metrics: dict = None, playground: list = None,
+                 on_progress=None) -> int:
+    """Write a dataset, its cluster run and all students/assignments in one transaction.
+
+    ``df`` must carry a ``Cluster`` column (-1 for rows left out of clustering).
+    ``model`` is the run's ClusterModel artifact (see model_registry.py) and ``metrics``
+    its quality metrics, both stored as JSON; ``playground`` the precomputed
+    playground results (see playground_store.py).
+    Returns the new dataset id.
+    """
+    connection.start_transaction()
+    cursor = connection.cursor(buffered=True)
+    try:
+        cursor.execute(INSERT_DATASET_SQL, (filename, uploaded_by, uploaded_at, content_hash))
+        dataset_id = cursor.lastrowid
+
+        cursor.execute(INSERT_CLUSTER_SQL, _cluster_params(dataset_id, k, centroids, model, metrics))
+        cluster_id = cursor.lastrowid
+        cursor.execute(ACTIVATE_CLUSTER_SQL, (cluster_id, dataset_id))
+
+        student_ids = insert_students(cursor, dataset_id, df, on_progress=on_progress)
+        insert_assignments(cursor, cluster_id, student_ids, df["Cluster"].to_numpy())
+        if playground:
+            insert_playground_results(cursor, dataset_id, student_ids, playground)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return dataset_id
+
+
+class ChunkedDatasetWriter:
+    """Writes a dataset chunk by chunk inside one transaction.
+
+    Students are inserted as each chunk arrives; the cluster run and the
+    assignments are written by ``finish`` once the labels are known, so nothing
+    but the student ids has to be held for the whole file.
+    """
+
+    def __init__(self, connection, batch_size: int = INGEST_BATCH_ROWS):
+        self._connection = connection
+        self._batch_size = batch_size
+        self._cursor = None
+        self.dataset_id = None
+        self.rows_written = 0
+        self._floor = 0
+
+    def begin(self, filename: str, uploaded_by: int, uploaded_at, content_hash: str = None) -> int:
+        self._connection.start_transaction()
+        self._cursor = self._connection.cursor(buffered=True)
+        self._cursor.execute(INSERT_DATASET_SQL, (filename, uploaded_by, uploaded_at, content_hash))
+        self.dataset_id = self._cursor.lastrowid
+        self._floor = _max_student_id(self._cursor, self.dataset_id)
+        return self.dataset_id
+
+    def write_chunk(self, df: pd.DataFrame):
+        _insert_rows(self._cursor, student_rows(df, self.dataset_id), self._batch_size)
+        self.rows_written += len(df)
+
+    def finish(self, k, centroids, labels, model: dict = None, metrics: dict = None) -> int:
+        """Write the cluster run and assignments (``labels`` in file order, -1 = unclustered) and commit."""
+        student_ids = _student_ids_after(self._cursor, self.dataset_id, self._floor, self.rows_written)
+        self._cursor.execute(INSERT_CLUSTER_SQL, _cluster_params(self.dataset_id, k, centroids, model, metrics))
+        cluster_id = self._cursor.lastrowid
+        self._cursor.execute(ACTIVATE_CLUSTER_SQL, (cluster_id, self.dataset_id))
+        insert_assignments(self._cursor, cluster_id, student_ids, labels, self._batch_size)
+        self._connection.commit()
+        self._cursor.close()
+        return self.dataset_id
+
+    def abort(self):
+        try:
+            self._connection.rollback()
+        finally:
+            if self._cursor is not None:
+                self._cursor.close()
+
+
+# ------------------------
+# Re-uploads of an identical file
+# ------------------------
+def find_dataset_by_hash(connection, content_hash: str):
+    """Latest dataset uploaded from a file with this hash, with its active cluster run.
+
+    Returns ``(dataset_id, cluster_id, k)`` or None. Editing a student clears the
+    dataset's hash, so only datasets that still match their file are found.
+    """
+    cursor = connection.cursor(buffered=True)
+    try:
+        cursor.execute(
+            """
+            SELECT d.id, c.id, c.k
+            FROM datasets d
+            LEFT JOIN clusters c ON c.id = d.active_cluster_id
+            WHERE d.content_hash = %s
+            ORDER BY d.id DESC
+            LIMIT 1
+            """,
+            (content_hash,)
+        )
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def clone_dataset(connection, source_id: int, source_cluster_id, filename: str, uploaded_by: int, uploaded_at, content_hash: str) -> int:
+    """Copy a dataset, its active cluster run and assignments server-side, in one transaction.
+
+    Students are copied with INSERT ... SELECT in id order, so the n-th new id
+    pairs with the n-th old one when the assignments are copied.
+    Returns the new dataset id.
+    """
+    connection.start_transaction()
+    cursor = connection.cursor(buffered=True)
+    try:
+        cursor.execute(INSERT_DATASET_SQL, (filename, uploaded_by, uploaded_at, content_hash))
+        dataset_id = cursor.lastrowid
+        cursor.execute(
+            """
+            INSERT INTO students (firstname, lastname, sex, program, municipality, income, shs_type, gwa, Honors, IncomeCategory, dataset_id)
+            SELECT firstname, lastname, sex, program, municipality, income, shs_type, gwa, Honors, IncomeCategory, %s
+            FROM students WHERE dataset_id = %s ORDER BY id
+            """,
+            (dataset_id, source_id)
+        )
+
+        if source_cluster_id is not None:
+            cursor.execute(
+                "INSERT INTO clusters (dataset_id, k, centroids, model, metrics) "
+                "SELECT %s, k, centroids, model, metrics FROM clusters WHERE id = %s",
+                (dataset_id, source_cluster_id)
+            )
+            cluster_id = cursor.lastrowid
+            cursor.execute(ACTIVATE_CLUSTER_SQL, (cluster_id, dataset_id))
+            cursor.execute(
+                """
+                INSERT INTO student_cluster (student_id, cluster_id, cluster_number)
+                SELECT n.id, %s, sc.cluster_number
+                FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS rn FROM students WHERE dataset_id = %s) o
+                JOIN (SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS rn FROM students WHERE dataset_id = %s) n ON n.rn = o.rn
+                JOIN student_cluster sc ON sc.student_id = o.id AND sc.cluster_id = %s
+                """,
+                (cluster_id, source_id, dataset_id, source_cluster_id)
+            )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return dataset_id
+
+
+# ------------------------
+# Appending to an existing dataset
+# ------------------------
+def append_students(connection, dataset_id: int, cluster_id, df: pd.DataFrame, labels, on_progress=None):
+    """Insert new rows into an existing dataset and assign them to ``cluster_id``, in one transaction.
+
+    ``labels`` follow ``df``'s rows (-1 = unclustered); pass ``cluster_id=None``
+    to insert without assignments. The rows are also left unassigned when
+    ``cluster_id`` is no longer the dataset's active run (a recluster replaced
+    it since the labels were predicted). Returns ``(student_ids, assigned)``,
+    the new ids in row order and whether they were assigned.
+    """
+    connection.start_transaction()
+    cursor = connection.cursor(buffered=True)
+    try:
+        # serializes appends to the same dataset, which insert_students' id read-back relies on,
+        # and keeps the active run from moving until the assignments are in
+        cursor.execute("SELECT active_cluster_id FROM datasets WHERE id = %s FOR UPDATE", (dataset_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Dataset {dataset_id} not found")
+        if cluster_id is not None and row[0] != cluster_id:
+            cluster_id = None
+        student_ids = insert_students(cursor, dataset_id, df, on_progress=on_progress)
+        if cluster_id is not None:
+            insert_assignments(cursor, cluster_id, student_ids, labels)
+            cursor.execute(CLEAR_METRICS_SQL, (cluster_id,))
+        # the dataset no longer matches the file it was uploaded from, nor its precomputed results
+        cursor.execute("UPDATE datasets SET content_hash = NULL WHERE id = %s", (dataset_id,))
+        cursor.execute(INVALIDATE_PLAYGROUND_SQL, (dataset_id,))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return student_ids, cluster_id is not None
+
+
+def set_student_assignment(connection, dataset_id: int, student_id: int, cluster_number=None, cluster_id=None) -> bool:
+    """Move one student's assignment in the dataset's active run, in one transaction.
+
+    With ``cluster_number=None`` the student's assignment is only removed (it
+    is no longer complete). ``cluster_id`` is the run ``cluster_number`` was
+    predicted for; when it is no longer the active run nothing is written and
+    False is returned.
+    """
+    connection.start_transaction()
+    cursor = connection.cursor(buffered=True)
+    try:
+        cursor.execute("SELECT active_cluster_id FROM datasets WHERE id = %s FOR UPDATE", (dataset_id,))
+        row = cursor.fetchone()
+        active = row[0] if row else None
+        if active is None or (cluster_id is not None and active != cluster_id):
+            connection.rollback()
+            return False
+        cursor.execute("DELETE FROM student_cluster WHERE cluster_id = %s AND student_id = %s", (active, student_id))
+        if cluster_number is not None:
+            cursor.execute(
+                "INSERT INTO student_cluster (student_id, cluster_id, cluster_number) VALUES (%s, %s, %s)",
+                (student_id, active, cluster_number)
+            )
+        cursor.execute(CLEAR_METRICS_SQL, (active,))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return True
+
+
+def replace_cluster_run(connection, dataset_id: int, k, centroids, model, student_ids, labels, metrics: dict = None):
+    """Write a new cluster run for a dataset and make it the active one; returns the new cluster id.
+
+    The run, its assignments and the move of ``datasets.active_cluster_id``
+    are one transaction, so readers see either the old run or the complete new
+    one, and the new run is never visible to cluster_gc.py as inactive. The
+    replaced run is stamped ``retired_at`` and left for cluster_gc.py. Returns
+    None (and writes nothing) when a run written after this one already went live.
+    """
+    connection.start_transaction()
+    cursor = connection.cursor(buffered=True)
+    try:
+        cursor.execute(INSERT_CLUSTER_SQL, _cluster_params(dataset_id, k, centroids, model, metrics))
+        cluster_id = cursor.lastrowid
+        insert_assignments(cursor, cluster_id, student_ids, labels)
+
+        # the dataset row is only locked from here to the commit, not during the bulk write
+        cursor.execute("SELECT active_cluster_id FROM datasets WHERE id = %s FOR UPDATE", (dataset_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Dataset {dataset_id} not found")
+        previous = row[0]
+        if previous is not None and previous > cluster_id:
+            connection.rollback()
+            return None
+        cursor.execute(ACTIVATE_CLUSTER_SQL, (cluster_id, dataset_id))
+        if previous is not None:
+            cursor.execute(RETIRE_CLUSTER_SQL, (previous,))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return cluster_id
@@ -0,0 +1,127 @@
+"""Background jobs for long-running work such as dataset ingestion.
+
+Jobs run on a small thread pool owned by the process, so they keep going when
+the client that started them disconnects. Progress is held in memory and read
+back through ``GET /datasets/jobs/{id}``; finished jobs are forgotten after
+JOB_RETENTION_SECONDS.
+"""
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import JOB_WORKERS, JOB_RETENTION_SECONDS
+
+
+class Job:
+    """Progress record for one background task. Workers report through ``update``."""
+
+    def __init__(self, kind: str, owner_id=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner_id = owner_id
+        self.status = "queued"  # queued -> running -> done | failed
+        self.stage = "queued"
+        self.percent = 0.0
+        self.rows_total = None
+        self.rows_done = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, stage: str = None, percent: float = None, rows_total: int = None, rows_done: int = None):
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            if percent is not None:
+                self.percent = round(min(max(percent, 0.0), 100.0), 1)
+            if rows_total is not None:
+                self.rows_total = rows_total
+            if rows_done is not None:
+                self.rows_done = rows_done
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "percent": self.percent,
+                "rows_total": self.rows_total,
+                "rows_done": self.rows_done,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+    def _finish(self, status: str, result=None, error: str = None):
+        with self._lock:
+            self.status = status
+            self.stage = status
+            self.result = result
+            self.error = error
+            if status == "done":
+                self.percent = 100.0
+            self.finished_at = time.time()
+
+
+class JobManager:
+    def __init__(self, workers: int, retention: float):
+        self._workers = workers
+        self._retention = retention
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="job-worker")
+        return self._executor
+
+    def submit(self, kind: str, fn, *args, owner_id=None, **kwargs) -> Job:
+        """Queue ``fn(job, *args, **kwargs)``; its return value becomes ``job.result``."""
+        job = Job(kind, owner_id)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            executor = self._get_executor()
+        executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn, args, kwargs):
+        with job._lock:
+            job.status = "running"
+        try:
+            result = fn(job, *args, **kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            job._finish("failed", error=str(e))
+        else:
+            job._finish("done", result=result)
+
+    def _prune(self):
+        cutoff = time.time() - self._retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+jobs = JobManager(JOB_WORKERS, JOB_RETENTION_SECONDS)
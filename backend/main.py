@@ -1,7 +1,17 @@
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import anyio
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from config import ALLOW_ORIGINS
+from config import ALLOW_ORIGINS, RUN_MIGRATIONS
+from db import close_pool, pool_stats
+from dependencies import get_current_user
+from activity_log import activity_log
+from jobs import jobs
+from elbow import shutdown_pool as shutdown_elbow_pool
+from migrations import migrate_on_startup
+from recluster_queue import recluster_scheduler
+from uploads import UploadSizeLimitMiddleware
 from routes import (
     auth,
     users,
@@ -13,8 +23,24 @@ from routes import (
     reports,
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if RUN_MIGRATIONS:
+        await anyio.to_thread.run_sync(migrate_on_startup)
+    activity_log.start()
+    yield
+    await recluster_scheduler.shutdown()
+    await anyio.to_thread.run_sync(jobs.shutdown)  # let running uploads finish
+    await anyio.to_thread.run_sync(shutdown_elbow_pool)
+    activity_log.stop()  # drain buffered log rows before the pool goes away
+    close_pool()
+
+
 # Initialize FastAPI app
-app = FastAPI(title="FreshGroup API", version="1.0.0")
+app = FastAPI(title="FreshGroup API", version="1.0.0", lifespan=lifespan)
+
+# Refuse oversized uploads before reading them (added first so CORS headers still wrap the 413)
+app.add_middleware(UploadSizeLimitMiddleware)
 
 # CORS configuration
 app.add_middleware(
@@ -49,6 +75,14 @@ def health_check():
         "docs": "/docs",
     }
 
+
+# Connection pool metrics (in-use count, wait time, exhaustion count) and activity log drops; Admins only
+@app.get("/health/db")
+def db_health(current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "Admin":
+        raise HTTPException(status_code=403, detail="Only Admins can view database pool metrics")
+    return {**pool_stats(), "activity_log": activity_log.stats()}
+
 # Only runs when starting locally (Railway uses Procfile / CMD)
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,402 @@
+"""Versioned schema migrations.
+
+Each migration is a function that receives a cursor and is applied once, in
+order, with its version recorded in ``schema_migrations``. Steps are written to
+be safe against databases created by hand before this module existed: tables
+use IF NOT EXISTS, and indexes / foreign keys are only added when missing.
+
+Run manually with ``python migrations.py`` (or ``python migrations.py explain``
+to check that the hot queries use their indexes). The app also applies pending
+migrations at startup unless RUN_MIGRATIONS is false. Rows orphaned before the
+foreign keys existed are only deleted by the manual run, which prints how many
+it removed; at startup their counts are printed and the migration refuses.
+"""
+import sys
+from db import get_db_connection
+
+LOCK_NAME = "freshgroup_schema_migrations"
+
+
+# ------------------------
+# Helpers
+# ------------------------
+def _index_exists(cursor, table: str, name: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+        (table, name),
+    )
+    return cursor.fetchone() is not None
+
+
+def _ensure_index(cursor, table: str, name: str, columns: str, unique: bool = False):
+    if not _index_exists(cursor, table, name):
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns})")
+
+
+def _column_exists(cursor, table: str, name: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1",
+        (table, name),
+    )
+    return cursor.fetchone() is not None
+
+
+def _ensure_column(cursor, table: str, name: str, definition: str):
+    if not _column_exists(cursor, table, name):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+def _foreign_key_exists(cursor, table: str, column: str, ref_table: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM information_schema.key_column_usage "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s AND referenced_table_name = %s LIMIT 1",
+        (table, column, ref_table),
+    )
+    return cursor.fetchone() is not None
+
+
+def _ensure_cascade_fk(cursor, table: str, column: str, ref_table: str, name: str):
+    """Add ``table.column -> ref_table.id ON DELETE CASCADE``, replacing a non-cascading FK on the same column."""
+    cursor.execute(
+        """
+        SELECT k.constraint_name, r.delete_rule
+        FROM information_schema.key_column_usage k
+        JOIN information_schema.referential_constraints r
+            ON r.constraint_schema = k.constraint_schema AND r.constraint_name = k.constraint_name
+        WHERE k.table_schema = DATABASE() AND k.table_name = %s AND k.column_name = %s
+            AND k.referenced_table_name = %s
+        """,
+        (table, column, ref_table),
+    )
+    existing = cursor.fetchall()
+    if any(row[1] == "CASCADE" for row in existing):
+        return
+    for constraint_name, _ in existing:
+        cursor.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {constraint_name}")
+
+    # orphaned rows would make the constraint fail; run_migrations deals with them first
+    cursor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) "
+        f"REFERENCES {ref_table} (id) ON DELETE CASCADE"
+    )
+
+
+# ------------------------
+# Migrations
+# ------------------------
+def _m001_base_schema(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            email VARCHAR(255) NOT NULL UNIQUE,
+            password_hash VARCHAR(255) NOT NULL,
+            role VARCHAR(20) NOT NULL DEFAULT 'Viewer',
+            profile TEXT NULL,
+            active TINYINT(1) NOT NULL DEFAULT 1,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS activity_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            action VARCHAR(100) NOT NULL,
+            details TEXT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS datasets (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            filename VARCHAR(255) NOT NULL,
+            uploaded_by INT NULL,
+            upload_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS clusters (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            dataset_id INT NOT NULL,
+            k INT NULL,
+            centroids LONGTEXT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS students (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            firstname VARCHAR(100) NULL,
+            lastname VARCHAR(100) NULL,
+            sex VARCHAR(20) NULL,
+            program VARCHAR(150) NULL,
+            municipality VARCHAR(100) NULL,
+            income DOUBLE NULL,
+            SHS_type VARCHAR(50) NULL,
+            GWA DOUBLE NULL,
+            Honors VARCHAR(50) NULL,
+            IncomeCategory VARCHAR(50) NULL,
+            dataset_id INT NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS student_cluster (
+            student_id INT NOT NULL,
+            cluster_id INT NOT NULL,
+            cluster_number INT NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def _m002_hot_query_indexes(cursor):
+    # get_students filters and get_dashboard_stats GROUP BYs: (dataset_id, column)
+    # lets each count be answered from the index alone
+    for name, column in [
+        ("program", "program"),
+        ("sex", "sex"),
+        ("municipality", "municipality"),
+        ("income_category", "IncomeCategory"),
+        ("shs_type", "SHS_type"),
+        ("honors", "Honors"),
+    ]:
+        _ensure_index(cursor, "students", f"idx_students_dataset_{name}", f"dataset_id, {column}")
+
+    _ensure_index(cursor, "datasets", "idx_datasets_upload_date", "upload_date, id")
+    _ensure_index(cursor, "clusters", "idx_clusters_dataset", "dataset_id, id")
+    _ensure_index(cursor, "student_cluster", "idx_student_cluster_cluster", "cluster_id, student_id, cluster_number")
+    _ensure_index(cursor, "student_cluster", "idx_student_cluster_student", "student_id")
+    _ensure_index(cursor, "activity_logs", "idx_activity_logs_user_created", "user_id, created_at")
+    _ensure_index(cursor, "activity_logs", "idx_activity_logs_created", "created_at")
+
+
+# (table, column, referenced table, constraint name), parents first so orphans are removed top-down
+CASCADE_FOREIGN_KEYS = [
+    ("students", "dataset_id", "datasets", "fk_students_dataset"),
+    ("clusters", "dataset_id", "datasets", "fk_clusters_dataset"),
+    ("student_cluster", "student_id", "students", "fk_student_cluster_student"),
+    ("student_cluster", "cluster_id", "clusters", "fk_student_cluster_cluster"),
+]
+
+
+def _m003_cascade_foreign_keys(cursor):
+    # deleting a dataset (or a cluster run) now removes its dependent rows
+    for table, column, ref_table, name in CASCADE_FOREIGN_KEYS:
+        _ensure_cascade_fk(cursor, table, column, ref_table, name)
+
+
+def _m004_dataset_content_hash(cursor):
+    # SHA-256 of the uploaded file, so re-uploading the same file is a lookup
+    _ensure_column(cursor, "datasets", "content_hash", "CHAR(64) NULL")
+    _ensure_index(cursor, "datasets", "idx_datasets_content_hash", "content_hash, id")
+
+
+def _m005_cluster_model(cursor):
+    # scaler parameters and feature list of a run, so new rows can be assigned without a refit
+    _ensure_column(cursor, "clusters", "model", "LONGTEXT NULL")
+
+
+def _m006_playground_results(cursor):
+    # GWA/income clusterings for k = 2..10, precomputed at upload (playground_store.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS playground_results (
+            dataset_id INT NOT NULL,
+            k INT NOT NULL,
+            centroids TEXT NOT NULL,
+            metrics TEXT NULL,
+            student_ids LONGBLOB NOT NULL,
+            labels LONGBLOB NOT NULL,
+            PRIMARY KEY (dataset_id, k),
+            CONSTRAINT fk_playground_results_dataset FOREIGN KEY (dataset_id)
+                REFERENCES datasets (id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def _m007_active_cluster_run(cursor):
+    # the run readers use; reclusters write a new run and move this pointer, and cluster_gc.py drops the old ones
+    _ensure_column(cursor, "datasets", "active_cluster_id", "INT NULL")
+    # when a run stopped being active; cluster_gc.py keeps it for a grace period after that
+    _ensure_column(cursor, "clusters", "retired_at", "DATETIME NULL")
+    cursor.execute("""
+        UPDATE datasets d
+        SET active_cluster_id = (SELECT MAX(c.id) FROM clusters c WHERE c.dataset_id = d.id)
+        WHERE active_cluster_id IS NULL
+    """)
+    if not _foreign_key_exists(cursor, "datasets", "active_cluster_id", "clusters"):
+        # a pointer can never name a deleted run
+        cursor.execute("""
+            UPDATE datasets d LEFT JOIN clusters c ON c.id = d.active_cluster_id
+            SET d.active_cluster_id = NULL
+            WHERE d.active_cluster_id IS NOT NULL AND c.id IS NULL
+        """)
+        if cursor.rowcount:
+            print(f"Cleared {cursor.rowcount} active_cluster_id pointer(s) to missing cluster runs")
+        cursor.execute(
+            "ALTER TABLE datasets ADD CONSTRAINT fk_datasets_active_cluster FOREIGN KEY (active_cluster_id) "
+            "REFERENCES clusters (id) ON DELETE SET NULL"
+        )
+
+
+def _m008_cluster_metrics(cursor):
+    # quality metrics of a run, computed when it is written (cluster_metrics.py)
+    _ensure_column(cursor, "clusters", "metrics", "TEXT NULL")
+
+
+MIGRATIONS = [
+    (1, "base schema", _m001_base_schema),
+    (2, "hot query indexes", _m002_hot_query_indexes),
+    (3, "cascading foreign keys", _m003_cascade_foreign_keys),
+    (4, "dataset content hash", _m004_dataset_content_hash),
+    (5, "cluster model parameters", _m005_cluster_model),
+    (6, "precomputed playground results", _m006_playground_results),
+    (7, "active cluster run pointer", _m007_active_cluster_run),
+    (8, "cluster run metrics", _m008_cluster_metrics),
+]
+
+
+# ------------------------
+# Runner
+# ------------------------
+def _orphan_count(cursor, table: str, column: str, ref_table: str) -> int:
+    cursor.execute(
+        f"SELECT COUNT(*) FROM {table} t LEFT JOIN {ref_table} p ON t.{column} = p.id "
+        f"WHERE t.{column} IS NOT NULL AND p.id IS NULL"
+    )
+    return cursor.fetchone()[0]
+
+
+def _handle_orphans(connection, cursor, delete_orphans: bool):
+    """Deal with rows the cascading foreign keys (m003) would reject before that migration runs.
+
+    Without ``delete_orphans`` the counts are printed and a RuntimeError is
+    raised; with it every orphan is deleted and the counts are printed.
+    """
+    found = {}
+    for table, column, ref_table, _ in CASCADE_FOREIGN_KEYS:
+        count = _orphan_count(cursor, table, column, ref_table)
+        if count and not delete_orphans:
+            found[f"{table}.{column}"] = count
+            continue
+        if count:
+            cursor.execute(
+                f"DELETE t FROM {table} t LEFT JOIN {ref_table} p ON t.{column} = p.id "
+                f"WHERE t.{column} IS NOT NULL AND p.id IS NULL"
+            )
+            connection.commit()
+            print(f"Deleted {cursor.rowcount} {table} row(s) whose {column} has no {ref_table} row")
+    if found:
+        for key, count in found.items():
+            print(f"Orphaned rows in {key}: {count}")
+        raise RuntimeError(
+            "Orphaned rows block the cascading foreign keys; run `python migrations.py` to delete them and migrate"
+        )
+
+
+def run_migrations(connection, delete_orphans: bool = False) -> list:
+    """Apply pending migrations; returns the versions applied.
+
+    ``delete_orphans`` lets the cascading foreign keys migration delete rows
+    whose parent no longer exists (see _handle_orphans); only the manual run sets it.
+    """
+    cursor = connection.cursor(buffered=True)
+    cursor.execute("SELECT GET_LOCK(%s, 60)", (LOCK_NAME,))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise RuntimeError("Timed out waiting for the schema migration lock")
+
+    applied = []
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        cursor.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cursor.fetchall()}
+
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            if migrate is _m003_cascade_foreign_keys:
+                _handle_orphans(connection, cursor, delete_orphans)
+            print(f"Applying migration {version}: {name}")
+            migrate(cursor)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            connection.commit()
+            applied.append(version)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+        cursor.close()
+    return applied
+
+
+def migrate_on_startup():
+    connection = get_db_connection()
+    if not connection:
+        print("Skipping migrations: database connection failed")
+        return
+    try:
+        run_migrations(connection)
+    finally:
+        connection.close()
+
+
+# ------------------------
+# EXPLAIN check for the hot queries
+# ------------------------
+# (description, query, expected index) — params are filled with the latest dataset/cluster/user
+HOT_QUERIES = [
+    ("latest dataset", "SELECT id FROM datasets ORDER BY upload_date DESC, id DESC LIMIT 1", "idx_datasets_upload_date"),
+    ("students by dataset + program", "SELECT * FROM students WHERE dataset_id = %(dataset_id)s AND program = 'x'", "idx_students_dataset_program"),
+    ("dashboard sex counts", "SELECT sex, COUNT(*) FROM students WHERE dataset_id = %(dataset_id)s GROUP BY sex", "idx_students_dataset_sex"),
+    ("dashboard honors counts", "SELECT Honors, COUNT(*) FROM students WHERE dataset_id = %(dataset_id)s GROUP BY Honors", "idx_students_dataset_honors"),
+    ("active cluster run", "SELECT active_cluster_id FROM datasets WHERE id = %(dataset_id)s", "PRIMARY"),
+    ("cluster runs of a dataset", "SELECT id FROM clusters WHERE dataset_id = %(dataset_id)s", "idx_clusters_dataset"),
+    ("dataset by content hash", "SELECT id FROM datasets WHERE content_hash = 'x' ORDER BY id DESC LIMIT 1", "idx_datasets_content_hash"),
+    ("assignments by cluster", "SELECT student_id, cluster_number FROM student_cluster WHERE cluster_id = %(cluster_id)s", "idx_student_cluster_cluster"),
+    ("user activity", "SELECT id FROM activity_logs WHERE user_id = %(user_id)s ORDER BY created_at DESC", "idx_activity_logs_user_created"),
+]
+
+
+def explain_hot_queries(connection) -> list:
+    """Return ``(description, expected_index, used_key, ok)`` for each hot query."""
+    cursor = connection.cursor(buffered=True, dictionary=True)
+    params = {"dataset_id": 0, "cluster_id": 0, "user_id": 0}
+    for key, sql in [
+        ("dataset_id", "SELECT id FROM datasets ORDER BY upload_date DESC LIMIT 1"),
+        ("cluster_id", "SELECT id FROM clusters ORDER BY id DESC LIMIT 1"),
+        ("user_id", "SELECT id FROM users ORDER BY id LIMIT 1"),
+    ]:
+        cursor.execute(sql)
+        row = cursor.fetchone()
+        if row:
+            params[key] = row["id"]
+
+    results = []
+    for description, query, expected in HOT_QUERIES:
+        cursor.execute("EXPLAIN " + query, params)
+        plan = cursor.fetchall()
+        used = plan[0].get("key") if plan else None
+        results.append((description, expected, used, used == expected))
+    cursor.close()
+    return results
+
+
+if __name__ == "__main__":
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("Database connection failed")
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == "explain":
+            failures = 0
+            for description, expected, used, ok in explain_hot_queries(conn):
+                failures += not ok
+                print(f"{'OK  ' if ok else 'FAIL'} {description}: expected {expected}, used {used}")
+            sys.exit(1 if failures else 0)
+        applied = run_migrations(conn, delete_orphans=True)
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    finally:
+        conn.close()
@@ -0,0 +1,180 @@
+"""Persisted cluster models, so stored runs can place students without a refit.
+
+A cluster run's ``clusters.model`` column holds a small JSON artifact: the
+feature list, the label vocabulary of each categorical feature, the
+StandardScaler mean/scale, the centroids in scaled space and the fit's
+inertia per clustered student. ``ClusterModel``
+rebuilds the feature matrix from any student frame and predicts in O(n·k);
+``model_registry`` loads the artifact of a dataset's active run and keeps
+recent ones in memory (runs are never modified once written).
+"""
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+MODEL_VERSION = 1
+ACTIVE_RUN_SQL = """
+    SELECT c.id, c.k, c.centroids, c.model
+    FROM datasets d JOIN clusters c ON c.id = d.active_cluster_id
+    WHERE d.id = %s
+"""
+RUN_SQL = "SELECT id, k, centroids, model FROM clusters WHERE id = %s"
+
+
+class ClusterModel:
+    def __init__(self, features, mean, scale, centers, vocabularies=None, inertia=None):
+        self.features = list(features)
+        self.vocabularies = dict(vocabularies or {})  # feature -> sorted class labels (LabelEncoder.classes_)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.centers = np.asarray(centers, dtype=float)  # scaled space
+        self.inertia = inertia  # mean squared distance to the own center (scaled space); None on older artifacts
+
+    @property
+    def k(self) -> int:
+        return len(self.centers)
+
+    @classmethod
+    def from_fitted(cls, features, scaler, kmeans, vocabularies=None):
+        inertia = float(kmeans.inertia_) / len(kmeans.labels_)
+        return cls(features, scaler.mean_, scaler.scale_, kmeans.cluster_centers_, vocabularies, inertia)
+
+    @classmethod
+    def from_dict(cls, data: dict, centroids=None):
+        """Load an artifact; unversioned ones (scaler only) take their centers from ``centroids``."""
+        mean = np.asarray(data["mean"], dtype=float)
+        scale = np.asarray(data["scale"], dtype=float)
+        if "centers" in data:
+            centers = data["centers"]
+        else:
+            centers = (np.asarray(centroids, dtype=float) - mean) / scale
+        return cls(data["features"], mean, scale, centers, data.get("vocabularies"), data.get("inertia"))
+
+    def to_dict(self) -> dict:
+        return {
+            "version": MODEL_VERSION,
+            "features": self.features,
+            "vocabularies": self.vocabularies,
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "centers": self.centers.tolist(),
+            "inertia": self.inertia,
+        }
+
+    def centroids(self) -> list:
+        """Centers in original feature units, as stored in ``clusters.centroids``."""
+        return (self.centers * self.scale + self.mean).tolist()
+
+    def matches(self, features, k: int) -> bool:
+        return self.features == list(features) and self.k == k
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Scaled feature matrix for ``df`` (column names matched case-insensitively).
+
+        Numbers are coerced with blanks as 0, as at fit time; categories the model
+        never saw are placed at the feature mean.
+        """
+        columns = {str(col).lower(): col for col in df.columns}
+        X = np.empty((len(df), len(self.features)), dtype=float)
+        for j, feature in enumerate(self.features):
+            values = df[columns[feature]]
+            if feature in self.vocabularies:
+                codes = pd.Categorical(values.astype(str), categories=self.vocabularies[feature]).codes
+                X[:, j] = np.where(codes >= 0, codes, self.mean[j])
+            else:
+                X[:, j] = pd.to_numeric(values, errors="coerce").fillna(0).to_numpy(dtype=float)
+        return (X - self.mean) / self.scale
+
+    def predict_with_distance(self, df: pd.DataFrame):
+        """Nearest-centroid labels and their distances (scaled space) for every row of ``df``."""
+        X = self.transform(df)
+        distances = np.sqrt(((X[:, None, :] - self.centers[None, :, :]) ** 2).sum(axis=2))
+        labels = distances.argmin(axis=1)
+        return labels, distances[np.arange(len(labels)), labels]
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        return self.predict_with_distance(df)[0]
+
+
+def _load(run):
+    if not run or not run.get("model") or not run.get("k"):
+        return None
+    try:
+        data = json.loads(run["model"]) if isinstance(run["model"], str) else run["model"]
+        centroids = json.loads(run["centroids"]) if isinstance(run["centroids"], str) else run["centroids"]
+        model = ClusterModel.from_dict(data, centroids)
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Ignoring unreadable model of cluster run {run.get('id')}:", e)
+        return None
+    return model if model.k == run["k"] else None
+
+
+class ModelRegistry:
+    """Loads the model of a dataset's active cluster run, caching models by cluster id."""
+
+    def __init__(self, max_entries: int = 16):
+        self._max_entries = max_entries
+        self._models = OrderedDict()  # cluster_id -> ClusterModel | None
+        self._lock = threading.Lock()
+
+    async def latest(self, connection, dataset_id: int):
+        """Return ``(cluster_id, model)`` for the dataset's active run; either may be None."""
+        cursor = connection.cursor(dictionary=True)
+        await cursor.execute("SELECT active_cluster_id AS id FROM datasets WHERE id = %s", (dataset_id,))
+        row = cursor.fetchone()
+        if not row or row["id"] is None:
+            cursor.close()
+            return None, None
+        cached, model = self._cached(row["id"])
+        if not cached:
+            await cursor.execute(ACTIVE_RUN_SQL, (dataset_id,))
+            row = cursor.fetchone()
+            model = self._remember(row)
+        cursor.close()
+        return (row["id"], model) if row else (None, None)
+
+    async def get(self, connection, cluster_id: int):
+        """The model of one cluster run by id, whether or not it is still active; None when it has none."""
+        cached, model = self._cached(cluster_id)
+        if cached:
+            return model
+        cursor = connection.cursor(dictionary=True)
+        await cursor.execute(RUN_SQL, (cluster_id,))
+        run = cursor.fetchone()
+        cursor.close()
+        return self._remember(run)
+
+    def latest_sync(self, connection, dataset_id: int):
+        """Same as latest() for code already running in a worker thread."""
+        cursor = connection.cursor(buffered=True, dictionary=True)
+        try:
+            cursor.execute(ACTIVE_RUN_SQL, (dataset_id,))
+            run = cursor.fetchone()
+        finally:
+            cursor.close()
+        if not run:
+            return None, None
+        cached, model = self._cached(run["id"])
+        return run["id"], model if cached else self._remember(run)
+
+    def _cached(self, cluster_id):
+        with self._lock:
+            if cluster_id in self._models:
+                self._models.move_to_end(cluster_id)
+                return True, self._models[cluster_id]
+            return False, None
+
+    def _remember(self, run):
+        model = _load(run)
+        if run:
+            with self._lock:
+                self._models[run["id"]] = model
+                self._models.move_to_end(run["id"])
+                while len(self._models) > self._max_entries:
+                    self._models.popitem(last=False)
+        return model
+
+
+model_registry = ModelRegistry()
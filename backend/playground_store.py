@@ -0,0 +1,64 @@
+"""Playground clusterings precomputed at upload time.
+
+The playground only offers k = 2..10 on GWA/income, so uploads store all nine
+results in ``playground_results``: one row per (dataset, k) holding the
+centroids, quality metrics and the assignments as two zlib-compressed arrays
+(clustered student ids as int64 deltas, labels as int8). Rows are dropped when
+the dataset's students change, after which the playground fits on demand again.
+"""
+import json
+import zlib
+import numpy as np
+
+PLAYGROUND_FEATURES = ["gwa", "income"]
+PLAYGROUND_K_RANGE = range(2, 11)
+
+INSERT_RESULT_SQL = """
+    INSERT INTO playground_results (dataset_id, k, centroids, metrics, student_ids, labels)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+INVALIDATE_SQL = "DELETE FROM playground_results WHERE dataset_id = %s"
+
+
+def pack_assignments(student_ids, labels):
+    ids = np.asarray(student_ids, dtype=np.int64)
+    # ids of one upload are nearly consecutive, so their deltas compress to almost nothing
+    deltas = np.diff(ids, prepend=0)
+    return (
+        zlib.compress(deltas.tobytes()),
+        zlib.compress(np.asarray(labels, dtype=np.int8).tobytes()),
+    )
+
+
+def unpack_assignments(ids_blob: bytes, labels_blob: bytes):
+    ids = np.cumsum(np.frombuffer(zlib.decompress(ids_blob), dtype=np.int64))
+    labels = np.frombuffer(zlib.decompress(labels_blob), dtype=np.int8).astype(int)
+    return ids, labels
+
+
+def insert_playground_results(cursor, dataset_id: int, student_ids, results: list):
+    """Store precomputed results; each has ``k``, ``labels`` (per row, -1 = unclustered), ``centroids``, ``metrics``."""
+    student_ids = np.asarray(student_ids)
+    for result in results:
+        labels = np.asarray(result["labels"])
+        keep = labels != -1
+        ids_blob, labels_blob = pack_assignments(student_ids[keep], labels[keep])
+        cursor.execute(INSERT_RESULT_SQL, (
+            dataset_id, result["k"], json.dumps(result["centroids"]), json.dumps(result["metrics"]),
+            ids_blob, labels_blob,
+        ))
+
+
+async def load_playground_result(connection, dataset_id: int, k: int):
+    """``(student_ids, labels, centroids, metrics)`` stored for this dataset and k, or None."""
+    cursor = connection.cursor(dictionary=True)
+    await cursor.execute(
+        "SELECT centroids, metrics, student_ids, labels FROM playground_results WHERE dataset_id = %s AND k = %s",
+        (dataset_id, k)
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    if not row:
+        return None
+    ids, labels = unpack_assignments(row["student_ids"], row["labels"])
+    return ids, labels, json.loads(row["centroids"]), json.loads(row["metrics"]) if row["metrics"] else None
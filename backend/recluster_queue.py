@@ -0,0 +1,125 @@
+"""Debounced, coalescing reclusters for student edits.
+
+A recluster request for a dataset waits RECLUSTER_DEBOUNCE_SECONDS for further
+requests (at most RECLUSTER_MAX_DELAY_SECONDS after the first), and the waiting
+requests collapse into one run with the latest request's k, in a worker thread.
+Runs of a dataset never overlap: a request made while one is running queues a
+single follow-up run, and the running one skips its write once it has been
+superseded, so the latest request always decides the stored result.
+"""
+import asyncio
+import threading
+import time
+import anyio
+from config import RECLUSTER_DEBOUNCE_SECONDS, RECLUSTER_MAX_DELAY_SECONDS
+
+
+class _DatasetQueue:
+    def __init__(self):
+        self.generation = 0  # bumped by every request; a run is current while it matches
+        self.pending = None
+        self.running = None
+        self.last = None
+        self.first_requested = None
+        self.due = None
+        self.task = None
+
+
+class ReclusterScheduler:
+    def __init__(self, debounce: float, max_delay: float):
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._queues = {}  # dataset_id -> _DatasetQueue
+        self._lock = threading.Lock()
+
+    def request(self, dataset_id: int, k: int, run, requested_by=None) -> dict:
+        """Schedule ``run(dataset_id, k, is_latest)`` (blocking) for the dataset; returns its status.
+
+        ``run`` should check ``is_latest()`` right before writing and skip the
+        write when it returns False. Must be called from the event loop.
+        """
+        now = time.monotonic()
+        with self._lock:
+            queue = self._queues.setdefault(dataset_id, _DatasetQueue())
+            queue.generation += 1
+            if queue.pending is None:
+                queue.first_requested = now
+            queue.pending = {
+                "k": k,
+                "run": run,
+                "generation": queue.generation,
+                "requested_by": requested_by,
+                "requested_at": time.time(),
+                "coalesced": queue.pending["coalesced"] + 1 if queue.pending else 1,
+            }
+            queue.due = min(now + self._debounce, queue.first_requested + self._max_delay)
+            if queue.task is None:
+                queue.task = asyncio.get_running_loop().create_task(self._drain(dataset_id, queue))
+        return self.status(dataset_id)
+
+    def status(self, dataset_id: int) -> dict:
+        with self._lock:
+            queue = self._queues.get(dataset_id)
+            if queue is None:
+                return {"dataset_id": dataset_id, "pending": None, "running": None, "last": None}
+            return {
+                "dataset_id": dataset_id,
+                "pending": _public(queue.pending),
+                "running": _public(queue.running),
+                "last": queue.last,
+            }
+
+    async def _drain(self, dataset_id: int, queue: _DatasetQueue):
+        try:
+            while True:
+                with self._lock:
+                    if queue.pending is None:
+                        queue.task = None
+                        return
+                    delay = queue.due - time.monotonic()
+                    if delay <= 0:
+                        req, queue.pending, queue.running = queue.pending, None, queue.pending
+                        req["started_at"] = time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                def is_latest(generation=req["generation"]):
+                    with self._lock:
+                        return queue.generation == generation
+
+                status, error, result = "done", None, None
+                try:
+                    result = await anyio.to_thread.run_sync(req["run"], dataset_id, req["k"], is_latest)
+                    if not is_latest():
+                        status = "superseded"
+                except Exception as e:
+                    print(f"Recluster of dataset {dataset_id} failed:", e)
+                    status, error = "failed", str(e)
+                with self._lock:
+                    queue.running = None
+                    queue.last = {**_public(req), "status": status, "error": error, "result": result,
+                                  "finished_at": time.time()}
+        except asyncio.CancelledError:
+            with self._lock:
+                queue.task = None
+            raise
+
+    async def shutdown(self):
+        """Drop pending requests; a run already in its worker thread still finishes."""
+        with self._lock:
+            tasks = [queue.task for queue in self._queues.values() if queue.task is not None]
+            for queue in self._queues.values():
+                queue.pending = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _public(req):
+    if req is None:
+        return None
+    return {key: value for key, value in req.items() if key not in ("run", "generation")}
+
+
+recluster_scheduler = ReclusterScheduler(RECLUSTER_DEBOUNCE_SECONDS, RECLUSTER_MAX_DELAY_SECONDS)
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException, Response, Depends
 from pydantic import BaseModel
-from db import get_db_connection
 from security import verify_password, get_password_hash, create_access_token
-from dependencies import get_current_user
+from dependencies import get_current_user, get_db
+from user_cache import user_cache
 from config import ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, MAILJET_API_KEY, MAILJET_SECRET_KEY, MAILJET_SENDER
 from mailjet_rest import Client
 from jose import jwt, JWTError
@@ -49,23 +49,20 @@ class ResetPasswordRequest(BaseModel):
 
 # 🔹 LOGIN
 @router.post("/auth/login")
-async def login(payload: LoginRequest, response: Response):
+async def login(payload: LoginRequest, response: Response, connection=Depends(get_db)):
     email = payload.email
     password = payload.password
 
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE email = %s AND active = TRUE", (email,))
+    await cursor.execute("SELECT * FROM users WHERE email = %s AND active = TRUE", (email,))
     user = cursor.fetchone()
     cursor.close()
-    connection.close()
 
     if not user or not verify_password(password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    user_cache.put(user)
+
     access_token = create_access_token(data={"sub": user["email"]})
 
     # ✅ Log user login
@@ -94,8 +91,8 @@ async def login(payload: LoginRequest, response: Response):
 
 # 🔹 LOGOUT
 @router.post("/auth/logout")
-async def logout(response: Response, current_user: dict = Depends(get_current_user)):
-    user = resolve_user(current_user)
+async def logout(response: Response, current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    user = await resolve_user(current_user, connection)
     if user:
         log_activity(user["id"], "Logout", "User logged out of the system")
 
@@ -105,31 +102,25 @@ async def logout(response: Response, current_user: dict = Depends(get_current_us
 
 # 🔹 REGISTER (Anyone can register, defaults to Viewer)
 @router.post("/auth/register")
-async def register(payload: RegisterRequest):
+async def register(payload: RegisterRequest, connection=Depends(get_db)):
     email = payload.email
     password = payload.password
     profile = payload.profile or {}
 
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+    await cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
     if cursor.fetchone():
         cursor.close()
-        connection.close()
         raise HTTPException(status_code=400, detail="Email already registered")
 
     hashed_password = get_password_hash(password)
-    cursor.execute(
+    await cursor.execute(
         "INSERT INTO users (email, password_hash, role, profile) VALUES (%s, %s, %s, %s)",
         (email, hashed_password, "Viewer", json.dumps(profile)),
     )
-    connection.commit()
+    await connection.commit()
     new_user_id = cursor.lastrowid
     cursor.close()
-    connection.close()
 
     # ✅ Log registration (user self-registered)
     log_activity(new_user_id, "Register", f"New user registered with email: {email}")
@@ -150,13 +141,11 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 
 # 🔹 FORGOT PASSWORD
 @router.post("/auth/forgot-password")
-async def forgot_password(payload: ForgotPasswordRequest):
-    connection = get_db_connection()
+async def forgot_password(payload: ForgotPasswordRequest, connection=Depends(get_db)):
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE email = %s", (payload.email,))
+    await cursor.execute("SELECT * FROM users WHERE email = %s", (payload.email,))
     user = cursor.fetchone()
     cursor.close()
-    connection.close()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -198,7 +187,7 @@ async def forgot_password(payload: ForgotPasswordRequest):
 
 # 🔹 RESET PASSWORD
 @router.post("/auth/reset-password")
-async def reset_password(payload: ResetPasswordRequest):
+async def reset_password(payload: ResetPasswordRequest, connection=Depends(get_db)):
     try:
         decoded = jwt.decode(payload.token, RESET_SECRET_KEY, algorithms=[RESET_ALGORITHM])
         email = decoded.get("sub")
@@ -209,18 +198,18 @@ async def reset_password(payload: ResetPasswordRequest):
     if len(pwd) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
 
-    connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+    await cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
     user = cursor.fetchone()
     if not user:
+        cursor.close()
         raise HTTPException(status_code=404, detail="User not found")
 
     hashed_password = get_password_hash(pwd)
-    cursor.execute("UPDATE users SET password_hash = %s WHERE email = %s", (hashed_password, email))
-    connection.commit()
+    await cursor.execute("UPDATE users SET password_hash = %s WHERE email = %s", (hashed_password, email))
+    await connection.commit()
     cursor.close()
-    connection.close()
+    user_cache.invalidate(email=email)
 
     # ✅ Log password reset success
     log_activity(user["id"], "Reset Password", "User successfully reset their password")
@@ -2,35 +2,28 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 import io, csv
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 import matplotlib.pyplot as plt
-from dependencies import get_current_user
-from db import get_db_connection
+from dependencies import get_current_user, get_db
+from dataset_registry import current_dataset
 from utils_complete import filter_complete_students_df
 import routes.clusters as clusters_module
 
 router = APIRouter()
 
 # Fetch all students from latest dataset
-def fetch_students():
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT id FROM datasets ORDER BY upload_date DESC LIMIT 1")
-    latest = cursor.fetchone()
-    if not latest:
+async def fetch_students(connection):
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
         return []
 
-    cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (latest["id"],))
+    cursor = connection.cursor(dictionary=True)
+    await cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
     students = cursor.fetchall()
     cursor.close()
-    connection.close()
     return students
 
 
@@ -38,7 +31,8 @@ def fetch_students():
 @router.get("/clusters/playground")
 async def cluster_playground(
     k: int = Query(..., ge=2, le=10),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    connection=Depends(get_db)
 ):
     """
     Runs clustering on the latest dataset with user-specified k (Playground mode).
@@ -48,25 +42,16 @@ async def cluster_playground(
     if current_user["role"] not in ["Admin", "Viewer"]:
         raise HTTPException(status_code=403, detail="Unauthorized role")
 
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = connection.cursor(dictionary=True)
-
     # Get latest dataset
-    cursor.execute("SELECT id FROM datasets ORDER BY upload_date DESC LIMIT 1")
-    dataset = cursor.fetchone()
-    if not dataset:
-        cursor.close()
-        connection.close()
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
         raise HTTPException(status_code=404, detail="No dataset found")
-    dataset_id = dataset["id"]
 
     # Get students for this dataset
-    cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
+    cursor = connection.cursor(dictionary=True)
+    await cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
     students = cursor.fetchall()
     cursor.close()
-    connection.close()
 
     if not students:
         raise HTTPException(status_code=404, detail="No students found for latest dataset")
@@ -94,41 +79,14 @@ async def cluster_playground(
     x_col = actual_col("gwa")
     y_col = actual_col("income")
 
-    X = df_complete[[x_col, y_col]].fillna(0).astype(float)
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    preds = kmeans.fit_predict(X_scaled)
-
-    centroids = scaler.inverse_transform(kmeans.cluster_centers_).tolist()
+    # stored model at the official k, else a cached or fresh fit (shared with the export below)
+    preds, centroids = await clusters_module.cluster_students(connection, df_complete, [x_col, y_col], ["gwa", "income"], k)
 
     # attach cluster only to complete rows
-    df_complete = df_complete.copy()
     df_complete["Cluster"] = preds
 
     # Build student output similar to pairwise so frontend receives the same shape
-    students_out = []
-    for _, row in df_complete.iterrows():
-        students_out.append({
-            "id": int(row.get("id", 0)),
-            "firstname": row.get("firstname"),
-            "lastname": row.get("lastname"),
-            "sex": row.get("sex"),
-            "program": row.get("program"),
-            "municipality": row.get("municipality"),
-            "income": float(row.get("income") or 0),
-            "SHS_type": row.get("shs_type"),
-            "GWA": float(row.get("gwa") or 0),
-            "Honors": row.get("Honors"),
-            "IncomeCategory": row.get("IncomeCategory"),
-            "Cluster": int(row["Cluster"]),
-            "pair_x": float(row[x_col]),
-            "pair_y": float(row[y_col]),
-            "pair_x_label": str(row.get("gwa")) if "gwa" in row.index else str(row.get(x_col)),
-            "pair_y_label": str(row.get("income")) if "income" in row.index else str(row.get(y_col)),
-        })
+    students_out = clusters_module.pair_students_payload(df_complete, "gwa", "income", x_col, y_col)
 
     return {
         "students": students_out,
@@ -141,7 +99,8 @@ async def cluster_playground(
 async def export_cluster_playground(
     k: int = Query(3, ge=2, le=10),
     format: str = Query("pdf"),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    connection=Depends(get_db)
 ):
     """
     Export playground clustering results (PDF or CSV).
@@ -150,7 +109,7 @@ async def export_cluster_playground(
     if current_user["role"] not in ["Admin", "Viewer"]:
         raise HTTPException(status_code=403, detail="Unauthorized role")
 
-    students = fetch_students()
+    students = await fetch_students(connection)
     if not students:
         raise HTTPException(status_code=404, detail="No dataset found")
 
@@ -164,13 +123,8 @@ async def export_cluster_playground(
         raise HTTPException(status_code=404, detail="No complete students available for export")
 
     features = ["gwa", "income"]
-    X = df_complete[features].fillna(0)
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    df_complete["Cluster"] = kmeans.fit_predict(X_scaled)
+    # same cache entry as the playground view, so exporting what is on screen does not refit
+    df_complete["Cluster"], _ = await clusters_module.cluster_students(connection, df_complete, features, features, k)
 
     cluster_counts = df_complete["Cluster"].value_counts().to_dict()
 
@@ -183,8 +137,7 @@ async def export_cluster_playground(
             writer.writerow([f"Cluster {c}", v])
         writer.writerow([])
         writer.writerow(["Firstname", "Lastname", "GWA", "Income", "Cluster"])
-        for _, row in df_complete.iterrows():
-            writer.writerow([row.get("firstname"), row.get("lastname"), row.get("gwa"), row.get("income"), row.get("Cluster")])
+        writer.writerows(df_complete[["firstname", "lastname", "gwa", "income", "Cluster"]].itertuples(index=False))
         return StreamingResponse(
             io.BytesIO(buffer.getvalue().encode()),
             media_type="text/csv",
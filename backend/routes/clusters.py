@@ -1,12 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from config import RECLUSTER_WARM_START, RECLUSTER_WARM_TOLERANCE
 from db import get_db_connection
-from dependencies import get_current_user
+from dependencies import get_current_user, get_db
+from ingest import replace_cluster_run
+from cluster_gc import schedule_cluster_gc
+from cluster_metrics import quality_metrics
+from recluster_queue import recluster_scheduler
+from dataset_registry import current_dataset
+from model_registry import ClusterModel, model_registry
+from cluster_cache import ClusterResult, cluster_cache
+from playground_store import PLAYGROUND_FEATURES, load_playground_result
+import anyio
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.cluster import KMeans
 import json
 from typing import List, Dict
-from utils_complete import filter_complete_students_df, is_record_complete_row
+from utils_complete import complete_mask, filter_complete_students_df
 
 router = APIRouter()
 
@@ -71,6 +82,14 @@ def encode_categorical_safe(df: pd.DataFrame, categorical_list: List[str]) -> pd
     return df
 
 
+def label_vocabularies(df: pd.DataFrame, feature_cols: List[str]) -> Dict[str, List[str]]:
+    """Classes behind each ``*_enc`` column, as ``encode_categorical_safe``'s LabelEncoder saw them."""
+    return {
+        col[:-len("_enc")]: sorted(df[col[:-len("_enc")]].astype(str).unique().tolist())
+        for col in feature_cols if col.endswith("_enc")
+    }
+
+
 def _pick_feature_columns(df: pd.DataFrame, canonical_features: List[str]) -> List[str]:
     out = []
     for feat in canonical_features:
@@ -82,81 +101,132 @@ def _pick_feature_columns(df: pd.DataFrame, canonical_features: List[str]) -> Li
     return out
 
 
-# ------------------------
-# GET OFFICIAL CLUSTERS
-# ------------------------
-@router.get("/clusters")
-async def get_clusters(current_user: dict = Depends(get_current_user)):
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = connection.cursor(dictionary=True)
+async def official_model_for(connection, dataset_id: int, features: List[str], k: int):
+    """The dataset's stored model when it was fitted on exactly these features with this k, else None."""
+    _, model = await model_registry.latest(connection, dataset_id)
+    return model if model is not None and model.matches(features, k) else None
 
-    cursor.execute("""
-        SELECT d.id as dataset_id, c.id as cluster_id, c.k, c.centroids 
-        FROM datasets d 
-        LEFT JOIN clusters c ON d.id = c.dataset_id 
-        ORDER BY d.upload_date DESC LIMIT 1
-    """)
-    cluster_info = cursor.fetchone()
-
-    if not cluster_info or not cluster_info.get("cluster_id"):
-        cursor.close()
-        connection.close()
-        return {"clusters": {}, "plot_data": {}, "centroids": []}
 
-    # Fetch all students for latest dataset and recompute official clusters only on complete rows
-    cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (cluster_info["dataset_id"],))
-    students = cursor.fetchall()
-
-    cursor.close()
-    connection.close()
+# Ad-hoc fits (playground, pairwise, exports); part of the result cache key
+KMEANS_PARAMS = (("algorithm", "kmeans"), ("random_state", 42), ("n_init", 10))
 
-    if not students:
-        return {"clusters": {}, "plot_data": {}, "centroids": []}
-
-    # Build dataframe and normalize/encode like pairwise
-    df = pd.DataFrame(students)
-    df = normalize_dataframe_columns(df)
-    df = encode_categorical_safe(df, ["sex", "program", "municipality", "shs_type"])
-
-    # Only cluster on complete rows
-    df_complete = filter_complete_students_df(df)
-    if df_complete.empty:
-        return {"clusters": {}, "plot_data": {}, "centroids": []}
-
-    # Official clusters use GWA and income as canonical features
-    feature_cols = ["gwa", "income"]
-    X = df_complete[feature_cols].fillna(0).astype(float)
 
+def _fit_kmeans(X: pd.DataFrame, k: int):
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
-
-    k = int(cluster_info.get("k", 3)) if cluster_info.get("k") else 3
     kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
     preds = kmeans.fit_predict(X_scaled)
-    centroids = scaler.inverse_transform(kmeans.cluster_centers_).tolist()
+    return preds, scaler.inverse_transform(kmeans.cluster_centers_).tolist()
 
-    df_complete = df_complete.copy()
-    df_complete["Cluster"] = preds
 
-    # Build plot data and clusters mapping from df_complete
+async def cluster_students(connection, df_complete: pd.DataFrame, columns: List[str], features: List[str], k: int):
+    """Labels (in ``df_complete`` row order) and centroids for clustering ``columns`` into k groups.
+
+    Answered by the official run's model when it matches, then by the result
+    cache, then by the results precomputed at upload, and only then by a fit
+    (in a worker thread), whose result is cached.
+    """
+    dataset_id, version = await current_dataset.get(connection)
+    model = await official_model_for(connection, dataset_id, features, k)
+    if model is not None:
+        return model.predict(df_complete), model.centroids()
+
+    key = (dataset_id, version, tuple(features), k, KMEANS_PARAMS)
+    student_ids = df_complete["id"].to_numpy()
+    cached = cluster_cache.get(key, student_ids)
+    if cached is not None:
+        return cached
+
+    if list(features) == PLAYGROUND_FEATURES:
+        stored = await load_playground_result(connection, dataset_id, k)
+        if stored is not None:
+            result = ClusterResult(stored[0], stored[1], stored[2])
+            labels = result.labels_for(student_ids)
+            if labels is not None:
+                cluster_cache.put(key, result)
+                return labels, result.centroids
+
+    X = df_complete[columns].fillna(0).astype(float)
+    preds, centroids = await anyio.to_thread.run_sync(_fit_kmeans, X, k)
+    cluster_cache.put(key, ClusterResult(student_ids, preds, centroids))
+    return preds, centroids
+
+
+def pair_students_payload(df: pd.DataFrame, x_canon: str, y_canon: str, x_col: str, y_col: str) -> List[dict]:
+    """Student dicts for the pairwise / playground views (``df`` carries a Cluster column).
+
+    Built column by column: iterrows() was most of the response time on large datasets.
+    """
+    def col(name):
+        return df[name].tolist() if name in df.columns else [None] * len(df)
+
+    def labels(canon, actual):
+        return [str(c) if c is not None else str(a) for c, a in zip(col(canon), col(actual))]
+
+    columns = {
+        "id": [int(v) for v in col("id")],
+        "firstname": col("firstname"),
+        "lastname": col("lastname"),
+        "sex": col("sex"),
+        "program": col("program"),
+        "municipality": col("municipality"),
+        "income": [float(v or 0) for v in col("income")],
+        "SHS_type": col("shs_type"),
+        "GWA": [float(v or 0) for v in col("gwa")],
+        "Honors": col("Honors"),
+        "IncomeCategory": col("IncomeCategory"),
+        "Cluster": [int(v) for v in col("Cluster")],
+        "pair_x": [float(v) for v in col(x_col)],
+        "pair_y": [float(v) for v in col(y_col)],
+        "pair_x_label": labels(x_canon, x_col),
+        "pair_y_label": labels(y_canon, y_col),
+    }
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+# ------------------------
+# GET OFFICIAL CLUSTERS
+# ------------------------
+# One indexed join: student_cluster (cluster_id, student_id, cluster_number) -> students by primary key
+STORED_ASSIGNMENTS_SQL = """
+    SELECT s.id, s.firstname, s.lastname, s.sex, s.program, s.municipality, s.income, s.SHS_type,
+        s.GWA, s.Honors, s.IncomeCategory, s.dataset_id, sc.cluster_number
+    FROM student_cluster sc
+    JOIN students s ON s.id = sc.student_id
+    WHERE sc.cluster_id = %s
+    ORDER BY sc.cluster_number, s.id
+"""
+
+# the same rows for the dataset's active run, with the pointer resolved in the statement itself
+ACTIVE_ASSIGNMENTS_SQL = """
+    SELECT s.id, s.firstname, s.lastname, s.sex, s.program, s.municipality, s.income, s.SHS_type,
+        s.GWA, s.Honors, s.IncomeCategory, s.dataset_id, sc.cluster_number, sc.cluster_id
+    FROM datasets d
+    JOIN student_cluster sc ON sc.cluster_id = d.active_cluster_id
+    JOIN students s ON s.id = sc.student_id
+    WHERE d.id = %s
+    ORDER BY sc.cluster_number, s.id
+"""
+
+
+def _official_clusters_response(students: List[dict], centroids, k: int) -> dict:
+    """Shape complete, already-labelled students (``cluster_number`` set) for the Clusters page."""
     plot_data = {
-        "x": [float(r.get("gwa", 0) or 0) for _, r in df_complete.iterrows()],
-        "y": [float(r.get("income", 0) or 0) for _, r in df_complete.iterrows()],
-        "colors": [int(r.get("Cluster", 0) or 0) for _, r in df_complete.iterrows()],
+        "x": [float(s.get("GWA") or 0) for s in students],
+        "y": [float(s.get("income") or 0) for s in students],
+        "colors": [int(s["cluster_number"]) for s in students],
         "text": [
-            f"{r.get('firstname','')} {r.get('lastname','')}<br>Program: {r.get('program','-')}<br>Municipality: {r.get('municipality','-')}<br>"
-            f"Income: {r.get('incomecategory','-')}<br>Honors: {r.get('honors','-')}<br>SHS: {r.get('shs_type','-')}"
-            for _, r in df_complete.iterrows()
+            f"{s.get('firstname','')} {s.get('lastname','')}<br>Program: {s.get('program') or '-'}<br>Municipality: {s.get('municipality') or '-'}<br>"
+            f"Income: {s.get('IncomeCategory') or '-'}<br>Honors: {s.get('Honors') or '-'}<br>SHS: {s.get('SHS_type') or '-'}"
+            for s in students
         ]
     }
 
     clusters: Dict[int, List[dict]] = {}
-    for _, row in df_complete.iterrows():
-        s = row.to_dict()
-        cnum = int(s.get("Cluster", 0))
-        s["cluster_number"] = cnum
+    for s in students:
+        cnum = int(s["cluster_number"])
+        s["Cluster"] = cnum
         clusters.setdefault(cnum, []).append(s)
 
     return {
@@ -167,40 +237,102 @@ async def get_clusters(current_user: dict = Depends(get_current_user)):
     }
 
 
+async def _refit_official_clusters(connection, dataset_id: int, k: int) -> dict:
+    """Fallback for a cluster run whose assignments are missing: fit GWA/income on the complete rows."""
+    cursor = connection.cursor(dictionary=True)
+    await cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
+    students = cursor.fetchall()
+    cursor.close()
 
+    if not students:
+        return {"clusters": {}, "plot_data": {}, "centroids": []}
 
-# ------------------------
-# RE-CLUSTER DATASET
-# ------------------------
-@router.post("/clusters/recluster")
-async def recluster(
-    k: int = Query(..., ge=2),
-    current_user: dict = Depends(get_current_user)
-):
-    role = current_user.get("role", "")
+    # ✅ Fit off the event loop
+    return await anyio.to_thread.run_sync(_refit_response, students, k)
 
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = connection.cursor(dictionary=True)
 
-    cursor.execute("SELECT id FROM datasets ORDER BY upload_date DESC LIMIT 1")
-    latest = cursor.fetchone()
-    if not latest:
-        cursor.close(); connection.close()
-        raise HTTPException(status_code=404, detail="No dataset found")
-    dataset_id = latest["id"]
+def _refit_response(students: List[dict], k: int) -> dict:
+    df = pd.DataFrame(students)
+    df_complete = filter_complete_students_df(df)
+    if len(df_complete) < k:
+        return {"clusters": {}, "plot_data": {}, "centroids": []}
+
+    preds, centroids = _fit_kmeans(df_complete[["GWA", "income"]].fillna(0).astype(float), k)
+
+    df_complete["cluster_number"] = preds
+    df_complete = df_complete.astype(object).where(df_complete.notna(), None)
+    return _official_clusters_response(df_complete.to_dict(orient="records"), centroids, k)
+
+
+@router.get("/clusters")
+async def get_clusters(current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
+        return {"clusters": {}, "plot_data": {}, "centroids": []}
 
-    cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
+    cursor = connection.cursor(dictionary=True)
+    # ✅ Serve the stored run: assignments written by upload / recluster, centroids from the clusters row.
+    # The assignments pick the run, and k / centroids are read by its id: a replaced run outlives
+    # the request by CLUSTER_GC_GRACE_SECONDS, so both reads see the same run
+    await cursor.execute(ACTIVE_ASSIGNMENTS_SQL, (dataset_id,))
     students = cursor.fetchall()
+    if students:
+        cluster_id = students[0]["cluster_id"]
+        for s in students:
+            del s["cluster_id"]
+        await cursor.execute("SELECT id AS cluster_id, k, centroids FROM clusters WHERE id = %s", (cluster_id,))
+    else:
+        await cursor.execute(
+            """
+            SELECT c.id as cluster_id, c.k, c.centroids
+            FROM datasets d JOIN clusters c ON c.id = d.active_cluster_id
+            WHERE d.id = %s
+            """,
+            (dataset_id,)
+        )
+    cluster_info = cursor.fetchone()
+    cursor.close()
+
+    if not cluster_info:
+        return {"clusters": {}, "plot_data": {}, "centroids": []}
+
+    k = int(cluster_info.get("k", 3)) if cluster_info.get("k") else 3
+
     if not students:
-        cursor.close(); connection.close()
-        raise HTTPException(status_code=404, detail="No students found for latest dataset")
+        # the run has no stored assignments (e.g. nothing was complete when it was written): fit once
+        return await _refit_official_clusters(connection, dataset_id, k)
+
+    # Only complete rows are shown; a student edited into an incomplete record keeps its stale row until the next recluster
+    complete = complete_mask(pd.DataFrame(students))
+    students = [s for s, keep in zip(students, complete) if keep]
+    centroids = json.loads(cluster_info["centroids"]) if cluster_info.get("centroids") else []
+
+    return _official_clusters_response(students, centroids, k)
+
+
+RECLUSTER_FEATURES = ["gwa", "income", "sex", "program", "municipality", "shs_type"]
 
-    if k > len(students):
-        cursor.close(); connection.close()
-        raise HTTPException(status_code=400, detail="k cannot be greater than number of students")
 
+def _warm_start_centers(previous: ClusterModel, features: List[str], vocabularies: dict, scaler, k: int):
+    """The previous run's centers in the new scaled space, or None when they cannot seed this fit."""
+    if previous is None or previous.inertia is None or not previous.matches(features, k):
+        return None
+    if previous.vocabularies != vocabularies:  # label codes shift when categories come or go
+        return None
+    return (np.asarray(previous.centroids()) - scaler.mean_) / scaler.scale_
+
+
+def fit_recluster(students: List[dict], k: int, previous: ClusterModel = None, features: List[str] = None):
+    """Fit a k-cluster run on the complete rows of ``students``.
+
+    Returns ``(df_complete, preds, centroids, model, metrics, warm)``. With ``previous``
+    (the dataset's stored model) KMeans starts from its centroids with a single
+    init, and only runs the full 10-init search when k, the features or the
+    categories changed, or when the warm fit's inertia per student is more than
+    RECLUSTER_WARM_TOLERANCE worse than the stored run's. ``features`` defaults
+    to RECLUSTER_FEATURES. Blocking; raises ValueError when none of the
+    clustering features are present.
+    """
     df = pd.DataFrame(students)
     df = normalize_dataframe_columns(df)
     df = encode_categorical_safe(df, ["sex", "program", "municipality", "shs_type"])
@@ -208,49 +340,120 @@ async def recluster(
     # Only cluster on complete rows
     df_complete = filter_complete_students_df(df)
 
-    canonical_features = ["gwa", "income", "sex", "program", "municipality", "shs_type"]
-    feature_cols = _pick_feature_columns(df, canonical_features)
+    feature_cols = _pick_feature_columns(df, features or RECLUSTER_FEATURES)
     if not feature_cols:
-        cursor.close(); connection.close()
-        raise HTTPException(status_code=400, detail="No usable features for clustering")
+        raise ValueError("No usable features for clustering")
 
     X = df_complete[feature_cols].fillna(0).astype(float)
 
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    preds = kmeans.fit_predict(X_scaled)
+    features = [col.removesuffix("_enc") for col in feature_cols]
+    vocabularies = label_vocabularies(df, feature_cols)
+
+    kmeans, warm = None, False
+    init = _warm_start_centers(previous, features, vocabularies, scaler, k)
+    if init is not None:
+        kmeans = KMeans(n_clusters=k, init=init, n_init=1, random_state=42).fit(X_scaled)
+        warm = kmeans.inertia_ / len(X_scaled) <= previous.inertia * (1 + RECLUSTER_WARM_TOLERANCE)
+    if not warm:
+        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10).fit(X_scaled)
+
+    preds = kmeans.labels_
     centroids = scaler.inverse_transform(kmeans.cluster_centers_).tolist()
+    model = ClusterModel.from_fitted(features, scaler, kmeans, vocabularies)
+    return df_complete, preds, centroids, model, quality_metrics(X_scaled, preds), warm
 
-    cursor.close(); connection.close()
 
-    if role == "Admin":
-        conn2 = get_db_connection()
-        if not conn2:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        c2 = conn2.cursor(dictionary=True)
-
-        c2.execute("SELECT id FROM clusters WHERE dataset_id = %s", (dataset_id,))
-        olds = c2.fetchall() or []
-        for oc in olds:
-            c2.execute("DELETE FROM student_cluster WHERE cluster_id = %s", (oc["id"],))
-        c2.execute("DELETE FROM clusters WHERE dataset_id = %s", (dataset_id,))
-
-        c2.execute("INSERT INTO clusters (dataset_id, k, centroids) VALUES (%s, %s, %s)",
-                   (dataset_id, k, json.dumps(centroids)))
-        new_cluster_id = c2.lastrowid
-
-        # Only insert student_cluster for rows that were clustered (complete)
-        clustered_student_ids = df_complete['id'].astype(int).tolist()
-        for local_idx, student_id in enumerate(clustered_student_ids):
-            c2.execute("INSERT INTO student_cluster (student_id, cluster_id, cluster_number) VALUES (%s, %s, %s)",
-                       (int(student_id), new_cluster_id, int(preds[local_idx])))
+def recluster_dataset(dataset_id: int, k: int = None, is_latest=lambda: True):
+    """Refit and store a dataset's official run (blocking; run in a worker thread).
 
-        conn2.commit()
-        c2.close(); conn2.close()
+    Used by the recluster scheduler. ``k`` defaults to the k of the dataset's
+    run at the time it executes (3 without one). The write is skipped, and None
+    returned, once ``is_latest()`` is False or too few students are complete.
+    """
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    try:
+        cursor = connection.cursor(buffered=True, dictionary=True)
+        if k is None:
+            cursor.execute(
+                "SELECT c.k FROM datasets d JOIN clusters c ON c.id = d.active_cluster_id WHERE d.id = %s", (dataset_id,)
+            )
+            row = cursor.fetchone()
+            k = int(row["k"]) if row and row.get("k") else 3
+        cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
+        students = cursor.fetchall()
+        cursor.close()
+        if len(filter_complete_students_df(pd.DataFrame(students))) < k:
+            return None
+
+        previous = model_registry.latest_sync(connection, dataset_id)[1] if RECLUSTER_WARM_START else None
+        df_complete, preds, centroids, model, metrics, warm = fit_recluster(students, k, previous)
+        if not is_latest():
+            return None
+        cluster_id = replace_cluster_run(
+            connection, dataset_id, k, centroids, model.to_dict(), df_complete["id"].astype(int).to_numpy(), preds,
+            metrics
+        )
+    finally:
+        connection.close()
+    schedule_cluster_gc(dataset_id)
+    return {"cluster_id": cluster_id, "k": k, "clustered_students": len(df_complete), "warm_start": warm}
 
-        return {"message": f"Official dataset re-clustered with k={k}"}
+
+# ------------------------
+# RE-CLUSTER DATASET
+# ------------------------
+@router.post("/clusters/recluster")
+async def recluster(
+    k: int = Query(..., ge=2),
+    warm_start: bool = Query(RECLUSTER_WARM_START, description="Start from the stored run's centroids"),
+    current_user: dict = Depends(get_current_user),
+    connection=Depends(get_db)
+):
+    role = current_user.get("role", "")
+
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
+        raise HTTPException(status_code=404, detail="No dataset found")
+
+    cursor = connection.cursor(dictionary=True)
+
+    await cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
+    students = cursor.fetchall()
+    cursor.close()
+    if not students:
+        raise HTTPException(status_code=404, detail="No students found for latest dataset")
+
+    if k > len(students):
+        raise HTTPException(status_code=400, detail="k cannot be greater than number of students")
+
+    previous = (await model_registry.latest(connection, dataset_id))[1] if warm_start else None
+
+    # ✅ Fit off the event loop
+    try:
+        df_complete, preds, centroids, model, metrics, warm = await anyio.to_thread.run_sync(
+            fit_recluster, students, k, previous
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if role == "Admin":
+        # ✅ New run written in bulk under a new cluster id, then made active in one statement;
+        # only rows that were clustered (complete) get assignments, and the old runs are dropped in the background
+        cluster_id = await connection.run(
+            replace_cluster_run, dataset_id, k, centroids, model.to_dict(), df_complete["id"].astype(int).to_numpy(), preds,
+            metrics
+        )
+        if cluster_id is None:
+            # a run written after this one went live first; this fit was discarded
+            raise HTTPException(status_code=409, detail="Recluster superseded by a newer run; reload the clusters")
+        schedule_cluster_gc(dataset_id)
+
+        return {"message": f"Official dataset re-clustered with k={k}", "quality_metrics": metrics, "warm_start": warm}
 
     elif role == "Viewer":
         # Build preview output only for complete students
@@ -262,12 +465,22 @@ async def recluster(
             s_copy["Cluster"] = int(preds[local_idx])
             out_students.append(s_copy)
 
-        return {"message": f"Preview clustering with k={k} (not saved)", "students": out_students, "centroids": centroids}
+        return {"message": f"Preview clustering with k={k} (not saved)", "students": out_students, "centroids": centroids,
+                "quality_metrics": metrics, "warm_start": warm}
 
     else:
         raise HTTPException(status_code=403, detail="Unauthorized role")
 
 
+@router.get("/clusters/recluster/status")
+async def recluster_status(current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    """Pending / running / last background recluster of the current dataset (see recluster_queue.py)."""
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
+        raise HTTPException(status_code=404, detail="No dataset found")
+    return recluster_scheduler.status(dataset_id)
+
+
 # ------------------------
 # PAIRWISE CLUSTERING ENDPOINT
 # ------------------------
@@ -276,7 +489,8 @@ async def pairwise_clusters(
     x: str = Query(..., description="Feature name for X axis"),
     y: str = Query(..., description="Feature name for Y axis"),
     k: int = Query(3, ge=2),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    connection=Depends(get_db)
 ):
     if current_user.get("role") not in ["Admin", "Viewer"]:
         raise HTTPException(status_code=403, detail="Unauthorized role")
@@ -288,21 +502,14 @@ async def pairwise_clusters(
     if x_canon not in allowed or y_canon not in allowed:
         raise HTTPException(status_code=400, detail=f"Allowed features: {sorted(list(allowed))}")
 
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    cur = conn.cursor(dictionary=True)
-
-    cur.execute("SELECT id FROM datasets ORDER BY upload_date DESC LIMIT 1")
-    latest = cur.fetchone()
-    if not latest:
-        cur.close(); conn.close()
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
         raise HTTPException(status_code=404, detail="No dataset found")
-    dataset_id = latest["id"]
 
-    cur.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
+    cur = connection.cursor(dictionary=True)
+    await cur.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
     students = cur.fetchall()
-    cur.close(); conn.close()
+    cur.close()
 
     if not students:
         raise HTTPException(status_code=404, detail="No students found for latest dataset")
@@ -330,38 +537,10 @@ async def pairwise_clusters(
     if df_complete.empty:
         raise HTTPException(status_code=400, detail="No complete students available for clustering")
 
-    X = df_complete[[x_col, y_col]].fillna(0).astype(float)
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    preds = kmeans.fit_predict(X_scaled)
-    centroids = scaler.inverse_transform(kmeans.cluster_centers_).tolist()
-
+    preds, centroids = await cluster_students(connection, df_complete, [x_col, y_col], [x_canon, y_canon], k)
     df_complete["Cluster"] = preds
 
-    students_out = []
-    for _, row in df_complete.iterrows():
-        students_out.append({
-            "id": int(row.get("id", 0)),
-            "firstname": row.get("firstname"),
-            "lastname": row.get("lastname"),
-            "sex": row.get("sex"),
-            "program": row.get("program"),
-            "municipality": row.get("municipality"),
-            "income": float(row.get("income") or 0),
-            "SHS_type": row.get("shs_type"),
-            "GWA": float(row.get("gwa") or 0),
-            "Honors": row.get("Honors"),
-            "IncomeCategory": row.get("IncomeCategory"),
-            "Cluster": int(row["Cluster"]),
-            "pair_x": float(row[x_col]),
-            "pair_y": float(row[y_col]),
-            "pair_x_label": str(row.get(x_canon)) if row.get(x_canon) is not None else str(row.get(x_col)),
-            "pair_y_label": str(row.get(y_canon)) if row.get(y_canon) is not None else str(row.get(y_col)),
-        })
-
+    students_out = pair_students_payload(df_complete, x_canon, y_canon, x_col, y_col)
 
     return {
         "students": students_out,
@@ -372,3 +551,64 @@ async def pairwise_clusters(
         "x_categories": df[x_canon].unique().tolist() if x_canon in {"sex","program","municipality","shs_type"} else None,
         "y_categories": df[y_canon].unique().tolist() if y_canon in {"sex","program","municipality","shs_type"} else None,
     }
+
+
+# ------------------------
+# QUALITY METRICS OF THE STORED RUN
+# ------------------------
+def _score_assignments(students: List[dict], model: ClusterModel) -> dict:
+    """Metrics of stored assignments, in the run's own scaled feature space (GWA/income for runs without a model)."""
+    df = pd.DataFrame(students)
+    df = df[complete_mask(df)]
+    if model is not None:
+        X = model.transform(df)
+    else:
+        X = StandardScaler().fit_transform(df[["GWA", "income"]].fillna(0).astype(float))
+    return quality_metrics(X, df["cluster_number"].to_numpy())
+
+
+@router.get("/clusters/metrics")
+async def cluster_metrics(current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    """Quality metrics stored with the current dataset's run; scored (once) only when the run has none."""
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
+        raise HTTPException(status_code=404, detail="No dataset found")
+
+    cursor = connection.cursor(dictionary=True)
+    await cursor.execute(
+        "SELECT c.id, c.k, c.metrics FROM datasets d JOIN clusters c ON c.id = d.active_cluster_id WHERE d.id = %s",
+        (dataset_id,)
+    )
+    run = cursor.fetchone()
+    if not run:
+        cursor.close()
+        raise HTTPException(status_code=404, detail="No cluster run for the current dataset")
+    if run["metrics"]:
+        cursor.close()
+        return {"dataset_id": dataset_id, "cluster_id": run["id"], "k": run["k"], "quality_metrics": json.loads(run["metrics"])}
+
+    # runs written before metrics were stored, or whose assignments changed since
+    await cursor.execute(STORED_ASSIGNMENTS_SQL, (run["id"],))
+    students = cursor.fetchall()
+    cursor.close()
+    if not students:
+        raise HTTPException(status_code=404, detail="The cluster run has no stored assignments")
+    # the model of this same run, not whatever the pointer names by now
+    model = await model_registry.get(connection, run["id"])
+    metrics = await anyio.to_thread.run_sync(_score_assignments, students, model)
+
+    cursor = connection.cursor()
+    await cursor.execute("UPDATE clusters SET metrics = %s WHERE id = %s", (json.dumps(metrics), run["id"]))
+    await connection.commit()
+    cursor.close()
+    return {"dataset_id": dataset_id, "cluster_id": run["id"], "k": run["k"], "quality_metrics": metrics}
+
+
+# ------------------------
+# RESULT CACHE STATS
+# ------------------------
+@router.get("/clusters/cache")
+async def cluster_cache_stats(current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "Admin":
+        raise HTTPException(status_code=403, detail="Only Admins can view cache statistics")
+    return cluster_cache.stats()
@@ -1,26 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from dependencies import get_current_user, get_db
+from dataset_registry import current_dataset
+from ingest import ChunkedDatasetWriter, append_students, clone_dataset, find_dataset_by_hash, replace_cluster_run, save_dataset
+from model_registry import ClusterModel, model_registry
+from uploads import check_upload_size, detach_upload, read_frame, read_upload_frame, stream_size, upload_size
+from config import (
+    APPEND_DRIFT_QUANTILE, APPEND_DRIFT_THRESHOLD, INGEST_CHUNK_ROWS, INGEST_CHUNKED_MIN_BYTES, PRECOMPUTE_PLAYGROUND,
+)
+from playground_store import PLAYGROUND_FEATURES, PLAYGROUND_K_RANGE
+from jobs import jobs
+from staging import StagedUpload, content_hash, staged_uploads
+from elbow import fit_elbow
+from cluster_metrics import EMPTY_METRICS, quality_metrics
 from db import get_db_connection
-from dependencies import get_current_user
-from utils import classify_honors, classify_income
-from utils_complete import filter_complete_students_df, is_record_complete_row
+from cluster_gc import schedule_cluster_gc
+from utils import classify_honors_series, classify_income_series
+from utils_complete import complete_mask
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.cluster import KMeans
 from kneed import KneeLocator
+import anyio
+import numpy as np
 import pandas as pd
-import os, uuid, json
 from datetime import datetime
 from typing import List
 from fastapi.responses import StreamingResponse
 import csv
 import io
-from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score
 from .users import log_activity, resolve_user
+from . import clusters as clusters_module
 
 router = APIRouter()
-os.makedirs("uploads", exist_ok=True)
 
 # --- Helper: Normalize & Prepare DataFrame ---
-def normalize_and_prepare_df(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_and_prepare_df(df: pd.DataFrame, encode: bool = True) -> pd.DataFrame:
     df = df.copy()
     df.columns = df.columns.str.strip().str.lower()
 
@@ -51,8 +63,8 @@ def normalize_and_prepare_df(df: pd.DataFrame) -> pd.DataFrame:
             df[col] = None
 
     # Derive Honors & IncomeCategory
-    df["Honors"] = df.apply(classify_honors, axis=1)
-    df["IncomeCategory"] = df["income"].apply(classify_income)
+    df["Honors"] = classify_honors_series(df)
+    df["IncomeCategory"] = classify_income_series(df["income"])
 
     # Clean numerics
     df["gwa"] = pd.to_numeric(df["gwa"], errors="coerce")
@@ -65,6 +77,8 @@ def normalize_and_prepare_df(df: pd.DataFrame) -> pd.DataFrame:
         try:
             le = LabelEncoder()
             df[col] = df[col].fillna("Unknown").replace("", "Unknown")
+            if not encode:
+                continue  # chunked ingest: codes would differ per chunk and are never stored
             df[enc_col] = le.fit_transform(df[col].astype(str))
         except Exception:
             uniques = {
@@ -78,12 +92,8 @@ def normalize_and_prepare_df(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 # --- Elbow Helper Functions ---
-def compute_wcss_for_range(X_scaled, k_min=2, k_max=10) -> List[float]:
-    wcss = []
-    for k in range(k_min, k_max + 1):
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-        kmeans.fit(X_scaled)
-        wcss.append(float(kmeans.inertia_))
+def compute_wcss_for_range(X_scaled, k_min=2, k_max=10, on_progress=None) -> List[float]:
+    wcss, _ = fit_elbow(X_scaled, k_min=k_min, k_max=k_max, on_progress=on_progress)
     return wcss
 
 def recommend_k_by_curvature(wcss: List[float], k_min=2) -> int:
@@ -101,10 +111,165 @@ def recommend_k_by_curvature(wcss: List[float], k_min=2) -> int:
     return max(2, min(5, len(wcss) // 2))  # fallback default
 
 # -----------------------------
-# Elbow Preview
+# Shared clustering steps
 # -----------------------------
+CLUSTER_FEATURES = ['gwa', 'income']
+STAGED_K_MIN, STAGED_K_MAX = 2, 10  # the k a staged upload is fitted for, and may be committed with
+
+
+def _clustering_inputs(df: pd.DataFrame):
+    """Complete-row mask, fitted scaler and scaled features (scaler/features are None when no row is complete)."""
+    # Only use complete students for clustering, but save all students
+    complete = complete_mask(df)
+    if not complete.any():
+        return complete, None, None
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(df.loc[complete, CLUSTER_FEATURES].fillna(0))
+    return complete, scaler, X_scaled
+
+
+def _stage_frame(stage_id: str, filename: str, df: pd.DataFrame) -> StagedUpload:
+    """Normalize a parsed upload and run the elbow search on it (blocking)."""
+    df = normalize_and_prepare_df(df)
+    complete, scaler, X_scaled = _clustering_inputs(df)
+    wcss, models, recommended_k = [], {}, None
+    if X_scaled is not None:
+        wcss, models = fit_elbow(X_scaled, k_min=STAGED_K_MIN, k_max=STAGED_K_MAX)
+        recommended_k = recommend_k_by_curvature(wcss, k_min=STAGED_K_MIN)
+    return StagedUpload(stage_id, filename, df, complete, scaler, X_scaled, wcss, models, recommended_k)
+
+
+def _staged_metrics(staged: StagedUpload, k: int) -> dict:
+    if k not in staged.metrics:
+        staged.metrics[k] = quality_metrics(staged.X_scaled, staged.models[k].labels_)
+    return staged.metrics[k]
+
+
+def _reuse_duplicate(job, file_hash: str, filename: str, k, user_id: int):
+    """Answer a re-upload of an already stored file without reprocessing it.
+
+    The matching dataset is returned as is when it is still the current one, and
+    cloned server-side otherwise so the upload becomes current like any other.
+    Returns None when there is no match, or when ``k`` asks for another clustering.
+    """
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    try:
+        match = find_dataset_by_hash(connection, file_hash)
+        if not match or (k is not None and k != match[2]):
+            return None
+        source_id, cluster_id, stored_k = match
+
+        current_id, _ = current_dataset.refresh_sync(connection)
+        dataset_id = source_id
+        if source_id != current_id:
+            job.update(stage="copying", percent=50)
+            dataset_id = clone_dataset(connection, source_id, cluster_id, filename, user_id, datetime.now(), file_hash)
+            current_dataset.refresh_sync(connection)
+
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM students WHERE dataset_id = %s", (dataset_id,))
+        total = cursor.fetchone()[0]
+        cursor.close()
+    finally:
+        connection.close()
+
+    log_activity(user_id, "Upload Dataset", f"Admin re-uploaded dataset: {filename} (identical to dataset ID: {source_id})")
+
+    return {
+        "message": "Identical dataset already uploaded; reused it",
+        "dataset_id": dataset_id,
+        "total_students": total,
+        "clusters": stored_k,
+        "quality_metrics": None,
+        "cached": True,
+        "reused_dataset_id": source_id
+    }
+
+
+def _playground_results(complete, scaler, X_scaled, models: dict, metrics_cache: dict) -> list:
+    """Every k the playground offers, reusing the upload's elbow fits and fitting only the missing k."""
+    results = []
+    for k in PLAYGROUND_K_RANGE:
+        if k > len(X_scaled):
+            break
+        kmeans = models.get(k)
+        if kmeans is None:
+            _, fitted = fit_elbow(X_scaled, k_min=k, k_max=k)
+            kmeans = fitted[k]
+        if k not in metrics_cache:
+            metrics_cache[k] = quality_metrics(X_scaled, kmeans.labels_)
+        labels = np.full(len(complete), -1, dtype=int)
+        labels[complete] = kmeans.labels_
+        results.append({
+            "k": k,
+            "labels": labels,
+            "centroids": scaler.inverse_transform(kmeans.cluster_centers_).tolist(),
+            "metrics": metrics_cache[k],
+        })
+    return results
+
+
+def _save_upload(job, filename: str, user_id: int, df: pd.DataFrame, complete, scaler, X_scaled, k, kmeans,
+                 file_hash: str = None, models: dict = None, metrics_cache: dict = None) -> dict:
+    """Score, label and write an upload whose model is already fitted; runs on the job pool.
+
+    ``models`` are the elbow fits by k, reused for the precomputed playground results.
+    """
+    centroids, model = [], None
+    metrics = dict(EMPTY_METRICS)
+    # assign predicted cluster only to complete rows; keep others unclustered/unassigned (-1)
+    labels = np.full(len(df), -1, dtype=int)
+    if kmeans is not None:
+        job.update(stage="scoring", percent=50)
+        centroids = scaler.inverse_transform(kmeans.cluster_centers_).tolist()
+        model = ClusterModel.from_fitted(CLUSTER_FEATURES, scaler, kmeans).to_dict()
+        metrics_cache = {} if metrics_cache is None else metrics_cache
+        if k not in metrics_cache:
+            metrics_cache[k] = quality_metrics(X_scaled, kmeans.labels_)
+        metrics = metrics_cache[k]
+        labels[complete] = kmeans.labels_
+    df = df.assign(Cluster=labels)
+
+    playground = None
+    if PRECOMPUTE_PLAYGROUND and kmeans is not None and CLUSTER_FEATURES == PLAYGROUND_FEATURES:
+        job.update(stage="precomputing", percent=55)
+        playground = _playground_results(complete, scaler, X_scaled, {**(models or {}), k: kmeans}, metrics_cache)
+
+    job.update(stage="saving", percent=60, rows_total=len(df))
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    try:
+        # one transaction: batched student inserts, ids read back in bulk for the assignments
+        dataset_id = save_dataset(
+            connection, filename, user_id, datetime.now(), k, centroids, df, content_hash=file_hash, model=model,
+            metrics=metrics if kmeans is not None else None, playground=playground,
+            on_progress=lambda done, total: job.update(percent=60 + 38 * done / total, rows_done=done)
+        )
+        current_dataset.refresh_sync(connection)
+    finally:
+        connection.close()
+
+    log_activity(user_id, "Upload Dataset", f"Admin uploaded dataset: {filename} with {len(df)} records")
+
+    return {
+        "message": "Dataset uploaded and processed successfully",
+        "dataset_id": dataset_id,
+        "total_students": len(df),
+        "clusters": k,
+        "quality_metrics": metrics,
+        "cached": False
+    }
+
+
+# -----------------------------
+# Staged Upload: parse + elbow once, preview, then commit
+# -----------------------------
+@router.post("/datasets/stage")
 @router.post("/datasets/elbow")
-async def elbow_preview(
+async def stage_dataset(
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
@@ -114,62 +279,235 @@ async def elbow_preview(
     if not file.filename.endswith(('.csv', '.xlsx')):
         raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
 
-    file_path = f"uploads/{uuid.uuid4()}_{file.filename}"
+    check_upload_size(file)
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
+        stage_id = await anyio.to_thread.run_sync(content_hash, file.file)
+        staged = staged_uploads.get(stage_id)
+        cached = staged is not None
+        if not cached:
+            df = await anyio.to_thread.run_sync(read_upload_frame, file)
+            staged = await anyio.to_thread.run_sync(_stage_frame, stage_id, file.filename, df)
+            staged_uploads.put(staged)
 
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file_path, dtype={"income": "float64", "gwa": "float64"}, low_memory=False)
-        else:
-            df = pd.read_excel(file_path)
+        # --- Compute clustering quality for recommended_k (reusing the elbow fit) ---
+        metrics = None
+        if staged.recommended_k is not None:
+            metrics = await anyio.to_thread.run_sync(_staged_metrics, staged, staged.recommended_k)
 
-        df = normalize_and_prepare_df(df)
+        return {**staged.summary(), "cached": cached, "quality_metrics": metrics}
 
-        # determine complete rows for clustering
-        features = ['gwa', 'income']
-        df_complete = filter_complete_students_df(df)
-        X = df_complete[features].fillna(0)
+    except Exception as e:
+        print("Error computing elbow:", e)
+        raise HTTPException(status_code=500, detail=f"Error computing elbow: {str(e)}")
 
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
 
-        wcss = compute_wcss_for_range(X_scaled, k_min=2, k_max=10)
-        recommended_k = recommend_k_by_curvature(wcss)
-        # --- Compute clustering quality for recommended_k ---
-        try:
-            kmeans = KMeans(n_clusters=recommended_k, random_state=42, n_init=10)
-            preds = kmeans.fit_predict(X_scaled)
+def _get_staged(stage_id: str) -> StagedUpload:
+    staged = staged_uploads.get(stage_id)
+    if not staged:
+        raise HTTPException(status_code=404, detail="Staged upload not found or expired; please upload the file again")
+    return staged
 
-            silhouette = float(silhouette_score(X_scaled, preds))
-            dbi = float(davies_bouldin_score(X_scaled, preds))
-            chi = float(calinski_harabasz_score(X_scaled, preds))
-        except Exception:
-            silhouette = dbi = chi = 0
-
-        return {
-            "wcss": wcss,
-            "recommended_k": recommended_k,
-            "quality_metrics": {
-                "silhouette": silhouette,
-                "davies_bouldin": dbi,
-                "calinski_harabasz": chi
-            }
-        }
 
+def _check_staged_k(k):
+    # preview and commit accept the same k: the ones the elbow search fitted (fit_elbow's default range)
+    if k is not None and not STAGED_K_MIN <= k <= STAGED_K_MAX:
+        raise HTTPException(status_code=400, detail=f"k must be between {STAGED_K_MIN} and {STAGED_K_MAX}")
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()  # <-- prints full error with line numbers
-        raise HTTPException(status_code=500, detail=f"Error computing elbow: {str(e)}")
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+
+@router.get("/datasets/stage/{stage_id}")
+async def preview_staged_dataset(
+    stage_id: str,
+    k: int | None = None,
+    current_user: dict = Depends(get_current_user)
+):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only Admins can preview staged uploads")
+
+    staged = _get_staged(stage_id)
+    k = k or staged.recommended_k
+    _check_staged_k(k)
+
+    # no fits (and no metrics) when the file has no complete rows
+    metrics = await anyio.to_thread.run_sync(_staged_metrics, staged, k) if k in staged.models else None
+    preview = staged.df.head(10).replace({np.nan: None})
+    return {
+        **staged.summary(),
+        "k": k,
+        "quality_metrics": metrics,
+        "columns": preview.columns.tolist(),
+        "rows": preview.to_dict(orient="records"),
+    }
+
+
+def _commit_staged(job, staged: StagedUpload, k, user_id: int) -> dict:
+    try:
+        k = k or staged.recommended_k
+        job.update(stage="checking for duplicates", percent=5)
+        reused = _reuse_duplicate(job, staged.id, staged.filename, k, user_id)
+        if reused:
+            return reused
+
+        job.update(stage="clustering", percent=40, rows_total=len(staged.df))
+        kmeans = staged.models.get(k) if k is not None else None
+        return _save_upload(
+            job, staged.filename, user_id, staged.df, staged.complete, staged.scaler, staged.X_scaled, k, kmeans,
+            file_hash=staged.id,  # stages are keyed by the file's SHA-256
+            models=staged.models, metrics_cache=staged.metrics
+        )
+    except Exception:
+        staged_uploads.put(staged)  # keep it around so the admin can retry the commit
+        raise
+
+
+@router.post("/datasets/stage/{stage_id}/commit", status_code=202)
+async def commit_staged_dataset(
+    stage_id: str,
+    k: int | None = None,
+    current_user: dict = Depends(get_current_user)
+):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only Admins can upload datasets")
+
+    staged = _get_staged(stage_id)
+    _check_staged_k(k)
+
+    # taken out of the store so a double-click can't commit the same file twice
+    staged_uploads.discard(stage_id)
+    job = jobs.submit("dataset_upload", _commit_staged, staged, k, current_user["id"], owner_id=current_user["id"])
+    return {"message": "Dataset upload queued", "job_id": job.id, "status": job.status}
+
+
+@router.delete("/datasets/stage/{stage_id}")
+async def discard_staged_dataset(stage_id: str, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only Admins can discard staged uploads")
+
+    if not staged_uploads.discard(stage_id):
+        raise HTTPException(status_code=404, detail="Staged upload not found or expired")
+    return {"message": "Staged upload discarded"}
 
 # -----------------------------
-# Upload Dataset
+# Upload Dataset (background job)
 # -----------------------------
-@router.post("/datasets/upload")
+def _process_upload(job, stream, filename: str, k, user_id: int, file_hash: str) -> dict:
+    """Parse, cluster and save an uploaded dataset; runs on the job pool."""
+    try:
+        job.update(stage="checking for duplicates", percent=1)
+        reused = _reuse_duplicate(job, file_hash, filename, k, user_id)
+        if reused:
+            return reused
+        job.update(stage="parsing", percent=2)
+        df = read_frame(stream, filename)
+    finally:
+        stream.close()
+
+    job.update(stage="preparing", percent=10, rows_total=len(df))
+    df = normalize_and_prepare_df(df)
+    complete, scaler, X_scaled = _clustering_inputs(df)
+
+    kmeans = None
+    if X_scaled is not None:
+        # auto-select k if not provided; the elbow search already fitted the chosen k
+        job.update(stage="choosing k" if k is None else "clustering", percent=15)
+        wcss, models = fit_elbow(
+            X_scaled,
+            k_min=2 if k is None else k,
+            k_max=10 if k is None else k,
+            on_progress=lambda done, total: job.update(percent=15 + 30 * done / total)
+        )
+        if k is None:
+            k = recommend_k_by_curvature(wcss)
+        kmeans = models[k]
+
+    return _save_upload(job, filename, user_id, df, complete, scaler, X_scaled, k, kmeans, file_hash, models if kmeans else None)
+
+
+def _process_upload_chunked(job, stream, filename: str, k, user_id: int, file_hash: str) -> dict:
+    """Large-CSV variant of ``_process_upload``: rows go to the database chunk by chunk.
+
+    Only the clustering features of complete rows (float32) and the completeness
+    mask are kept for the whole file, so memory grows with INGEST_CHUNK_ROWS
+    rather than with the file.
+    """
+    job.update(stage="checking for duplicates", percent=1)
+    try:
+        reused = _reuse_duplicate(job, file_hash, filename, k, user_id)
+    except Exception:
+        stream.close()
+        raise
+    if reused:
+        stream.close()
+        return reused
+
+    total_bytes = max(stream_size(stream), 1)
+    connection = get_db_connection()
+    if not connection:
+        stream.close()
+        raise RuntimeError("Database connection failed")
+
+    writer = ChunkedDatasetWriter(connection)
+    try:
+        writer.begin(filename, user_id, datetime.now(), file_hash)
+        complete_parts, feature_parts = [], []
+        job.update(stage="ingesting", percent=2)
+        for chunk in pd.read_csv(stream, chunksize=INGEST_CHUNK_ROWS, dtype={"income": "float64", "gwa": "float64"}):
+            chunk = normalize_and_prepare_df(chunk, encode=False)
+            complete = complete_mask(chunk)
+            complete_parts.append(complete)
+            feature_parts.append(chunk.loc[complete, CLUSTER_FEATURES].fillna(0).to_numpy(dtype=np.float32))
+            writer.write_chunk(chunk)
+            job.update(percent=2 + 48 * stream.tell() / total_bytes, rows_done=writer.rows_written)
+
+        complete = np.concatenate(complete_parts) if complete_parts else np.zeros(0, dtype=bool)
+        X = np.concatenate(feature_parts) if feature_parts else np.zeros((0, len(CLUSTER_FEATURES)), dtype=np.float32)
+        job.update(rows_total=len(complete))
+
+        centroids, model = [], None
+        metrics = dict(EMPTY_METRICS)
+        labels = np.full(len(complete), -1, dtype=int)
+        if len(X):
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
+            del X
+            job.update(stage="choosing k" if k is None else "clustering", percent=50)
+            wcss, models = fit_elbow(
+                X_scaled,
+                k_min=2 if k is None else k,
+                k_max=10 if k is None else k,
+                on_progress=lambda done, total: job.update(percent=50 + 35 * done / total)
+            )
+            if k is None:
+                k = recommend_k_by_curvature(wcss)
+            kmeans = models[k]
+            job.update(stage="scoring", percent=85)
+            centroids = scaler.inverse_transform(kmeans.cluster_centers_).tolist()
+            model = ClusterModel.from_fitted(CLUSTER_FEATURES, scaler, kmeans).to_dict()
+            metrics = quality_metrics(X_scaled, kmeans.labels_)
+            labels[complete] = kmeans.labels_
+
+        job.update(stage="saving", percent=90)
+        dataset_id = writer.finish(k, centroids, labels, model, metrics if model is not None else None)
+        current_dataset.refresh_sync(connection)
+    except Exception:
+        writer.abort()
+        raise
+    finally:
+        stream.close()
+        connection.close()
+
+    log_activity(user_id, "Upload Dataset", f"Admin uploaded dataset: {filename} with {len(complete)} records")
+
+    return {
+        "message": "Dataset uploaded and processed successfully",
+        "dataset_id": dataset_id,
+        "total_students": len(complete),
+        "clusters": k,
+        "quality_metrics": metrics,
+        "cached": False
+    }
+
+
+@router.post("/datasets/upload", status_code=202)
 async def upload_dataset(
     file: UploadFile = File(...),
     k: int | None = None,   # optional k
@@ -181,173 +519,212 @@ async def upload_dataset(
     if not file.filename.endswith(('.csv', '.xlsx')):
         raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
 
-    file_path = f"uploads/{uuid.uuid4()}_{file.filename}"
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    check_upload_size(file)
+    # ✅ the job gets its own copy of the file, so it keeps running if the client goes away;
+    # the copy pass also hashes it, so an identical re-upload can reuse the stored dataset
+    stream, file_hash = await anyio.to_thread.run_sync(detach_upload, file)
+    # big CSVs are streamed into the database chunk by chunk instead of parsed whole
+    chunked = file.filename.endswith('.csv') and upload_size(file) >= INGEST_CHUNKED_MIN_BYTES
+    job = jobs.submit(
+        "dataset_upload", _process_upload_chunked if chunked else _process_upload,
+        stream, file.filename, k, current_user["id"], file_hash,
+        owner_id=current_user["id"]
+    )
+    return {"message": "Dataset upload queued", "job_id": job.id, "status": job.status}
 
-    try:
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file_path, dtype={"income": "float64", "gwa": "float64"}, low_memory=False)
-        else:
-            df = pd.read_excel(file_path)
-
-        df = normalize_and_prepare_df(df)
-
-        # Only use complete students for clustering, but save all students
-        features = ['gwa', 'income']
-        df_complete = filter_complete_students_df(df)
-
-        if df_complete.empty:
-            # No complete rows; still save all rows but create an empty clusters record
-            k_final = k or 3
-            preds = []
-            centroids = []
-        else:
-            X = df_complete[features].fillna(0)
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
 
-            # auto-select k if not provided
-            if k is None:
-                wcss = compute_wcss_for_range(X_scaled, k_min=2, k_max=10)
-                k = recommend_k_by_curvature(wcss)
+# -----------------------------
+# Append to an existing dataset (background job)
+# -----------------------------
+def _reference_distances(connection, cluster_id: int, model: ClusterModel) -> np.ndarray:
+    """Distance of every student already in the run to its own centroid."""
+    cursor = connection.cursor(buffered=True, dictionary=True)
+    cursor.execute(
+        """
+        SELECT s.GWA, s.income, s.sex, s.program, s.municipality, s.SHS_type, sc.cluster_number
+        FROM student_cluster sc
+        JOIN students s ON s.id = sc.student_id
+        WHERE sc.cluster_id = %s
+        """,
+        (cluster_id,)
+    )
+    members = pd.DataFrame(cursor.fetchall())
+    cursor.close()
+    if members.empty:
+        return np.zeros(0)
+    X = model.transform(members)
+    centers = model.centers[members["cluster_number"].to_numpy(dtype=int)]
+    return np.sqrt(((X - centers) ** 2).sum(axis=1))
+
+
+def _refit_dataset(connection, dataset_id: int, k: int, features: List[str]):
+    """Fit a fresh k-cluster run on ``features`` of every complete student and make it the dataset's run."""
+    cursor = connection.cursor(buffered=True, dictionary=True)
+    cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
+    students = cursor.fetchall()
+    cursor.close()
+    if not students or complete_mask(pd.DataFrame(students)).sum() < k:
+        return None
 
-            kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-            preds = kmeans.fit_predict(X_scaled)
-            centroids = scaler.inverse_transform(kmeans.cluster_centers_).tolist()
-            try:
-                silhouette = float(silhouette_score(X_scaled, preds))
-                dbi = float(davies_bouldin_score(X_scaled, preds))
-                chi = float(calinski_harabasz_score(X_scaled, preds))
-            except Exception:
-                silhouette = dbi = chi = 0
-        # assign predicted cluster only to complete rows; keep others unclustered/unassigned (-1)
-        df['Cluster'] = -1
-        if not df_complete.empty:
-            df.loc[df_complete.index, 'Cluster'] = preds
-        df['Cluster'] = df['Cluster'].astype(int)
-
-        connection = get_db_connection()
-        if not connection:
-            os.remove(file_path)
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        cursor = connection.cursor()
+    # same fit as a recluster, so categorical features of a multi-feature run are encoded the same way
+    df_complete, preds, centroids, model, metrics, _ = clusters_module.fit_recluster(students, k, features=features)
+    replace_cluster_run(
+        connection, dataset_id, k, centroids, model.to_dict(), df_complete["id"].astype(int).to_numpy(), preds, metrics
+    )
+    schedule_cluster_gc(dataset_id)
+    return metrics
 
-        cursor.execute(
-            "INSERT INTO datasets (filename, uploaded_by, upload_date) VALUES (%s, %s, %s)",
-            (file.filename, current_user["id"], datetime.now())
-        )
-        dataset_id = cursor.lastrowid
 
-        cursor.execute(
-            "INSERT INTO clusters (dataset_id, k, centroids) VALUES (%s, %s, %s)",
-            (dataset_id, k if k is not None else None, json.dumps(centroids) if centroids else json.dumps([]))
-        )
-        cluster_id = cursor.lastrowid
-
-        for _, row in df.iterrows():
-            # Handle text fields (if blank/N/A → "Incomplete")
-            def safe_text(val):
-                if pd.isna(val) or str(val).strip() == "" or str(val).lower() in ["n/a", "na", "none"]:
-                    return "Incomplete"
-                return str(val).strip()
-
-            # Handle numeric fields (if blank/N/A → -1)
-            def safe_num(val):
-                if pd.isna(val) or str(val).strip() == "" or str(val).lower() in ["n/a", "na", "none"]:
-                    return -1
-                try:
-                    return float(val)
-                except Exception:
-                    return -1
-
-            firstname = safe_text(row.get('firstname'))
-            lastname = safe_text(row.get('lastname'))
-            sex = safe_text(row.get('sex'))
-            program = safe_text(row.get('program'))
-            municipality = safe_text(row.get('municipality'))
-            shs_type = safe_text(row.get('shs_type'))
-
-            income_val = safe_num(row.get('income'))
-            gwa_val = safe_num(row.get('gwa'))
-
-            honors = safe_text(row.get('Honors'))
-            income_category = safe_text(row.get('IncomeCategory'))
-
-            cursor.execute("""
-                INSERT INTO students (firstname, lastname, sex, program, municipality, income, shs_type, gwa, Honors, IncomeCategory, dataset_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                firstname,
-                lastname,
-                sex,
-                program,
-                municipality,
-                income_val,
-                shs_type,
-                gwa_val,
-                honors,
-                income_category,
-                dataset_id
-            ))
-
-            student_id = cursor.lastrowid
-            cluster_number = int(row['Cluster']) if 'Cluster' in row and row['Cluster'] is not None else -1
-            if cluster_number != -1:
-                cursor.execute(
-                    "INSERT INTO student_cluster (student_id, cluster_id, cluster_number) VALUES (%s, %s, %s)",
-                    (student_id, cluster_id, int(cluster_number))
-                )
+def _run_k(connection, cluster_id):
+    if cluster_id is None:
+        return None
+    cursor = connection.cursor(buffered=True)
+    cursor.execute("SELECT k FROM clusters WHERE id = %s", (cluster_id,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
 
-        connection.commit()
-        cursor.close()
+
+def _process_append(job, stream, filename: str, dataset_id: int, drift_check: bool, user_id: int) -> dict:
+    """Insert a follow-up file into an existing dataset, placing its rows with the stored centroids."""
+    try:
+        job.update(stage="parsing", percent=2)
+        df = read_frame(stream, filename)
+    finally:
+        stream.close()
+
+    job.update(stage="preparing", percent=10, rows_total=len(df))
+    df = normalize_and_prepare_df(df)
+    complete = complete_mask(df)
+
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    try:
+        cluster_id, model = model_registry.latest_sync(connection, dataset_id)
+        k = model.k if model is not None else _run_k(connection, cluster_id)
+        labels = np.full(len(df), -1, dtype=int)
+        drift, refit_reason = None, None
+        if model is not None and complete.any():
+            job.update(stage="assigning", percent=20)
+            new_labels, distances = model.predict_with_distance(df.loc[complete])
+            labels[complete] = new_labels
+            if drift_check:
+                reference = _reference_distances(connection, cluster_id, model)
+                if len(reference):
+                    ratio = float(
+                        np.quantile(distances, APPEND_DRIFT_QUANTILE)
+                        / max(np.quantile(reference, APPEND_DRIFT_QUANTILE), 1e-12)
+                    )
+                    drift = {"quantile": APPEND_DRIFT_QUANTILE, "ratio": ratio, "threshold": APPEND_DRIFT_THRESHOLD}
+                    if ratio > APPEND_DRIFT_THRESHOLD:
+                        refit_reason = "drift"
+        elif k and complete.any():
+            refit_reason = "no stored model"  # runs saved before models were kept
+
+        job.update(stage="saving", percent=30)
+        # when a refit follows, its run replaces the assignments anyway
+        assign_to = cluster_id if refit_reason is None and (labels != -1).any() else None
+        _, assigned = append_students(
+            connection, dataset_id, assign_to, df, labels,
+            on_progress=lambda done, total: job.update(percent=30 + 40 * done / total, rows_done=done)
+        )
+        if assign_to is not None and not assigned:
+            # a recluster replaced the run the labels were predicted for: refit on the run that is active now
+            refit_reason = "superseded run"
+            cluster_id, model = model_registry.latest_sync(connection, dataset_id)
+            k = model.k if model is not None else (_run_k(connection, cluster_id) or k)
+            assign_to = None
+
+        metrics = None
+        if refit_reason:
+            job.update(stage="reclustering", percent=70)
+            # same k and features as the run being replaced (GWA/income for runs saved without a model)
+            features = model.features if model is not None else CLUSTER_FEATURES
+            metrics = _refit_dataset(connection, dataset_id, k, features)
+    finally:
         connection.close()
-        os.remove(file_path)
-
-        log_activity(current_user["id"], "Upload Dataset", f"Admin uploaded dataset: {file.filename} with {len(df)} records")
-
-        return {
-            "message": "Dataset uploaded and processed successfully",
-            "dataset_id": dataset_id,
-            "total_students": len(df),
-            "clusters": k,
-            "quality_metrics": {
-                "silhouette": silhouette,
-                "davies_bouldin": dbi,
-                "calinski_harabasz": chi
-            }
-        }
 
-    except Exception as e:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Error processing dataset: {str(e)}")
+    current_dataset.touch(dataset_id)
+    log_activity(user_id, "Append Dataset", f"Admin appended {len(df)} records from {filename} to dataset ID: {dataset_id}")
+
+    return {
+        "message": "Rows appended to dataset",
+        "dataset_id": dataset_id,
+        "appended_students": len(df),
+        "assigned_students": int((labels != -1).sum()) if assign_to else 0,
+        "clusters": k,
+        "drift": drift,
+        "refit": refit_reason is not None,
+        "refit_reason": refit_reason,
+        "quality_metrics": metrics
+    }
+
+
+@router.post("/datasets/{dataset_id}/append", status_code=202)
+async def append_dataset(
+    dataset_id: int,
+    file: UploadFile = File(...),
+    drift_check: bool = False,
+    current_user: dict = Depends(get_current_user),
+    connection=Depends(get_db)
+):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only Admins can upload datasets")
+
+    if not file.filename.endswith(('.csv', '.xlsx')):
+        raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
+
+    check_upload_size(file)
+    cursor = connection.cursor()
+    await cursor.execute("SELECT id FROM datasets WHERE id = %s", (dataset_id,))
+    found = cursor.fetchone()
+    cursor.close()
+    if not found:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    stream, _ = await anyio.to_thread.run_sync(detach_upload, file)
+    job = jobs.submit(
+        "dataset_append", _process_append,
+        stream, file.filename, dataset_id, drift_check, current_user["id"],
+        owner_id=current_user["id"]
+    )
+    return {"message": "Dataset append queued", "job_id": job.id, "status": job.status}
+
+
+@router.get("/datasets/jobs/{job_id}")
+async def get_dataset_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only Admins can view upload jobs")
+
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 # -----------------------------
 # Get Dataset History
 # -----------------------------
 @router.get("/datasets")
-async def get_datasets(current_user: dict = Depends(get_current_user)):
+async def get_datasets(current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can view dataset history")
 
-    connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("""
+    await cursor.execute("""
         SELECT d.id, d.filename, d.upload_date, u.email as uploaded_by_email,
             COUNT(DISTINCT s.id) AS student_count,
             MAX(c.k) AS cluster_count
         FROM datasets d
         LEFT JOIN users u ON d.uploaded_by = u.id
         LEFT JOIN students s ON d.id = s.dataset_id
-        LEFT JOIN clusters c ON d.id = c.dataset_id
+        LEFT JOIN clusters c ON c.id = d.active_cluster_id
         GROUP BY d.id, d.filename, d.upload_date, u.email
         ORDER BY d.upload_date DESC
     """)
 
     datasets = cursor.fetchall()
     cursor.close()
-    connection.close()
     return datasets
 
 # -----------------------------
@@ -356,22 +733,21 @@ async def get_datasets(current_user: dict = Depends(get_current_user)):
 @router.get("/datasets/{dataset_id}/preview")
 async def preview_dataset(
     dataset_id: int,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    connection=Depends(get_db)
 ):
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can preview datasets")
 
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
+    cur = connection.cursor(dictionary=True)
 
-    cur.execute(
+    await cur.execute(
         "SELECT * FROM students WHERE dataset_id = %s LIMIT 15",
         (dataset_id,)
     )
     rows = cur.fetchall()
 
     cur.close()
-    conn.close()
 
     return {"rows": rows}
 
@@ -380,23 +756,22 @@ async def preview_dataset(
 # Download Dataset
 # -----------------------------
 @router.get("/datasets/{dataset_id}/download")
-async def download_dataset(dataset_id: int, current_user: dict = Depends(get_current_user)):
+async def download_dataset(dataset_id: int, current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can download datasets")
 
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
+    cur = connection.cursor(dictionary=True)
 
-    cur.execute("SELECT filename FROM datasets WHERE id = %s", (dataset_id,))
+    await cur.execute("SELECT filename FROM datasets WHERE id = %s", (dataset_id,))
     dataset = cur.fetchone()
     if not dataset:
-        cur.close(); conn.close()
+        cur.close()
         raise HTTPException(status_code=404, detail="Dataset not found")
 
     # fetch all students for this dataset
-    cur.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
+    await cur.execute("SELECT * FROM students WHERE dataset_id = %s", (dataset_id,))
     rows = cur.fetchall()
-    cur.close(); conn.close()
+    cur.close()
 
     if not rows:
         raise HTTPException(status_code=404, detail="No students found for this dataset")
@@ -422,19 +797,29 @@ async def download_dataset(dataset_id: int, current_user: dict = Depends(get_cur
 # -----------------------------
 # Delete Dataset
 # -----------------------------
+def _delete_dataset(connection, dataset_id: int):
+    connection.start_transaction()
+    cursor = connection.cursor()
+    try:
+        # the pointer is cleared first so the cascade into clusters doesn't have to come back to this row
+        cursor.execute("UPDATE datasets SET active_cluster_id = NULL WHERE id = %s", (dataset_id,))
+        # students, clusters and student_cluster rows go with it (ON DELETE CASCADE, see migrations.py)
+        cursor.execute("DELETE FROM datasets WHERE id = %s", (dataset_id,))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
 @router.delete("/datasets/{dataset_id}")
-async def delete_dataset(dataset_id: int, current_user: dict = Depends(get_current_user)):
+async def delete_dataset(dataset_id: int, current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can delete datasets")
 
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    cursor.execute("DELETE FROM student_cluster WHERE student_id IN (SELECT id FROM students WHERE dataset_id = %s)", (dataset_id,))
-    cursor.execute("DELETE FROM students WHERE dataset_id = %s", (dataset_id,))
-    cursor.execute("DELETE FROM clusters WHERE dataset_id = %s", (dataset_id,))
-    cursor.execute("DELETE FROM datasets WHERE id = %s", (dataset_id,))
-    cursor.close()
-    connection.close()
+    await connection.run(_delete_dataset, dataset_id)
+    await current_dataset.refresh(connection)
 
     # ✅ Log dataset deletion
     log_activity(current_user["id"], "Delete Dataset", f"Admin deleted dataset ID: {dataset_id}")
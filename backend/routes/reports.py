@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends
 from fastapi.responses import StreamingResponse, HTMLResponse
-from db import get_db_connection
+from dependencies import get_db
+from dataset_registry import current_dataset
 import io, csv
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.styles import getSampleStyleSheet
@@ -12,36 +13,24 @@ router = APIRouter()
 
 
 # === Utility: Fetch latest dataset of students (with clusters if available) ===
-async def get_all_students_from_db():
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = connection.cursor(dictionary=True)
-
-    cursor.execute("SELECT id FROM datasets ORDER BY upload_date DESC LIMIT 1")
-    latest = cursor.fetchone()
-    if not latest:
-        cursor.close()
-        connection.close()
+async def get_all_students_from_db(connection):
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
         return []
 
-    cursor.execute("SELECT id FROM clusters WHERE dataset_id = %s ORDER BY id DESC LIMIT 1", (latest["id"],))
-    cluster = cursor.fetchone()
-
-    if cluster:
-        cursor.execute("""
-            SELECT s.*, sc.cluster_number
-            FROM students s
-            LEFT JOIN student_cluster sc 
-                ON s.id = sc.student_id AND sc.cluster_id = %s
-            WHERE s.dataset_id = %s
-        """, (cluster["id"], latest["id"]))
-    else:
-        cursor.execute("SELECT * FROM students WHERE dataset_id = %s", (latest["id"],))
+    cursor = connection.cursor(dictionary=True)
+    # the active run is resolved in the same statement, so a recluster can't land between two reads
+    await cursor.execute("""
+        SELECT s.*, sc.cluster_number
+        FROM students s
+        JOIN datasets d ON d.id = s.dataset_id
+        LEFT JOIN student_cluster sc
+            ON s.id = sc.student_id AND sc.cluster_id = d.active_cluster_id
+        WHERE s.dataset_id = %s
+    """, (dataset_id,))
 
     students = cursor.fetchall()
     cursor.close()
-    connection.close()
     return students
 
 
@@ -150,8 +139,8 @@ def build_report_context(report_type, students):
 
 # === Reports Endpoint ===
 @router.get("/reports/{report_type}")
-async def export_report(report_type: str, format: str = Query("pdf")):
-    students = await get_all_students_from_db()
+async def export_report(report_type: str, format: str = Query("pdf"), connection=Depends(get_db)):
+    students = await get_all_students_from_db(connection)
     if not students:
         raise HTTPException(status_code=404, detail="No student data found")
 
@@ -227,8 +216,8 @@ async def export_report(report_type: str, format: str = Query("pdf")):
 
 
 @router.get("/reports/{report_type}/preview")
-async def preview_report(report_type: str):
-    students = await get_all_students_from_db()
+async def preview_report(report_type: str, connection=Depends(get_db)):
+    students = await get_all_students_from_db(connection)
     if not students:
         raise HTTPException(status_code=404, detail="No student data found")
 
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
 from typing import Optional
-from db import get_db_connection
-from dependencies import get_current_user
+from dependencies import get_current_user, get_db
+from dataset_registry import current_dataset
+from ingest import set_student_assignment
+from model_registry import model_registry
+from playground_store import INVALIDATE_SQL as INVALIDATE_PLAYGROUND_SQL
+from recluster_queue import recluster_scheduler
 from utils import classify_income, classify_honors
 from utils_complete import is_record_complete_row, filter_complete_students_df
 import routes.clusters as clusters_module
+import pandas as pd
 from .users import log_activity, resolve_user
 
 router = APIRouter()
@@ -18,22 +23,13 @@ async def get_students(
     shs_type: Optional[str] = None,
     honors: Optional[str] = None,
     search: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    connection=Depends(get_db)
 ):
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = connection.cursor(dictionary=True)
-
-    cursor.execute("SELECT id FROM datasets ORDER BY upload_date DESC LIMIT 1")
-    latest_dataset = cursor.fetchone()
-    if not latest_dataset:
-        cursor.close()
-        connection.close()
+    dataset_id, _ = await current_dataset.get(connection)
+    if not dataset_id:
         return []
 
-    dataset_id = latest_dataset["id"]
-
     query = "SELECT * FROM students WHERE dataset_id = %s"
     params = [dataset_id]
 
@@ -60,29 +56,26 @@ async def get_students(
         query += " AND (firstname LIKE %s OR lastname LIKE %s)"
         params.extend([f"%{search}%", f"%{search}%"])
 
-    cursor.execute(query, params)
+    cursor = connection.cursor(dictionary=True)
+    await cursor.execute(query, params)
     students = cursor.fetchall()
     cursor.close()
-    connection.close()
     return students
 
 @router.put("/students/{student_id}")
 async def update_student(
     student_id: int,
     student_data: dict = Body(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    connection=Depends(get_db)
 ):
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
     cursor = connection.cursor(dictionary=True)
 
     # Fetch existing student
-    cursor.execute("SELECT * FROM students WHERE id = %s", (student_id,))
+    await cursor.execute("SELECT * FROM students WHERE id = %s", (student_id,))
     student = cursor.fetchone()
     if not student:
         cursor.close()
-        connection.close()
         raise HTTPException(status_code=404, detail="Student not found")
 
     # Extract editable fields
@@ -109,65 +102,80 @@ async def update_student(
     """
 
     try:
-        cursor.execute(update_query, (
+        await cursor.execute(update_query, (
             firstname, lastname, sex, program,
             municipality, shs_type, gwa, income,
             honors, income_category, student_id
         ))
-        connection.commit()
+        # the dataset no longer matches its uploaded file, so re-uploads must not reuse it
+        await cursor.execute("UPDATE datasets SET content_hash = NULL WHERE id = %s", (student["dataset_id"],))
+        await cursor.execute(INVALIDATE_PLAYGROUND_SQL, (student["dataset_id"],))
+        await connection.commit()
         # ✅ Log the edit action (for both Admin and Viewer)
         full_name = f"{firstname} {lastname}".strip()
         log_activity(
             current_user["id"],
             "Edit Student Record",
-            f"{current_user['email']} edited record of {full_name} (ID: {student_id}). Reclustering triggered."
+            f"{current_user['email']} edited record of {full_name} (ID: {student_id})."
         )
 
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(status_code=500, detail=f"Database update failed: {str(e)}")
     finally:
         cursor.close()
-        connection.close()
+
+    # The dataset's rows changed; anything cached against its version is stale
+    current_dataset.touch(student["dataset_id"])
 
     # After update, check if the student became complete; if so, trigger recluster
     # Fetch the freshly updated student row
-    conn2 = get_db_connection()
-    if conn2:
-        cur2 = conn2.cursor(dictionary=True)
-        cur2.execute("SELECT * FROM students WHERE id = %s", (student_id,))
-        updated = cur2.fetchone()
-        cur2.close(); conn2.close()
-
-        # Check completeness
+    cur2 = connection.cursor(dictionary=True)
+    await cur2.execute("SELECT * FROM students WHERE id = %s", (student_id,))
+    updated = cur2.fetchone()
+    cur2.close()
+
+    # Check completeness
+    became_complete = False
+    was_complete_before = False
+    is_complete_now = False
+    try:
+        was_complete_before = is_record_complete_row(student)
+        is_complete_now = is_record_complete_row(updated)
+        if (not was_complete_before) and is_complete_now:
+            became_complete = True
+    except Exception:
         became_complete = False
+
+    assignment_failed = False
+    # ✅ A complete student is placed with the stored model of its dataset's run: no refit needed
+    if is_complete_now:
+        try:
+            cluster_id, model = await model_registry.latest(connection, student["dataset_id"])
+            if model is not None:
+                cluster_number = int(model.predict(pd.DataFrame([updated]))[0])
+                # False when a recluster replaced the run since the prediction
+                if await connection.run(
+                    set_student_assignment, student["dataset_id"], student_id, cluster_number, cluster_id
+                ):
+                    return {"message": "Student updated successfully.", "cluster_number": cluster_number}
+                assignment_failed = True
+        except Exception as e:
+            print("Cluster assignment failed, falling back to recluster:", e)
+            assignment_failed = True
+    elif was_complete_before:
+        # ✅ An incomplete student has no place in the run: drop its stale assignment
         try:
-            was_complete_before = is_record_complete_row(student)
-            is_complete_now = is_record_complete_row(updated)
-            if (not was_complete_before) and is_complete_now:
-                became_complete = True
-        except Exception:
-            became_complete = False
-
-        if became_complete:
-            # Trigger recluster with k from latest clusters (if exists) or default k=3
-            try:
-                # find last k
-                conn3 = get_db_connection()
-                if conn3:
-                    cur3 = conn3.cursor(dictionary=True)
-                    cur3.execute("SELECT k FROM clusters WHERE dataset_id = (SELECT id FROM datasets ORDER BY upload_date DESC LIMIT 1) ORDER BY id DESC LIMIT 1")
-                    row = cur3.fetchone()
-                    cur3.close(); conn3.close()
-                    k_to_use = int(row["k"]) if row and row.get("k") else 3
-                else:
-                    k_to_use = 3
-
-                # Call recluster route function directly (it handles role checks and saving)
-                import asyncio
-                asyncio.create_task(clusters_module.recluster(k=k_to_use, current_user=current_user))
-            except Exception as e:
-                # don't fail the update if recluster trigger failed; log instead
-                print("Recluster trigger failed:", e)
-
-    return {"message": "Student updated successfully. Reclustering triggered."}
\ No newline at end of file
+            await connection.run(set_student_assignment, student["dataset_id"], student_id)
+        except Exception as e:
+            print("Removing the cluster assignment failed, falling back to recluster:", e)
+            assignment_failed = True
+
+    if became_complete or assignment_failed:
+        # ✅ Queue a recluster: edits within the debounce window share one run, with the k of the run at that time
+        status = recluster_scheduler.request(
+            student["dataset_id"], None, clusters_module.recluster_dataset, requested_by=current_user["id"]
+        )
+        return {"message": "Student updated successfully. Reclustering scheduled.", "recluster": status}
+
+    return {"message": "Student updated successfully."}
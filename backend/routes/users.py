@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, Body, Depends
-from db import get_db_connection
-from dependencies import get_current_user
+from db import get_async_connection
+from dependencies import get_current_user, get_db
 from security import get_password_hash, verify_password
+from user_cache import user_cache
+from activity_log import activity_log
 import json
 from pydantic import BaseModel
 from typing import Optional
@@ -9,53 +11,55 @@ from typing import Optional
 router = APIRouter()
 
 # --- helper ---
-def resolve_user(current_user: dict):
+async def resolve_user(current_user: dict, connection=None):
     """
     Resolve a user from either ID (int) or email (string) in current_user.
+    Reuses the request's connection when one is passed in; cached rows skip the query.
     """
-    connection = get_db_connection()
+    cached = user_cache.get(current_user.get("email"))
+    if cached:
+        return cached
+
+    owns_connection = connection is None
+    if owns_connection:
+        connection = await get_async_connection()
     cursor = connection.cursor(dictionary=True)
 
     user = None
     sub = current_user.get("id") or current_user.get("sub")
 
     try:
-        cursor.execute("SELECT * FROM users WHERE id=%s", (int(sub),))
+        await cursor.execute("SELECT * FROM users WHERE id=%s", (int(sub),))
         user = cursor.fetchone()
     except (ValueError, TypeError):
         pass
 
     if not user and isinstance(sub, str):
-        cursor.execute("SELECT * FROM users WHERE email=%s", (sub,))
+        await cursor.execute("SELECT * FROM users WHERE email=%s", (sub,))
         user = cursor.fetchone()
 
     cursor.close()
-    connection.close()
+    if owns_connection:
+        await connection.close()
+    if user and user.get("active"):
+        user_cache.put(user)
     return user
 
 
 def log_activity(user_id: int, action: str, details: str = ""):
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    cursor.execute(
-        "INSERT INTO activity_logs (user_id, action, details) VALUES (%s, %s, %s)",
-        (user_id, action, details),
-    )
-    connection.commit()
-    cursor.close()
-    connection.close()
+    # Queued for the write-behind writer; no database round trip in the request
+    activity_log.submit(user_id, action, details)
 
 
 # --- Get all users (Admin only) ---
 @router.get("/users")
-async def get_users(current_user: dict = Depends(get_current_user)):
-    user = resolve_user(current_user)
+async def get_users(current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    user = await resolve_user(current_user, connection)
     if not user or user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can view users")
 
-    connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT id, email, role, active, profile, created_at FROM users ORDER BY created_at DESC")
+    await cursor.execute("SELECT id, email, role, active, profile, created_at FROM users ORDER BY created_at DESC")
     users = cursor.fetchall()
 
     for u in users:
@@ -70,15 +74,14 @@ async def get_users(current_user: dict = Depends(get_current_user)):
             u["profile"] = {"name": "", "department": "", "position": ""}
 
     cursor.close()
-    connection.close()
 
     return users
 
 
 # --- User changes their own password ---
 @router.post("/users/change-password")
-async def change_password(data: dict = Body(...), current_user: dict = Depends(get_current_user)):
-    user = resolve_user(current_user)
+async def change_password(data: dict = Body(...), current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    user = await resolve_user(current_user, connection)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -97,12 +100,11 @@ async def change_password(data: dict = Body(...), current_user: dict = Depends(g
 
     new_hashed = get_password_hash(new_password)
 
-    connection = get_db_connection()
     cursor = connection.cursor()
-    cursor.execute("UPDATE users SET password_hash=%s WHERE id=%s", (new_hashed, user["id"]))
-    connection.commit()
+    await cursor.execute("UPDATE users SET password_hash=%s WHERE id=%s", (new_hashed, user["id"]))
+    await connection.commit()
     cursor.close()
-    connection.close()
+    user_cache.invalidate(user_id=user["id"])
 
     # ✅ Log password change
     log_activity(user["id"], "Password Change", "User updated their password")
@@ -112,8 +114,8 @@ async def change_password(data: dict = Body(...), current_user: dict = Depends(g
 
 # --- Get current logged-in user ---
 @router.get("/users/me")
-async def get_current_user_profile(current_user: dict = Depends(get_current_user)):
-    user = resolve_user(current_user)
+async def get_current_user_profile(current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    user = await resolve_user(current_user, connection)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -123,8 +125,8 @@ async def get_current_user_profile(current_user: dict = Depends(get_current_user
 
 # --- Create new user (Admin only) ---
 @router.post("/users")
-async def create_user(data: dict = Body(...), current_user: dict = Depends(get_current_user)):
-    admin = resolve_user(current_user)
+async def create_user(data: dict = Body(...), current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    admin = await resolve_user(current_user, connection)
     if not admin or admin["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can create users")
 
@@ -142,23 +144,20 @@ async def create_user(data: dict = Body(...), current_user: dict = Depends(get_c
     if len(password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
 
-    connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
+    await cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
     if cursor.fetchone():
         cursor.close()
-        connection.close()
         raise HTTPException(status_code=400, detail="Email already exists")
 
     hashed_password = get_password_hash(password)
-    cursor.execute(
+    await cursor.execute(
         "INSERT INTO users (email, password_hash, role, profile, active) VALUES (%s, %s, %s, %s, TRUE)",
         (email, hashed_password, role, json.dumps(profile))
     )
-    connection.commit()
+    await connection.commit()
     new_id = cursor.lastrowid
     cursor.close()
-    connection.close()
 
     # ✅ Log admin creating user
     log_activity(admin["id"], "Create User", f"Admin created new user: {email}")
@@ -177,8 +176,8 @@ class ProfileUpdate(BaseModel):
 
 
 @router.put("/users/me")
-async def update_current_user_profile(update: ProfileUpdate, current_user: dict = Depends(get_current_user)):
-    user = resolve_user(current_user)
+async def update_current_user_profile(update: ProfileUpdate, current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    user = await resolve_user(current_user, connection)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -189,12 +188,11 @@ async def update_current_user_profile(update: ProfileUpdate, current_user: dict
     existing_profile = json.loads(user["profile"]) if user["profile"] else {}
     updated_profile = {**existing_profile, **updates}
 
-    connection = get_db_connection()
     cursor = connection.cursor()
-    cursor.execute("UPDATE users SET profile=%s WHERE id=%s", (json.dumps(updated_profile), user["id"]))
-    connection.commit()
+    await cursor.execute("UPDATE users SET profile=%s WHERE id=%s", (json.dumps(updated_profile), user["id"]))
+    await connection.commit()
     cursor.close()
-    connection.close()
+    user_cache.invalidate(user_id=user["id"])
 
     # ✅ Log profile update
     log_activity(user["id"], "Update Profile", f"User updated profile fields: {', '.join(updates.keys())}")
@@ -204,8 +202,8 @@ async def update_current_user_profile(update: ProfileUpdate, current_user: dict
 
 # --- Admin resets a user's password ---
 @router.post("/users/{user_id}/reset-password")
-async def admin_reset_password(user_id: int, data: dict = Body(...), current_user: dict = Depends(get_current_user)):
-    admin = resolve_user(current_user)
+async def admin_reset_password(user_id: int, data: dict = Body(...), current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    admin = await resolve_user(current_user, connection)
     if not admin or admin["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can reset passwords")
 
@@ -219,20 +217,18 @@ async def admin_reset_password(user_id: int, data: dict = Body(...), current_use
     if len(new_password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
 
-    connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT id, email FROM users WHERE id=%s", (user_id,))
+    await cursor.execute("SELECT id, email FROM users WHERE id=%s", (user_id,))
     target_user = cursor.fetchone()
     if not target_user:
         cursor.close()
-        connection.close()
         raise HTTPException(status_code=404, detail="Target user not found")
 
     hashed = get_password_hash(new_password)
-    cursor.execute("UPDATE users SET password_hash=%s WHERE id=%s", (hashed, user_id))
-    connection.commit()
+    await cursor.execute("UPDATE users SET password_hash=%s WHERE id=%s", (hashed, user_id))
+    await connection.commit()
     cursor.close()
-    connection.close()
+    user_cache.invalidate(email=target_user["email"], user_id=user_id)
 
     # ✅ Log admin reset
     log_activity(admin["id"], "Reset User Password", f"Admin reset password for user {target_user['email']}")
@@ -242,8 +238,8 @@ async def admin_reset_password(user_id: int, data: dict = Body(...), current_use
 
 # --- Update existing user (Admin only) ---
 @router.put("/users/{user_id}")
-async def update_user(user_id: int, data: dict = Body(...), current_user: dict = Depends(get_current_user)):
-    admin = resolve_user(current_user)
+async def update_user(user_id: int, data: dict = Body(...), current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    admin = await resolve_user(current_user, connection)
     if not admin or admin["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can update users")
 
@@ -254,19 +250,17 @@ async def update_user(user_id: int, data: dict = Body(...), current_user: dict =
         "position": data.get("position", "")
     }
 
-    connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT email FROM users WHERE id=%s", (user_id,))
+    await cursor.execute("SELECT email FROM users WHERE id=%s", (user_id,))
     target_user = cursor.fetchone()
     if not target_user:
         cursor.close()
-        connection.close()
         raise HTTPException(status_code=404, detail="User not found")
 
-    cursor.execute("UPDATE users SET role=%s, profile=%s WHERE id=%s", (role, json.dumps(profile), user_id))
-    connection.commit()
+    await cursor.execute("UPDATE users SET role=%s, profile=%s WHERE id=%s", (role, json.dumps(profile), user_id))
+    await connection.commit()
     cursor.close()
-    connection.close()
+    user_cache.invalidate(email=target_user["email"], user_id=user_id)
 
     # ✅ Log admin update
     log_activity(admin["id"], "Update User", f"Admin updated user: {target_user['email']}")
@@ -276,20 +270,19 @@ async def update_user(user_id: int, data: dict = Body(...), current_user: dict =
 
 # --- Delete User ---
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: int, current_user: dict = Depends(get_current_user)):
-    admin = resolve_user(current_user)
+async def delete_user(user_id: int, current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    admin = await resolve_user(current_user, connection)
     if not admin or admin["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only Admins can delete users")
 
-    connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT email FROM users WHERE id=%s", (user_id,))
+    await cursor.execute("SELECT email FROM users WHERE id=%s", (user_id,))
     target_user = cursor.fetchone()
 
-    cursor.execute("DELETE FROM users WHERE id=%s", (user_id,))
-    connection.commit()
+    await cursor.execute("DELETE FROM users WHERE id=%s", (user_id,))
+    await connection.commit()
     cursor.close()
-    connection.close()
+    user_cache.invalidate(email=target_user["email"] if target_user else None, user_id=user_id)
 
     # ✅ Log deletion
     log_activity(admin["id"], "Delete User", f"Admin deleted user: {target_user['email'] if target_user else user_id}")
@@ -299,23 +292,22 @@ async def delete_user(user_id: int, current_user: dict = Depends(get_current_use
 
 # --- Get activity logs (Admin or user-specific) ---
 @router.get("/activity-logs")
-async def get_activity_logs(current_user: dict = Depends(get_current_user)):
-    user = resolve_user(current_user)
+async def get_activity_logs(current_user: dict = Depends(get_current_user), connection=Depends(get_db)):
+    user = await resolve_user(current_user, connection)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
 
     if user["role"] == "Admin":
-        cursor.execute("""
+        await cursor.execute("""
             SELECT a.id, a.action, a.details, a.created_at, u.email AS user_email
             FROM activity_logs a
             JOIN users u ON a.user_id = u.id
             ORDER BY a.created_at DESC
         """)
     else:
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id, action, details, created_at
             FROM activity_logs
             WHERE user_id = %s
@@ -324,5 +316,4 @@ async def get_activity_logs(current_user: dict = Depends(get_current_user)):
 
     logs = cursor.fetchall()
     cursor.close()
-    connection.close()
     return logs
@@ -0,0 +1,90 @@
+"""Staged uploads: parse and run the elbow search once, then preview and commit.
+
+A staged upload keeps the normalized frame, the scaled clustering features and
+the elbow fits in memory under the SHA-256 of the file contents, so posting the
+same file again is a cache hit. Stages are dropped after STAGING_TTL_SECONDS of
+inactivity, and the least recently used one goes when STAGING_MAX_ENTRIES is hit.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from config import STAGING_TTL_SECONDS, STAGING_MAX_ENTRIES, UPLOAD_CHUNK_BYTES
+
+
+def content_hash(stream) -> str:
+    """SHA-256 of a binary stream, read in chunks (blocking; run in a thread)."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class StagedUpload:
+    """Everything the commit step needs, computed once at staging time."""
+
+    def __init__(self, stage_id: str, filename: str, df, complete, scaler, X_scaled, wcss, models, recommended_k):
+        self.id = stage_id
+        self.filename = filename
+        self.df = df
+        self.complete = complete
+        self.scaler = scaler
+        self.X_scaled = X_scaled
+        self.wcss = wcss
+        self.models = models
+        self.recommended_k = recommended_k
+        self.metrics = {}  # k -> quality metrics, filled on demand
+        self.created_at = time.time()
+
+    def summary(self) -> dict:
+        return {
+            "stage_id": self.id,
+            "filename": self.filename,
+            "total_rows": len(self.df),
+            "complete_rows": int(self.complete.sum()),
+            "wcss": self.wcss,
+            "recommended_k": self.recommended_k,
+        }
+
+
+class StagingStore:
+    def __init__(self, ttl: float, max_entries: int):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._stages = OrderedDict()  # stage_id -> (StagedUpload, last_used)
+        self._lock = threading.Lock()
+
+    def get(self, stage_id: str):
+        with self._lock:
+            self._expire()
+            entry = self._stages.get(stage_id)
+            if entry is None:
+                return None
+            self._stages[stage_id] = (entry[0], time.monotonic())
+            self._stages.move_to_end(stage_id)
+            return entry[0]
+
+    def put(self, staged: StagedUpload):
+        with self._lock:
+            self._expire()
+            self._stages[staged.id] = (staged, time.monotonic())
+            self._stages.move_to_end(staged.id)
+            while len(self._stages) > self._max_entries:
+                self._stages.popitem(last=False)
+
+    def discard(self, stage_id: str) -> bool:
+        with self._lock:
+            return self._stages.pop(stage_id, None) is not None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self._ttl
+        while self._stages:
+            stage_id, (_, last_used) = next(iter(self._stages.items()))
+            if last_used >= cutoff:
+                break
+            del self._stages[stage_id]
+
+
+staged_uploads = StagingStore(STAGING_TTL_SECONDS, STAGING_MAX_ENTRIES)
@@ -0,0 +1,122 @@
+"""Shared test setup: the backend importable, required settings, and a fake MySQL driver.
+
+Run from backend/ with ``python -m pytest -q tests``. Nothing here needs a
+MySQL server; tests that do (the EXPLAIN check) skip unless MYSQLHOST is set.
+"""
+import os
+import sys
+import time
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# config.py reads these at import time
+for key, value in {
+    "SECRET_KEY": "test-secret",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "test@example.com",
+    "RUN_MIGRATIONS": "False",
+}.items():
+    os.environ.setdefault(key, value)
+
+import mysql.connector  # noqa: E402
+
+ADMIN = {"id": 1, "email": "admin@example.com", "role": "Admin", "profile": None, "password_hash": "x", "active": 1}
+
+
+class FakeCursor:
+    def __init__(self, driver, dictionary: bool):
+        self._driver = driver
+        self._dictionary = dictionary
+        self.rows = []
+        self.lastrowid = 1
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self._driver.queries.append(query)
+        for fragment, seconds in self._driver.slow.items():
+            if fragment in query:
+                time.sleep(seconds)
+        rows = self._driver.answer(query)
+        self.rows = rows if self._dictionary else [tuple(row.values()) for row in rows]
+        self.rowcount = len(self.rows)
+
+    def executemany(self, query, seq_params):
+        self._driver.queries.append(query)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    in_transaction = False
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def cursor(self, buffered=False, dictionary=False):
+        return FakeCursor(self._driver, dictionary)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def consume_results(self):
+        pass
+
+    def start_transaction(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    """Answers queries by substring: ``responses`` maps a fragment to dict rows, ``slow`` to a delay."""
+
+    def __init__(self):
+        self.responses = {"FROM users": [ADMIN]}
+        self.slow = {}
+        self.queries = []
+
+    def answer(self, query):
+        for fragment, rows in self.responses.items():
+            if fragment in query:
+                return [dict(row) for row in rows]
+        return []
+
+
+@pytest.fixture
+def fake_mysql(monkeypatch):
+    """Route every mysql.connector.connect() through a FakeDriver, with a fresh pool."""
+    import db
+    from dataset_registry import current_dataset
+    from user_cache import user_cache
+
+    driver = FakeDriver()
+    monkeypatch.setattr(mysql.connector, "connect", lambda **kwargs: FakeConnection(driver))
+    monkeypatch.setattr(db, "_pool", None)
+    monkeypatch.setattr(db, "_query_limiter", None)
+    monkeypatch.setattr(current_dataset, "_loaded_at", None)
+    user_cache.clear()
+    yield driver
+    db.close_pool()
+
+
+@pytest.fixture
+def admin_headers():
+    import security
+    return {"Authorization": f"Bearer {security.create_access_token({'sub': ADMIN['email']})}"}
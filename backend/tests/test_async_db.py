@@ -0,0 +1,59 @@
+"""A slow query runs in a worker thread and must not hold up other requests (db.AsyncConnection)."""
+import asyncio
+import time
+import httpx
+import pytest
+
+SLOW_QUERY_SECONDS = 1.0
+
+
+async def _slow_students_then_me(headers):
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.monotonic()
+        slow = asyncio.create_task(client.get("/api/students", headers=headers))
+        await asyncio.sleep(0.1)  # let the slow query reach the driver
+        me = await client.get("/api/auth/me", headers=headers)
+        me_elapsed = time.monotonic() - start
+        students = await slow
+        return me, me_elapsed, students, time.monotonic() - start
+
+
+def test_slow_query_does_not_block_other_requests(fake_mysql, admin_headers):
+    fake_mysql.responses["FROM datasets"] = [{"id": 1}]
+    fake_mysql.slow["FROM students"] = SLOW_QUERY_SECONDS
+
+    me, me_elapsed, students, total = asyncio.run(_slow_students_then_me(admin_headers))
+
+    assert me.status_code == 200
+    assert me.json()["email"] == "admin@example.com"
+    assert students.status_code == 200
+    assert total >= SLOW_QUERY_SECONDS
+    # /auth/me answered while the students query was still sleeping in its thread
+    assert me_elapsed < SLOW_QUERY_SECONDS / 2
+
+
+def test_query_threads_are_capped(fake_mysql):
+    import anyio
+    import db
+
+    fake_mysql.slow["SELECT SLEEP"] = 0.2
+
+    async def query():
+        connection = await db.get_async_connection()
+        try:
+            cursor = connection.cursor()
+            await cursor.execute("SELECT SLEEP(0.2)")
+        finally:
+            await connection.close()
+
+    async def burst():
+        db._query_limiter = anyio.CapacityLimiter(2)  # as if DB_POOL_SIZE were 2; fake_mysql resets it
+        start = time.monotonic()
+        await asyncio.gather(*(query() for _ in range(4)))
+        return time.monotonic() - start
+
+    # 4 queries through 2 query threads: two rounds, not one
+    assert asyncio.run(burst()) == pytest.approx(0.4, abs=0.15)
@@ -0,0 +1,38 @@
+"""cluster_metrics.quality_metrics matches sklearn's scores, sampling only the silhouette."""
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+from cluster_metrics import quality_metrics
+
+
+def _clustered(rows: int, k: int = 4):
+    rng = np.random.default_rng(0)
+    X = np.vstack([rng.normal(center, 1.0, size=(rows // k, 3)) for center in range(0, 4 * k, 4)])
+    return X, KMeans(n_clusters=k, n_init=3, random_state=0).fit_predict(X)
+
+
+def test_small_runs_get_exact_scores():
+    X, labels = _clustered(2_000)
+    metrics = quality_metrics(X, labels)
+    assert metrics["silhouette_sample_size"] is None
+    assert metrics["silhouette"] == pytest.approx(silhouette_score(X, labels))
+    assert metrics["davies_bouldin"] == pytest.approx(davies_bouldin_score(X, labels))
+    assert metrics["calinski_harabasz"] == pytest.approx(calinski_harabasz_score(X, labels))
+
+
+def test_large_runs_sample_the_silhouette_only():
+    X, labels = _clustered(40_000)
+    metrics = quality_metrics(X, labels, sample_size=5_000)
+    assert metrics["silhouette_sample_size"] == 5_000
+    assert metrics["silhouette"] == pytest.approx(silhouette_score(X[::4], labels[::4]), abs=0.01)
+    assert metrics["davies_bouldin"] == pytest.approx(davies_bouldin_score(X, labels))
+    assert metrics["calinski_harabasz"] == pytest.approx(calinski_harabasz_score(X, labels))
+    # seeded: the same run always stores the same number
+    assert quality_metrics(X, labels, sample_size=5_000) == metrics
+
+
+def test_single_cluster_scores_zero():
+    X = np.random.default_rng(0).normal(size=(50, 2))
+    metrics = quality_metrics(X, np.zeros(50, dtype=int))
+    assert (metrics["silhouette"], metrics["davies_bouldin"], metrics["calinski_harabasz"]) == (0, 0, 0)
@@ -0,0 +1,102 @@
+"""uploads.read_excel_frame gives the same frame as pd.read_excel, with either sheet reader."""
+import datetime
+import io
+import os
+import time
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+import uploads
+
+ENGINES = ["openpyxl"] + (["calamine"] if uploads.CalamineWorkbook is not None else [])
+
+
+@pytest.fixture(params=ENGINES)
+def engine(request, monkeypatch):
+    if request.param == "openpyxl":
+        monkeypatch.setattr(uploads, "CalamineWorkbook", None)
+    return request.param
+
+
+def _workbook(rows) -> io.BytesIO:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    stream = io.BytesIO()
+    workbook.save(stream)
+    return stream
+
+
+def _assert_same_as_pandas(stream):
+    stream.seek(0)
+    expected = pd.read_excel(stream)
+    stream.seek(0)
+    actual = uploads.read_excel_frame(stream)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_mixed_cells_match_pandas(engine):
+    stream = _workbook([
+        ["First Name", "gwa", "income", "when", "flag", None, "Unnamed"],
+        ["a", 90.0, 1000, datetime.datetime(2024, 1, 2), True, None, None],
+        [None, "95.5", None, None, False],
+        ["#N/A", 88.25, 2.5],
+        [None] * 7,
+    ])
+    _assert_same_as_pandas(stream)
+
+
+def test_trailing_formatted_cells_are_ignored(engine):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["firstname", "gwa", "income"])
+    sheet.append(["a", 91, 20000])
+    sheet["H3"] = "x"  # a stray cell past the data widens the sheet
+    sheet["A8"] = None
+    stream = io.BytesIO()
+    workbook.save(stream)
+    _assert_same_as_pandas(stream)
+
+
+def test_header_only_and_empty_sheets_match_pandas(engine):
+    _assert_same_as_pandas(_workbook([["firstname", "gwa", "income"]]))
+    _assert_same_as_pandas(_workbook([]))
+
+
+def _student_workbook(rows: int) -> io.BytesIO:
+    rng = np.random.default_rng(0)
+    header = ["firstname", "lastname", "sex", "program", "municipality", "shs_type", "gwa", "income"]
+    data = [
+        ["Juan", "Dela Cruz", "M", "BSCS", "Tagum", "public", round(float(g), 2), int(i)]
+        for g, i in zip(rng.uniform(75, 100, rows), rng.uniform(5_000, 300_000, rows))
+    ]
+    return _workbook([header] + data)
+
+
+def test_student_export_matches_pandas(engine):
+    _assert_same_as_pandas(_student_workbook(500))
+
+
+def _warm_seconds(read, stream) -> float:
+    stream.seek(0)
+    read(stream)  # first call pays for imports and caches
+    stream.seek(0)
+    start = time.perf_counter()
+    read(stream)
+    return time.perf_counter() - start
+
+
+@pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 for the 10k-200k row benchmark")
+@pytest.mark.parametrize("rows", [10_000, 50_000, 200_000])
+def test_benchmark_against_read_excel(engine, rows):
+    stream = _student_workbook(rows)
+    baseline = _warm_seconds(pd.read_excel, stream)
+    fast = _warm_seconds(uploads.read_excel_frame, stream)
+    print(f"\n{engine} {rows} rows: read_excel {baseline:.2f}s, read_excel_frame {fast:.2f}s")
+    if engine == "calamine":
+        assert fast * 2 < baseline
+    else:
+        # pandas already reads openpyxl sheets in read-only mode: the fallback only has to keep up
+        assert fast < baseline * 1.25
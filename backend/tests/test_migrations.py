@@ -0,0 +1,111 @@
+"""migrations.py: the hot queries use their indexes, and orphans are never deleted silently."""
+import os
+import pytest
+import migrations
+
+
+class ScriptedCursor:
+    """Answers fetches by query fragment and records every statement."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.statements = []
+        self.rowcount = 0
+        self._query = ""
+
+    def execute(self, query, params=None):
+        self._query = " ".join(query.split())
+        self.statements.append(self._query)
+        self.rowcount = next((value for fragment, value in self.answers.items()
+                              if self._query.startswith("DELETE") and fragment in self._query), 0)
+
+    def _answer(self):
+        for fragment, value in self.answers.items():
+            if fragment in self._query:
+                return value
+        return 0 if "COUNT(*)" in self._query else None
+
+    def fetchone(self):
+        value = self._answer()
+        return value[0] if isinstance(value, list) else (value,) if value is not None else None
+
+    def fetchall(self):
+        value = self._answer()
+        return value if isinstance(value, list) else []
+
+    def close(self):
+        pass
+
+
+class ScriptedConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, **kwargs):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+
+@pytest.mark.skipif(not os.getenv("MYSQLHOST"), reason="needs a MySQL server (set MYSQLHOST and friends)")
+def test_hot_queries_use_their_indexes():
+    from db import get_db_connection
+
+    connection = get_db_connection()
+    assert connection, "database connection failed"
+    try:
+        migrations.run_migrations(connection, delete_orphans=True)
+        results = migrations.explain_hot_queries(connection)
+    finally:
+        connection.close()
+    failures = [(description, expected, used) for description, expected, used, ok in results if not ok]
+    assert not failures
+
+
+def test_explain_check_reports_the_key_each_query_used():
+    plans = {query: [{"key": expected}] for _, query, expected in migrations.HOT_QUERIES}
+    plans[migrations.HOT_QUERIES[0][1]] = [{"key": None}]  # a full scan
+
+    class ExplainCursor(ScriptedCursor):
+        def fetchone(self):
+            return {"id": 7}
+
+        def fetchall(self):
+            return plans[self._query[len("EXPLAIN "):]]
+
+    cursor = ExplainCursor({})
+    results = migrations.explain_hot_queries(ScriptedConnection(cursor))
+
+    assert [ok for *_, ok in results] == [False] + [True] * (len(results) - 1)
+    assert all(statement.startswith(("SELECT", "EXPLAIN")) for statement in cursor.statements)
+
+
+def _pending_cascade_migration(monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATIONS", [m for m in migrations.MIGRATIONS if m[0] == 3])
+
+
+def test_startup_refuses_to_delete_orphans(monkeypatch, capsys):
+    _pending_cascade_migration(monkeypatch)
+    cursor = ScriptedCursor({"GET_LOCK": 1, "COUNT(*) FROM students": 5, "COUNT(*) FROM student_cluster": 2})
+
+    with pytest.raises(RuntimeError, match="python migrations.py"):
+        migrations.run_migrations(ScriptedConnection(cursor))
+
+    out = capsys.readouterr().out
+    assert "students.dataset_id: 5" in out
+    assert "student_cluster.student_id: 2" in out
+    assert not any(s.startswith(("DELETE", "ALTER", "INSERT")) for s in cursor.statements)
+    assert cursor.statements[-1].startswith("SELECT RELEASE_LOCK")
+
+
+def test_manual_run_deletes_orphans_and_reports_counts(monkeypatch, capsys):
+    _pending_cascade_migration(monkeypatch)
+    cursor = ScriptedCursor({"GET_LOCK": 1, "students t": 5, "student_cluster t": 2})
+
+    assert migrations.run_migrations(ScriptedConnection(cursor), delete_orphans=True) == [3]
+
+    out = capsys.readouterr().out
+    assert "Deleted 5 students row(s)" in out
+    first_alter = next(i for i, s in enumerate(cursor.statements) if s.startswith("ALTER"))
+    assert all(i < first_alter for i, s in enumerate(cursor.statements) if s.startswith("DELETE"))
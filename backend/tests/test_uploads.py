@@ -0,0 +1,92 @@
+"""Uploads are size-checked before they are read and copied in bounded chunks (uploads.py)."""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import tracemalloc
+import httpx
+import pytest
+from fastapi import HTTPException, UploadFile
+import uploads
+from config import UPLOAD_CHUNK_BYTES
+
+# RUN_BENCHMARKS runs the copy with a multi-hundred-MB file
+COPY_TEST_MB = 300 if os.getenv("RUN_BENCHMARKS") else 48
+
+
+def test_declared_oversize_body_is_refused_before_it_is_read(fake_mysql, admin_headers):
+    import main
+
+    async def post():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {**admin_headers, "Content-Length": str(uploads.MAX_UPLOAD_BYTES + 1)}
+            return await client.post("/api/datasets/stage", headers=headers, content=b"x")
+
+    response = asyncio.run(post())
+    assert response.status_code == 413
+    assert "File too large" in response.json()["detail"]
+
+
+def test_body_within_limit_reaches_the_app():
+    received = []
+
+    async def app(scope, receive, send):
+        received.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def post(size):
+        transport = httpx.ASGITransport(app=uploads.UploadSizeLimitMiddleware(app, max_bytes=1000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/upload", content=b"x" * size)
+
+    assert asyncio.run(post(1000)).status_code == 200
+    assert asyncio.run(post(1001)).status_code == 413
+    assert received == ["/upload"]
+
+
+def test_chunked_upload_without_length_is_checked_after_receipt(monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1000)
+    small = UploadFile(io.BytesIO(b"x" * 1000), filename="a.csv")
+    large = UploadFile(io.BytesIO(b"x" * 1001), filename="a.csv")
+
+    uploads.check_upload_size(small)
+    with pytest.raises(HTTPException) as error:
+        uploads.check_upload_size(large)
+    assert error.value.status_code == 413
+
+
+def test_detached_copy_streams_in_bounded_memory():
+    header = b"firstname,lastname,sex,program,municipality,shs_type,gwa,income\n"
+    row = b"Juan,Dela Cruz,M,BSCS,Tagum,public,91.25,35000\n"
+    with tempfile.TemporaryFile() as source:
+        source.write(header)
+        digest = hashlib.sha256(header)
+        block = row * (1024 * 1024 // len(row))
+        for _ in range(COPY_TEST_MB):
+            source.write(block)
+            digest.update(block)
+        source.seek(0)
+
+        tracemalloc.start()
+        try:
+            copy, hexdigest = uploads.detach_upload(UploadFile(source, filename="big.csv"))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    with copy:
+        assert hexdigest == digest.hexdigest()
+        assert uploads.stream_size(copy) == len(header) + COPY_TEST_MB * len(block)
+    # a few chunks in flight at most, whatever the file size
+    assert peak < 4 * UPLOAD_CHUNK_BYTES
+
+
+def test_csv_is_parsed_straight_from_the_stream():
+    stream = io.BytesIO(b"firstname,gwa,income\na,91.5,1000\nb,,\n")
+    stream.seek(5)  # callers may hand over a stream that was already read from
+    df = uploads.read_frame(stream, "students.csv")
+    assert df["firstname"].tolist() == ["a", "b"]
+    assert str(df["gwa"].dtype) == "float64"
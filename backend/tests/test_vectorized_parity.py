@@ -0,0 +1,85 @@
+"""The vectorized classifiers and completeness mask match the per-row functions they replace."""
+import os
+import random
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from utils import classify_honors, classify_honors_series, classify_income, classify_income_series
+from utils_complete import complete_mask, filter_complete_students_df, is_record_complete_row
+
+# values seen in real uploads plus the awkward spellings float() and pandas disagree on
+ODD_VALUES = [
+    None, np.nan, pd.NA, "", " ", "n/a", "NA", "None", "nan", "inf", "-inf", "1_000", "1e3", " 92 ", "abc",
+    "Incomplete", "-1", -1, 0, 0.0, 1, 1.5, "90", "95.5", 89.999, 90, 94.99, 95, 97.5, 98, 100, 101,
+    True, False, 12029.99, 12030, 24060, 48119, 84210, 144360, 240599, 240600, 1e9,
+]
+TEXT_COLUMNS = ["firstname", "lastname", "sex", "program", "municipality", "shs_type"]
+
+
+def _random_frame(rng: random.Random, rows: int, numeric: bool) -> pd.DataFrame:
+    df = pd.DataFrame({c: [rng.choice(ODD_VALUES + ["x", "y"]) for _ in range(rows)] for c in TEXT_COLUMNS})
+    for column in ("gwa", "income"):
+        values = [rng.choice(ODD_VALUES) for _ in range(rows)]
+        df[column] = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce") if numeric else values
+    return df
+
+
+@pytest.mark.parametrize("numeric", [False, True], ids=["object columns", "numeric columns"])
+def test_honors_and_income_labels_match_the_scalar_functions(numeric):
+    rng = random.Random(0)
+    for _ in range(300):
+        df = _random_frame(rng, 8, numeric)
+        assert classify_honors_series(df).tolist() == [classify_honors(r) for r in df.to_dict("records")]
+        assert classify_income_series(df["income"]).tolist() == df["income"].apply(classify_income).tolist()
+
+
+def test_honors_flags_match_the_scalar_function():
+    df = pd.DataFrame({
+        "gwa": [99, 96, 91, 99, 99, None],
+        "all_pass": [True, True, False, 0, np.nan, False],
+        "conduct_issue": [False, True, False, 0, 1, True],
+    })
+    assert classify_honors_series(df).tolist() == [classify_honors(r) for r in df.to_dict("records")]
+
+
+@pytest.mark.parametrize("numeric", [False, True], ids=["object columns", "numeric columns"])
+def test_complete_mask_matches_the_row_check(numeric):
+    rng = random.Random(1)
+    for _ in range(300):
+        df = _random_frame(rng, 8, numeric)
+        expected = [is_record_complete_row(r) for r in df.to_dict("records")]
+        assert complete_mask(df).tolist() == expected
+        assert filter_complete_students_df(df).index.tolist() == [i for i, keep in enumerate(expected) if keep]
+
+
+def test_complete_mask_accepts_db_column_spelling():
+    row = {"firstname": "a", "lastname": "b", "sex": "M", "program": "CS", "municipality": "X",
+           "SHS_type": "public", "GWA": 91.5, "income": 20000.0}
+    assert is_record_complete_row(row)
+    assert complete_mask(pd.DataFrame([row])).tolist() == [True]
+
+
+def _seconds(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def test_vectorized_classification_is_faster_than_per_row():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"gwa": rng.uniform(75, 100, 20_000), "income": rng.uniform(0, 300_000, 20_000)})
+    scalar = _seconds(lambda: (df.apply(classify_honors, axis=1), df["income"].apply(classify_income)))
+    vectorized = _seconds(lambda: (classify_honors_series(df), classify_income_series(df["income"])))
+    assert vectorized * 5 < scalar
+
+
+@pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 for the 1M-row benchmark")
+def test_benchmark_one_million_rows():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"gwa": rng.uniform(75, 100, 1_000_000), "income": rng.uniform(0, 300_000, 1_000_000)})
+    vectorized = _seconds(lambda: (classify_honors_series(df), classify_income_series(df["income"])))
+    sample = df.sample(100_000, random_state=0)
+    scalar = 10 * _seconds(lambda: (sample.apply(classify_honors, axis=1), sample["income"].apply(classify_income)))
+    print(f"\n1M rows: vectorized {vectorized:.2f}s, per-row ~{scalar:.1f}s (extrapolated from 100k)")
+    assert vectorized < 2.0
@@ -0,0 +1,104 @@
+"""Warm-started reclusters (routes.clusters.fit_recluster): faster, stable, and cold when they must be."""
+import copy
+import random
+import time
+import numpy as np
+import pytest
+from routes.clusters import fit_recluster
+
+PROGRAMS = ["BSCS", "BSIT", "BSIS", "BSEE", "BSME"]
+MUNICIPALITIES = [f"Town {i}" for i in range(12)]
+
+
+def _students(rows: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    students = []
+    for i in range(rows):
+        group = i % 4
+        students.append({
+            "id": i + 1, "firstname": "a", "lastname": "b", "sex": rng.choice("MF"),
+            "program": rng.choice(PROGRAMS), "municipality": rng.choice(MUNICIPALITIES),
+            "SHS_type": rng.choice(["public", "private"]),
+            "GWA": round(75 + group * 5 + rng.gauss(0, 2), 2),
+            "income": max(1000, int(10_000 + group * 25_000 + rng.gauss(0, 6000))),
+            "Honors": "x", "IncomeCategory": "y",
+        })
+    return students
+
+
+def _edit_a_few(students: list, count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    edited = copy.deepcopy(students)
+    for i in rng.sample(range(len(edited)), count):
+        edited[i]["GWA"] = round(edited[i]["GWA"] + rng.gauss(0, 3), 2)
+    return edited
+
+
+@pytest.fixture(scope="module")
+def stored_run():
+    students = _students(20_000)
+    _, labels, _, model, _, _ = fit_recluster(students, 4)
+    return students, labels, model
+
+
+def _timed(*args):
+    start = time.perf_counter()
+    result = fit_recluster(*args)
+    return result, time.perf_counter() - start
+
+
+def test_warm_start_is_faster(stored_run, monkeypatch):
+    import routes.clusters
+
+    students, _, model = stored_run
+    edited = _edit_a_few(students, 50)
+    # scoring costs the same either way; time the fits themselves
+    monkeypatch.setattr(routes.clusters, "quality_metrics", lambda X, labels: {})
+
+    (*_, cold_warm), cold_seconds = _timed(edited, 4)
+    (*_, warm), warm_seconds = _timed(edited, 4, model)
+
+    print(f"\ncold {cold_seconds:.2f}s, warm {warm_seconds:.2f}s")
+    assert warm and not cold_warm
+    assert warm_seconds * 1.5 < cold_seconds
+
+
+def test_warm_start_keeps_assignments_and_quality(stored_run):
+    students, stored_labels, model = stored_run
+    edited = _edit_a_few(students, 50)
+
+    _, cold_labels, _, _, cold_metrics, _ = fit_recluster(edited, 4)
+    _, warm_labels, _, warm_model, warm_metrics, warm = fit_recluster(edited, 4, model)
+
+    assert warm
+    # seeded from the stored centroids, so cluster numbers keep their meaning
+    assert (warm_labels == stored_labels).mean() > 0.99
+    assert warm_model.inertia <= model.inertia * 1.1
+    for name in ("silhouette", "davies_bouldin", "calinski_harabasz"):
+        assert warm_metrics[name] == pytest.approx(cold_metrics[name], rel=0.05)
+    print(f"\nunchanged labels: warm {(warm_labels == stored_labels).mean():.4f}, "
+          f"cold {(cold_labels == stored_labels).mean():.4f}")
+
+
+def test_changed_k_falls_back_to_a_full_search(stored_run):
+    students, _, model = stored_run
+    *_, warm = fit_recluster(students, 5, model)
+    assert not warm
+
+
+def test_inertia_regression_falls_back_to_a_full_search(stored_run):
+    students, _, model = stored_run
+    tightened = copy.copy(model)
+    tightened.inertia = model.inertia / 10  # the warm fit can't come within tolerance of this
+    _, labels, _, fitted, _, warm = fit_recluster(students, 4, tightened)
+    assert not warm
+    assert len(np.unique(labels)) == 4
+    assert fitted.inertia == pytest.approx(model.inertia, rel=0.01)
+
+
+def test_new_categories_fall_back_to_a_full_search(stored_run):
+    students, _, model = stored_run
+    changed = copy.deepcopy(students)
+    changed[0]["program"] = "BSArch"  # shifts the label codes of the encoded program column
+    *_, warm = fit_recluster(changed, 4, model)
+    assert not warm
@@ -0,0 +1,133 @@
+"""Reading uploaded dataset files without buffering them in memory.
+
+Starlette receives multipart file parts in chunks into a SpooledTemporaryFile
+(kept in memory up to 1 MB, then rolled to disk), so uploads are parsed straight
+from that stream instead of being read into one bytes object and copied to disk.
+Bodies larger than MAX_UPLOAD_BYTES are refused before they are received.
+"""
+import datetime
+import hashlib
+import json
+import tempfile
+import pandas as pd
+from fastapi import HTTPException, UploadFile
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+from config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES
+
+try:  # optional Rust-based .xlsx reader, several times faster than openpyxl
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+
+class UploadSizeLimitMiddleware:
+    """Reject requests whose declared Content-Length exceeds ``max_bytes`` with a 413."""
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            declared = dict(scope["headers"]).get(b"content-length")
+            if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                body = json.dumps({"detail": too_large_message(self.max_bytes)}).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
+
+
+def too_large_message(max_bytes: int) -> str:
+    return f"File too large (limit {max_bytes // (1024 * 1024)} MB)"
+
+
+def stream_size(stream) -> int:
+    position = stream.tell()
+    stream.seek(0, 2)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def upload_size(file: UploadFile) -> int:
+    return file.size if file.size is not None else stream_size(file.file)
+
+
+def check_upload_size(file: UploadFile):
+    # catches chunked bodies that had no Content-Length for the middleware to check
+    if upload_size(file) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=too_large_message(MAX_UPLOAD_BYTES))
+
+
+def read_frame(stream, filename: str) -> pd.DataFrame:
+    """Parse a CSV / Excel file from a binary stream (blocking; run in a thread)."""
+    stream.seek(0)
+    if filename.endswith('.csv'):
+        return pd.read_csv(stream, dtype={"income": "float64", "gwa": "float64"}, low_memory=False)
+    return read_excel_frame(stream)
+
+
+def _sheet_rows(stream) -> list:
+    """Cell values of the first sheet, row by row."""
+    if CalamineWorkbook is not None:
+        return CalamineWorkbook.from_filelike(stream).get_sheet_by_index(0).to_python()
+    # read-only mode streams the sheet XML instead of building every cell object
+    workbook = load_workbook(stream, read_only=True, data_only=True, keep_links=False)
+    try:
+        return [list(row) for row in workbook.worksheets[0].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+
+
+def _excel_value(value):
+    # same conversions pd.read_excel applies to openpyxl cells
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if type(value) is datetime.date:  # calamine returns plain dates for date-only cells
+        return datetime.datetime(value.year, value.month, value.day)
+    return value
+
+
+def read_excel_frame(stream) -> pd.DataFrame:
+    """Parse the first sheet of an .xlsx file; gives the same frame as ``pd.read_excel``."""
+    rows = [[_excel_value(v) for v in row] for row in _sheet_rows(stream)]
+
+    # drop trailing empty rows and columns, which sheets often carry from formatting
+    while rows and not any(v != "" for v in rows[-1]):
+        rows.pop()
+    if not rows:
+        return pd.DataFrame()
+    width = max((max((i for i, v in enumerate(row) if v != ""), default=-1) + 1 for row in rows), default=0)
+    rows = [row[:width] + [""] * (width - len(row)) for row in rows]
+
+    # TextParser is what pd.read_excel hands rows to, so dtypes and NA handling match
+    return TextParser(rows, header=0).read()
+
+
+def read_upload_frame(file: UploadFile) -> pd.DataFrame:
+    return read_frame(file.file, file.filename)
+
+
+def detach_upload(file: UploadFile):
+    """Copy an upload into a temp file the caller owns (blocking; run in a thread).
+
+    Starlette closes the request's spooled file once the response is sent, so
+    background jobs work on their own copy, written in UPLOAD_CHUNK_BYTES chunks.
+    The SHA-256 of the contents is taken on the same pass; returns ``(copy, hexdigest)``.
+    """
+    copy = tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_BYTES)
+    digest = hashlib.sha256()
+    file.file.seek(0)
+    for chunk in iter(lambda: file.file.read(UPLOAD_CHUNK_BYTES), b""):
+        digest.update(chunk)
+        copy.write(chunk)
+    copy.seek(0)
+    return copy, digest.hexdigest()
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from config import USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS
+
+
+class UserCache:
+    """Process-local TTL + LRU cache of active user rows, keyed by email (the token subject).
+
+    Rows are copied in and out so callers can mutate what they get back.
+    Writers to the users table must call invalidate() for the affected row.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries = OrderedDict()  # email -> (expires_at, user)
+        self._ids = {}  # user id -> email
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        if not email:
+            return None
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                self._drop(email)
+                return None
+            self._entries.move_to_end(email)
+            return dict(user)
+
+    def put(self, user: dict):
+        if not user or self._max_entries <= 0:
+            return
+        email = user.get("email")
+        with self._lock:
+            self._drop(email)
+            self._entries[email] = (time.monotonic() + self._ttl, dict(user))
+            self._ids[user.get("id")] = email
+            while len(self._entries) > self._max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def invalidate(self, email=None, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                email = self._ids.get(user_id, email)
+            self._drop(email)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._ids.clear()
+
+    def _drop(self, email):
+        entry = self._entries.pop(email, None)
+        if entry is not None:
+            self._ids.pop(entry[1].get("id"), None)
+
+
+user_cache = UserCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
@@ -1,16 +1,37 @@
+import numpy as np
 import pandas as pd
 
+# GWA bands: [low, high) except the top band, which includes GWA_MAX
+GWA_MAX = 100
+GWA_HIGHEST_HONORS = 98
+GWA_HIGH_HONORS = 95
+GWA_HONORS = 90
+
+# Upper bounds (exclusive) of each income bracket; anything above the last is "Rich"
+INCOME_BRACKETS = [
+    (12030, "Poor"),
+    (24060, "Low-Income"),
+    (48120, "Lower-Middle"),
+    (84210, "Middle-Middle"),
+    (144360, "Upper-Middle"),
+    (240600, "Upper-Income"),
+]
+
+NO_GWA = "No GWA Entered"
+NO_INCOME = "No Income Entered"
+
+
 def classify_honors(row):
     gwa = row.get('gwa')
 
     # Handle missing/blank GWA
     if pd.isna(gwa) or gwa == "" or gwa is None:
-        return "No GWA Entered"
+        return NO_GWA
 
     try:
         gwa = float(gwa)
     except:
-        return "No GWA Entered"
+        return NO_GWA
 
     # Optional dataset flags
     all_pass = row.get('all_pass', True)
@@ -19,36 +40,90 @@ def classify_honors(row):
     if not all_pass or conduct_issue:
         return "Average"
 
-    if 98 <= gwa <= 100:
+    if GWA_HIGHEST_HONORS <= gwa <= GWA_MAX:
         return "With Highest Honors"
-    elif 95 <= gwa < 98:
+    elif GWA_HIGH_HONORS <= gwa < GWA_HIGHEST_HONORS:
         return "With High Honors"
-    elif 90 <= gwa < 95:
+    elif GWA_HONORS <= gwa < GWA_HIGH_HONORS:
         return "With Honors"
     return "Average"
 
 def classify_income(income):
     # Handle missing/blank income
     if pd.isna(income) or income == "" or income is None:
-        return "No Income Entered"
+        return NO_INCOME
 
     try:
         income = float(income)
     except:
-        return "No Income Entered"
+        return NO_INCOME
 
     if income == 0:
-        return "No Income Entered"
-    elif income < 12030:
-        return "Poor"
-    elif income < 24060:
-        return "Low-Income"
-    elif income < 48120:
-        return "Lower-Middle"
-    elif income < 84210:
-        return "Middle-Middle"
-    elif income < 144360:
-        return "Upper-Middle"
-    elif income < 240600:
-        return "Upper-Income"
+        return NO_INCOME
+    for upper, label in INCOME_BRACKETS:
+        if income < upper:
+            return label
     return "Rich"
+
+
+# ------------------------
+# Vectorized versions for whole DataFrames
+# ------------------------
+# Same labels as the scalar functions above, including their edge cases:
+# a literal "nan" string parses (and falls through to "Average"/"Rich"),
+# while blanks and unparseable values count as not entered.
+def coerce_float_series(series: pd.Series):
+    """Parse a column like ``float(value)`` would; returns ``(values, missing)`` arrays."""
+    missing = series.isna().to_numpy() | (series == "").to_numpy(dtype=bool)
+    values = pd.to_numeric(series.where(~missing), errors="coerce").to_numpy(dtype=float, copy=True)
+
+    # to_numeric and float() disagree on a few spellings ("nan", "1_000"); re-check only those
+    for i in np.flatnonzero(np.isnan(values) & ~missing):
+        try:
+            values[i] = float(series.iat[i])
+        except (TypeError, ValueError):
+            missing[i] = True
+    return values, missing
+
+
+def _truthy(series: pd.Series) -> np.ndarray:
+    if series.dtype == object:
+        return series.map(bool).to_numpy(dtype=bool)
+    # NaN is truthy, like in the scalar checks
+    return (series.to_numpy() != 0) | series.isna().to_numpy()
+
+
+def classify_honors_series(df: pd.DataFrame) -> pd.Series:
+    gwa, missing = coerce_float_series(df["gwa"])
+
+    flagged = np.zeros(len(df), dtype=bool)
+    if "all_pass" in df.columns:
+        flagged |= ~_truthy(df["all_pass"])
+    if "conduct_issue" in df.columns:
+        flagged |= _truthy(df["conduct_issue"])
+
+    labels = np.select(
+        [
+            missing,
+            flagged,
+            (gwa >= GWA_HIGHEST_HONORS) & (gwa <= GWA_MAX),
+            (gwa >= GWA_HIGH_HONORS) & (gwa < GWA_HIGHEST_HONORS),
+            (gwa >= GWA_HONORS) & (gwa < GWA_HIGH_HONORS),
+        ],
+        [NO_GWA, "Average", "With Highest Honors", "With High Honors", "With Honors"],
+        default="Average",
+    )
+    return pd.Series(labels, index=df.index, dtype=object)
+
+
+def classify_income_series(series: pd.Series) -> pd.Series:
+    income, missing = coerce_float_series(series)
+
+    conditions = [missing | (income == 0)]
+    choices = [NO_INCOME]
+    for upper, label in INCOME_BRACKETS:
+        conditions.append(income < upper)
+        choices.append(label)
+
+    labels = np.select(conditions, choices, default="Rich")
+    return pd.Series(labels, index=series.index, dtype=object)
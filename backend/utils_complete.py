@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
+from pandas.api.types import infer_dtype, is_float_dtype
 from typing import Iterable
+from utils import coerce_float_series
 
 PLACEHOLDER_STRINGS = {"incomplete", "n/a", "na", "none", "-1", ""}
 
@@ -23,7 +26,9 @@ def is_record_complete_row(row: dict) -> bool:
     Required fields: firstname, lastname, sex, program, municipality, income, shs_type, GWA
     income and GWA must be numeric > 0 and not placeholder values.
     """
-    required = ["firstname", "lastname", "sex", "program", "municipality", "shs_type", "GWA", "income"]
+    # DB rows spell some columns differently (SHS_type), so keys are matched case-insensitively
+    row = {str(key).lower(): val for key, val in row.items()}
+    required = ["firstname", "lastname", "sex", "program", "municipality", "shs_type", "gwa", "income"]
     for key in required:
         if key not in row:
             return False
@@ -33,7 +38,7 @@ def is_record_complete_row(row: dict) -> bool:
 
     # numeric checks
     try:
-        gwa = float(row.get("GWA"))
+        gwa = float(row.get("gwa"))
         income = float(row.get("income"))
         if gwa <= 0 or income <= 0:
             return False
@@ -43,41 +48,76 @@ def is_record_complete_row(row: dict) -> bool:
     return True
 
 
-def filter_complete_students_df(df: pd.DataFrame) -> pd.DataFrame:
-    """Return a DataFrame containing only rows considered complete by the same rules.
+TEXT_FIELDS = ["firstname", "lastname", "sex", "program", "municipality", "shs_type"]
+NUMERIC_FIELDS = ["gwa", "income"]
 
-    Accepts a DataFrame with columns possibly named case-insensitively (GWA/gwa etc.).
-    Normalizes column names to lower-case keys and then applies the completeness filter.
-    """
-    if df is None or df.empty:
-        return df.copy()
 
-    # work on a copy and lowercase columns
-    df2 = df.copy()
-    df2.columns = [c.lower() for c in df2.columns]
+def _placeholder(values) -> np.ndarray:
+    return pd.Series(values, dtype=object).astype(str).str.strip().str.lower().isin(PLACEHOLDER_STRINGS).to_numpy()
+
 
-    # ensure keys exist
-    for col in ["firstname", "lastname", "sex", "program", "municipality", "shs_type", "gwa", "income"]:
-        if col not in df2.columns:
-            df2[col] = None
+def _text_missing(series: pd.Series) -> np.ndarray:
+    codes, uniques = pd.factorize(series)
+    if infer_dtype(uniques, skipna=False) == "string":
+        # plain text column: normalize each distinct value once
+        missing = _placeholder(uniques)[codes]
+    else:
+        # factorize would merge 1 / 1.0 / True, whose str() differ
+        missing = _placeholder(series)
+    # str(nan) is "nan", so NaN counts as present; None and pd.NA (which to_dict()
+    # turns into None) do not
+    for i in np.flatnonzero(series.isna().to_numpy()):
+        value = series.iat[i]
+        missing[i] = value is None or value is pd.NA
+    return missing
 
-    def row_complete(r):
-        # check placeholders and missing
-        for key in ["firstname", "lastname", "sex", "program", "municipality", "shs_type"]:
-            v = r.get(key)
-            if is_value_missing(v):
-                return False
 
-        # numeric
+def _numeric_ok(series: pd.Series) -> np.ndarray:
+    """``float(v) > 0`` would not fail; NaN passes, as it does in the row check."""
+    values, missing = coerce_float_series(series)
+    ok = ~missing & ~(values <= 0)
+    if is_float_dtype(series.dtype):
+        return ok | np.isnan(values)
+    # a float NaN inside an object column parses; None / pd.NA do not
+    for i in np.flatnonzero(series.isna().to_numpy()):
         try:
-            gwa = float(r.get("gwa"))
-            income = float(r.get("income"))
-            if gwa <= 0 or income <= 0:
-                return False
-        except Exception:
-            return False
+            float(series.iat[i])
+            ok[i] = True
+        except (TypeError, ValueError):
+            pass
+    return ok
 
-        return True
 
-    mask = df2.apply(lambda r: row_complete(r.to_dict()), axis=1)
-    return df.loc[mask.values].copy()
+def complete_mask(df: pd.DataFrame) -> np.ndarray:
+    """Boolean array marking the rows ``filter_complete_students_df`` keeps.
+
+    Column-wise equivalent of checking every row with ``is_record_complete_row``
+    (column names matched case-insensitively, the last one winning on duplicates).
+    """
+    if df is None or df.empty:
+        return np.zeros(0 if df is None else len(df), dtype=bool)
+
+    positions = {}
+    for i, col in enumerate(df.columns):
+        positions[str(col).lower()] = i
+
+    mask = np.ones(len(df), dtype=bool)
+    for key in TEXT_FIELDS:
+        if key not in positions:
+            return np.zeros(len(df), dtype=bool)
+        mask &= ~_text_missing(df.iloc[:, positions[key]])
+    for key in NUMERIC_FIELDS:
+        if key not in positions:
+            return np.zeros(len(df), dtype=bool)
+        mask &= _numeric_ok(df.iloc[:, positions[key]])
+    return mask
+
+
+def filter_complete_students_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of ``df`` containing only rows considered complete by the same rules.
+
+    Accepts a DataFrame with columns possibly named case-insensitively (GWA/gwa etc.).
+    """
+    if df is None or df.empty:
+        return df.copy()
+    return df.loc[complete_mask(df)].copy()
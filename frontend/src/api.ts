@@ -87,11 +87,22 @@ export const getClusters = () => API.get("/clusters");
 export const recluster = (data: any) => API.post("/clusters/recluster", data);
 export const getPairwiseClusters = () => API.get("/clusters/pairwise");
 export const getClusterPlayground = () => API.get("/clusters/playground");
+export const getClusterMetrics = () => API.get("/clusters/metrics");
 
 /* ---------------- DATASETS ---------------- */
 export const getDatasets = () => API.get("/datasets");
 export const uploadDataset = (formData: FormData) =>
   API.post("/datasets/upload", formData, { headers: { "Content-Type": "multipart/form-data" } });
+export const stageDataset = (formData: FormData) =>
+  API.post("/datasets/stage", formData, { headers: { "Content-Type": "multipart/form-data" } });
+export const commitStagedDataset = (stageId: string, k?: number) =>
+  API.post(`/datasets/stage/${stageId}/commit`, null, { params: { k } });
+export const appendToDataset = (datasetId: number, formData: FormData, driftCheck = false) =>
+  API.post(`/datasets/${datasetId}/append`, formData, {
+    headers: { "Content-Type": "multipart/form-data" },
+    params: { drift_check: driftCheck },
+  });
+export const getDatasetJob = (jobId: string) => API.get(`/datasets/jobs/${jobId}`);
 export const previewElbow = (formData: FormData) =>
   API.post("/datasets/elbow", formData, { headers: { "Content-Type": "multipart/form-data" } });
 export const deleteDataset = (datasetId: number) => API.delete(`/datasets/${datasetId}`);
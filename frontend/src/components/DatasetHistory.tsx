@@ -36,6 +36,7 @@ function DatasetHistory() {
   const [itemsPerPage, setItemsPerPage] = useState<number>(10)
   const [currentPage, setCurrentPage] = useState<number>(1)
   const [uploadLoading, setUploadLoading] = useState(false)
+  const [uploadProgress, setUploadProgress] = useState<{ stage: string; percent: number } | null>(null)
   const [showUpload, setShowUpload] = useState(false)
   const [selectedFile, setSelectedFile] = useState<File | null>(null)
   const [clusterCount, setClusterCount] = useState(3)
@@ -48,6 +49,7 @@ function DatasetHistory() {
   const [elbowLoading, setElbowLoading] = useState(false)
   const [elbowError, setElbowError] = useState('')
   const [wcss, setWcss] = useState<number[]>([])
+  const [stageId, setStageId] = useState<string | null>(null)
   const [recommendedK, setRecommendedK] = useState<number | null>(null)
   const [qualityMetrics, setQualityMetrics] = useState<{
     silhouette: number
@@ -134,16 +136,21 @@ const handleFileSelect = (e: React.ChangeEvent<HTMLInputElement>) => {
     setElbowError('')
     setWcss([])
     setRecommendedK(null)
+    setStageId(null)
 
     try {
       const formData = new FormData()
       formData.append('file', file)
 
-      const response = await API.post('/datasets/elbow', formData, {
+      // Stages the parsed file on the server so "Upload & Process" doesn't send or parse it again
+      const response = await API.post('/datasets/stage', formData, {
         headers: { 'Content-Type': 'multipart/form-data' },
       })
 
       const data = response.data
+      if (data && data.stage_id) {
+        setStageId(data.stage_id)
+      }
       if (data && Array.isArray(data.wcss)) {
         setWcss(data.wcss)
       }
@@ -178,30 +185,56 @@ const handleFileSelect = (e: React.ChangeEvent<HTMLInputElement>) => {
     setSuccess('')
 
     try {
-      const formData = new FormData()
-      formData.append('file', selectedFile)
-      formData.append('k', clusterCount.toString())
+      let response
+      try {
+        if (!stageId) throw new Error('not staged')
+        response = await API.post(`/datasets/stage/${stageId}/commit`)
+      } catch (stageError: any) {
+        // Stage missing or expired: fall back to sending the file again
+        if (stageError.response && stageError.response.status !== 404) throw stageError
+        const formData = new FormData()
+        formData.append('file', selectedFile)
+        response = await API.post('/datasets/upload', formData, {
+          headers: {
+            'Content-Type': 'multipart/form-data'
+          }
+        })
+      }
 
-      const response = await API.post('/datasets/upload', formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data'
-        }
-      })
+      // Processing runs as a background job on the server; poll until it finishes
+      const result = await waitForJob(response.data.job_id)
 
-      setSuccess(`Dataset uploaded successfully! Processed ${response.data.total_students} students into ${response.data.clusters} clusters.`)
-      if (response.data.quality_metrics) {
-        setQualityMetrics(response.data.quality_metrics)
+      if (result.cached) {
+        setSuccess(`This file was already uploaded, so the existing dataset was reused (${result.total_students} students, ${result.clusters} clusters).`)
+      } else {
+        setSuccess(`Dataset uploaded successfully! Processed ${result.total_students} students into ${result.clusters} clusters.`)
+      }
+      if (result.quality_metrics) {
+        setQualityMetrics(result.quality_metrics)
       }
 
       setShowUpload(false)
       setSelectedFile(null)
+      setStageId(null)
       setWcss([])
       setRecommendedK(null)
       fetchDatasets()
     } catch (error: any) {
-      setError(error.response?.data?.detail || 'Failed to upload dataset')
+      setError(error.response?.data?.detail || error.message || 'Failed to upload dataset')
     } finally {
       setUploadLoading(false)
+      setUploadProgress(null)
+    }
+  }
+
+  const waitForJob = async (jobId: string) => {
+    setUploadProgress({ stage: 'queued', percent: 0 })
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 1000))
+      const { data: job } = await API.get(`/datasets/jobs/${jobId}`)
+      setUploadProgress({ stage: job.stage, percent: job.percent })
+      if (job.status === 'done') return job.result
+      if (job.status === 'failed') throw new Error(`Error processing dataset: ${job.error}`)
     }
   }
 
@@ -675,7 +708,11 @@ const elbowPlot = () => {
 
                   {uploadLoading && (
                     <div className="mb-3">
-                      <ProgressBar animated now={100} label="Processing..." />
+                      <ProgressBar
+                        animated
+                        now={uploadProgress ? uploadProgress.percent : 100}
+                        label={uploadProgress ? `${uploadProgress.stage} (${Math.round(uploadProgress.percent)}%)` : 'Uploading...'}
+                      />
                     </div>
                   )}
                 </Col>